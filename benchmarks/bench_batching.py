@@ -0,0 +1,66 @@
+# benchmarks/bench_batching.py
+"""Request latency under concurrency: per-request loops vs the BatchScheduler.
+
+Every client thread generates the same number of tokens against one shared
+tiny random-weight GPT-2 on CPU, either with its own DecodingEngine loop (how
+concurrent POSTs behaved before) or through one shared BatchScheduler:
+
+    python -m benchmarks.bench_batching --clients 1 2 4 8 --new-tokens 64
+"""
+import argparse
+import threading
+import time
+
+import torch
+
+from benchmarks.bench_decoding import ByteTokenizer, tiny_model
+from paia.generation.decoding import DecodingEngine
+from paia.generation.scheduler import BatchScheduler
+
+
+def run_clients(generator, prompts, new_tokens):
+    latencies = [0.0] * len(prompts)
+
+    def client(index):
+        started = time.perf_counter()
+        for _ in generator.generate(prompts[index], new_tokens):
+            pass
+        latencies[index] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(prompts))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return sum(latencies) / len(latencies), len(prompts) * new_tokens / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden", type=int, default=256)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    model = tiny_model(args.layers, args.hidden)
+    tokenizer = ByteTokenizer()
+    engine = DecodingEngine(model, tokenizer)
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=args.max_batch_size, name="bench")
+    text = "Once upon a time there was a little model that wanted to batch. "
+
+    print(f"{'clients':>7} | {'loop latency':>12} | {'batch latency':>13} | {'loop tok/s':>10} | {'batch tok/s':>11}")
+    for clients in args.clients:
+        prompts = [tokenizer.encode(text[:16 + 3 * i]) for i in range(clients)]
+        loop_latency, loop_rate = run_clients(engine, prompts, args.new_tokens)
+        batch_latency, batch_rate = run_clients(scheduler, prompts, args.new_tokens)
+        print(f"{clients:>7} | {loop_latency:>11.3f}s | {batch_latency:>12.3f}s | {loop_rate:>10.1f} | {batch_rate:>11.1f}")
+    scheduler.close()
+
+
+if __name__ == "__main__":
+    torch.set_grad_enabled(False)
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_cpu_backend.py
+"""fp32 vs dynamic int8 (and bfloat16 autocast) on CPU for translate and text generation.
+
+Uses small random-weight Marian (translate) and Llama (text-generator) models
+built from configs, prepared through PAIABackend exactly like the services:
+
+    python -m benchmarks.bench_cpu_backend --threads 4
+"""
+import argparse
+import io
+import time
+
+import torch
+from transformers import LlamaConfig, LlamaForCausalLM, MarianConfig, MarianMTModel
+
+from paia.backend import PAIABackend
+from paia.generation.decoding import DecodingEngine
+
+
+class ByteTokenizer:
+    eos_token_id = None
+
+    def decode(self, token_ids, **kwargs):
+        return bytes(t % 256 for t in token_ids).decode("utf-8", errors="replace")
+
+
+def model_bytes(model) -> int:
+    """Size of the weights as stored (quantized Linear layers keep packed int8 params)."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def translate_model(args):
+    torch.manual_seed(0)
+    config = MarianConfig(vocab_size=8000, d_model=args.hidden, encoder_layers=args.layers, decoder_layers=args.layers,
+                          encoder_attention_heads=8, decoder_attention_heads=8, encoder_ffn_dim=args.hidden * 4,
+                          decoder_ffn_dim=args.hidden * 4, max_position_embeddings=512, pad_token_id=0,
+                          eos_token_id=1, decoder_start_token_id=0)
+    return MarianMTModel(config)
+
+
+def generator_model(args):
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=8000, hidden_size=args.hidden, intermediate_size=args.hidden * 4,
+                         num_hidden_layers=args.layers, num_attention_heads=8, num_key_value_heads=8,
+                         max_position_embeddings=1024, bos_token_id=None, eos_token_id=None)
+    return LlamaForCausalLM(config)
+
+
+def bench_translate(model, backend, args):
+    input_ids = torch.randint(2, 8000, (1, args.prompt_tokens))
+    with torch.inference_mode(), backend.autocast():
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            model.generate(input_ids, max_new_tokens=args.new_tokens, min_new_tokens=args.new_tokens, num_beams=1, do_sample=False)
+    return (time.perf_counter() - started) / args.repeat
+
+
+def bench_generate(model, backend, args):
+    engine = DecodingEngine(model, ByteTokenizer(), device=backend.device, autocast=backend.autocast)
+    prompt = torch.randint(2, 8000, (args.prompt_tokens,)).tolist()
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for _ in engine.generate(prompt, args.new_tokens):
+            pass
+    return (time.perf_counter() - started) / args.repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden", type=int, default=512)
+    parser.add_argument("--prompt-tokens", type=int, default=32)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    variants = {"fp32": {"device": "cpu"}, "int8": {"device": "cpu", "quantization": "int8"}}
+    if PAIABackend.cpu_supports_bfloat16():
+        variants["bf16-autocast"] = {"device": "cpu", "autocast": "bfloat16"}
+    if args.threads:
+        for config in variants.values():
+            config["intra_op_threads"] = args.threads
+
+    print(f"{'service':<15} | {'variant':<14} | {'latency':>9} | {'weights':>9}")
+    for service, build, run in (("translate", translate_model, bench_translate), ("text-generator", generator_model, bench_generate)):
+        for variant, config in variants.items():
+            backend = PAIABackend(service, config=config)
+            model = backend.prepare(build(args))
+            run(model, backend, args)  # warmup
+            latency = run(model, backend, args)
+            print(f"{service:<15} | {variant:<14} | {latency * 1000:>7.1f}ms | {model_bytes(model) / 2 ** 20:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
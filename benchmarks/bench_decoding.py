@@ -0,0 +1,99 @@
+# benchmarks/bench_decoding.py
+"""Tokens/sec of the KV-cached DecodingEngine against the previous full-sequence loop.
+
+Runs on CPU with a tiny random-weight GPT-2 and a byte-level tokenizer, so no
+model download is needed:
+
+    python -m benchmarks.bench_decoding --new-tokens 256 --prompt-tokens 64
+"""
+import argparse
+import time
+
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from paia.generation.decoding import DecodingEngine
+
+
+class ByteTokenizer:
+    """Byte-level tokenizer, ids 0-255 are raw UTF-8 bytes."""
+    eos_token_id = None
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def decode(self, token_ids, **kwargs):
+        if isinstance(token_ids, torch.Tensor):
+            token_ids = token_ids.tolist()
+        return bytes(t % 256 for t in token_ids).decode("utf-8", errors="replace")
+
+
+def tiny_model(layers: int, hidden: int):
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=256, n_positions=2048, n_embd=hidden, n_layer=layers, n_head=4, bos_token_id=None, eos_token_id=None)
+    return GPT2LMHeadModel(config).eval()
+
+
+def legacy_loop(model, tokenizer, input_ids, new_tokens):
+    """The loop the services used before: whole sequence every step, full decode per token."""
+    attention_mask = torch.ones(input_ids.shape, dtype=torch.long)
+    generated_ids = input_ids
+    with torch.no_grad():
+        for _ in range(new_tokens):
+            outputs = model(generated_ids, attention_mask=attention_mask)
+            next_token_id = torch.argmax(outputs.logits[:, -1, :], dim=-1).unsqueeze(-1)
+            generated_ids = torch.cat((generated_ids, next_token_id), dim=1)
+            attention_mask = torch.cat((attention_mask, torch.ones((1, 1), dtype=torch.long)), dim=1)
+            tokenizer.decode(generated_ids[0], skip_special_tokens=True)
+            if next_token_id.item() == tokenizer.eos_token_id:
+                break
+    return generated_ids.shape[1] - input_ids.shape[1]
+
+
+def engine_loop(engine, input_ids, new_tokens):
+    stream = engine.generate(input_ids, new_tokens)
+    detokenizer = engine.detokenizer(input_ids)
+    for token_id in stream:
+        detokenizer.push(token_id)
+    detokenizer.flush()
+    return stream.stats["generated_tokens"]
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        tokens = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return tokens, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompt-tokens", type=int, default=64)
+    parser.add_argument("--new-tokens", type=int, nargs="+", default=[64, 256, 512])
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--hidden", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model = tiny_model(args.layers, args.hidden)
+    tokenizer = ByteTokenizer()
+    engine = DecodingEngine(model, tokenizer)
+    prompt = tokenizer.encode(("Příliš žluťoučký kůň úpěl ďábelské ódy. " * 64))[:args.prompt_tokens]
+
+    print(f"{'new tokens':>10} | {'legacy tok/s':>12} | {'engine tok/s':>12} | {'speedup':>7}")
+    for new_tokens in args.new_tokens:
+        legacy_tokens, legacy_time = timed(lambda: legacy_loop(model, tokenizer, torch.tensor([prompt]), new_tokens), args.repeat)
+        engine_tokens, engine_time = timed(lambda: engine_loop(engine, prompt, new_tokens), args.repeat)
+        legacy_rate = legacy_tokens / legacy_time
+        engine_rate = engine_tokens / engine_time
+        print(f"{new_tokens:>10} | {legacy_rate:>12.1f} | {engine_rate:>12.1f} | {engine_rate / legacy_rate:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
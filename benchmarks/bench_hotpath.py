@@ -0,0 +1,308 @@
+# benchmarks/bench_hotpath.py
+"""CPU micro-benchmarks of the request hot path, saved as JSON to compare runs.
+
+Stub services with deterministic tiny models are registered through
+PAIAServiceManager, requests go through the real PAIAServiceHandler.do_POST
+on in-memory streams (no sockets), with logging at INFO to a temporary
+directory and the handler's access log to /dev/null:
+
+    post        do_POST parse, validation and dispatch of a non-streaming echo request
+    sse         SSE events written per second by a streaming do_POST
+    config      PAIAConfig().service(...).get(...) and disabled/enabled logger calls
+    contention  get_service calls per second from N threads, and a cold load raced by N threads
+    tokens      per-token overhead of DecodingEngine and of a streaming request over the bare forward loop
+
+    python -m benchmarks.bench_hotpath --output results.json
+    python -m benchmarks.bench_hotpath --only post sse --compare results.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.client import HTTPMessage
+
+import torch
+
+from benchmarks.bench_decoding import ByteTokenizer, tiny_model
+from paia import PAIAConfig, PAIALogger, PAIAService, PAIAServiceManager
+from paia.generation.decoding import DecodingEngine
+from paia.server.service import PAIAServiceHandler
+from paia.server.sse import encode_event
+
+
+class EchoService(PAIAService):
+    def process(self, query):
+        yield {"result": query.get("text", "")}
+
+
+class TokenService(PAIAService):
+    """Streams ``tokens`` fixed deltas, no model."""
+
+    def process(self, query):
+        text = ""
+        for i in range(int(query.get("tokens", 64))):
+            delta = f" token{i}"
+            text += delta
+            yield {"result": text, "delta": delta}
+
+
+class GenerateService(PAIAService):
+    """Greedy decoding with a seeded random-weight GPT-2, like the text services."""
+
+    def __init__(self, engine: DecodingEngine):
+        self.engine = engine
+
+    def process(self, query):
+        prompt = self.engine.tokenizer.encode(query.get("text", ""))
+        stream = self.engine.generate(prompt, int(query.get("max_length", 64)))
+        detokenizer = self.engine.detokenizer(prompt)
+        text = ""
+        for token_id in stream:
+            delta = detokenizer.push(token_id)
+            if delta:
+                text += delta
+                yield {"result": text, "delta": delta}
+        delta = detokenizer.flush()
+        if delta:
+            text += delta
+            yield {"result": text, "delta": delta}
+        yield {"stats": stream.stats}
+
+
+class SlowService(PAIAService):
+    """Takes ``LOAD_SECONDS`` to construct, like a service importing its model."""
+    LOAD_SECONDS = 0.05
+    instances = 0
+
+    def __init__(self):
+        time.sleep(self.LOAD_SECONDS)
+        SlowService.instances += 1
+
+    def process(self, query):
+        yield {"result": ""}
+
+
+def post(body: bytes) -> bytes:
+    """Run do_POST on in-memory streams, returns what would go to the socket."""
+    handler = PAIAServiceHandler.__new__(PAIAServiceHandler)
+    handler.rfile = io.BytesIO(body)
+    handler.wfile = io.BytesIO()
+    handler.headers = HTTPMessage()
+    handler.headers["Content-Length"] = str(len(body))
+    handler.client_address = ("127.0.0.1", 0)
+    handler.command, handler.path, handler.request_version = "POST", "/", "HTTP/1.1"
+    handler.requestline = "POST / HTTP/1.1"
+    handler.close_connection = False
+    handler.do_POST()
+    return handler.wfile.getvalue()
+
+
+def best(function, iterations: int, repeat: int) -> float:
+    """Best seconds per call over ``repeat`` rounds of ``iterations`` calls."""
+    seconds = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = (time.perf_counter() - started) / iterations
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds
+
+
+def bench_post(args) -> dict:
+    body = json.dumps({"service": "bench-echo", "query": {"text": "Hello"}}).encode("utf-8")
+    assert b'"result": "Hello"' in post(body)
+    json_body = b'{"service": "bench-echo", "query": {"text": "Hello"}}'
+    return {
+        "do_post_us": best(lambda: post(body), args.iterations, args.repeat) * 1e6,
+        "json_parse_us": best(lambda: json.loads(json_body), args.iterations, args.repeat) * 1e6,
+    }
+
+
+def bench_sse(args) -> dict:
+    results = {}
+    for delta in (False, True):
+        body = json.dumps({"service": "bench-tokens", "stream": True, "delta": delta, "query": {"tokens": args.tokens}}).encode("utf-8")
+        events = post(body).count(b"data: ")
+        seconds = best(lambda: post(body), max(1, args.iterations // args.tokens), args.repeat)
+        results["delta" if delta else "full_text"] = {"events": events, "events_per_second": events / seconds}
+    event = {"result": "x" * 256, "delta": "x"}
+    results["encode_event_us"] = best(lambda: encode_event(event), args.iterations, args.repeat) * 1e6
+    return results
+
+
+def bench_config(args) -> dict:
+    logger = PAIALogger()
+    return {
+        "config_service_get_us": best(lambda: PAIAConfig().service("bench-echo").get("enabled", True), args.iterations, args.repeat) * 1e6,
+        "config_snapshot_us": best(lambda: PAIAConfig().snapshot, args.iterations, args.repeat) * 1e6,
+        "logger_debug_disabled_us": best(lambda: logger.debug("Streaming token: %s", "x", category="token"), args.iterations, args.repeat) * 1e6,
+        "logger_info_us": best(lambda: logger.info("Processing %s, stream=%s", "bench-echo", True), args.iterations, args.repeat) * 1e6,
+    }
+
+
+def bench_contention(args) -> dict:
+    manager = PAIAServiceManager()
+    results = {}
+    for threads in args.threads:
+        calls = args.iterations
+
+        def client():
+            for _ in range(calls):
+                manager.get_service("bench-echo")
+
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        # Cold load: every thread asks for a service nobody loaded yet
+        SlowService.instances = 0
+        manager.register("bench-slow", SlowService)
+        barrier = threading.Barrier(threads)
+        latencies = []
+
+        def cold():
+            barrier.wait()
+            begin = time.perf_counter()
+            manager.get_service("bench-slow")
+            latencies.append(time.perf_counter() - begin)
+
+        workers = [threading.Thread(target=cold) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        results[str(threads)] = {
+            "warm_calls_per_second": threads * calls / elapsed,
+            "cold_load_max_ms": max(latencies) * 1e3,
+            "cold_load_overhead_ms": (max(latencies) - SlowService.LOAD_SECONDS) * 1e3,
+            "instances": SlowService.instances,
+        }
+    return results
+
+
+def bench_tokens(args, model, engine) -> dict:
+    tokenizer = engine.tokenizer
+    prompt = tokenizer.encode("Hello world, this is a benchmark prompt.")
+
+    def forward_loop():
+        input_ids = torch.tensor([prompt])
+        past = None
+        with torch.no_grad():
+            for _ in range(args.tokens):
+                outputs = model(input_ids=input_ids, past_key_values=past, use_cache=True)
+                past = outputs.past_key_values
+                input_ids = torch.argmax(outputs.logits[:, -1, :], dim=-1, keepdim=True)
+
+    def engine_loop():
+        for _ in engine.generate(prompt, args.tokens):
+            pass
+
+    body = json.dumps({"service": "bench-generate", "stream": True, "delta": True, "query": {"text": "Hello world, this is a benchmark prompt.", "max_length": args.tokens}}).encode("utf-8")
+    iterations = max(1, args.iterations // (args.tokens * 100))
+    forward = best(forward_loop, iterations, args.repeat) / args.tokens
+    decoding = best(engine_loop, iterations, args.repeat) / args.tokens
+    request = best(lambda: post(body), iterations, args.repeat) / args.tokens
+    return {
+        "forward_us_per_token": forward * 1e6,
+        "engine_us_per_token": decoding * 1e6,
+        "request_us_per_token": request * 1e6,
+        "engine_overhead_us_per_token": (decoding - forward) * 1e6,
+        "request_overhead_us_per_token": (request - forward) * 1e6,
+    }
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def compare(results: dict, path: str, stdout):
+    with open(path, encoding="utf-8") as file:
+        previous = flatten(json.load(file)["results"])
+    print(f"{'metric':<58} {'before':>12} {'after':>12} {'ratio':>7}", file=stdout)
+    for key, value in flatten(results).items():
+        if key in previous and previous[key]:
+            print(f"{key:<58} {previous[key]:12.2f} {value:12.2f} {value / previous[key]:6.2f}x", file=stdout)
+
+
+BENCHMARKS = ("post", "sse", "config", "contention", "tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--hidden", type=int, default=64)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of an earlier run to print ratios against")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    stdout = sys.stdout
+    sys.stderr = open(os.devnull, "w")
+    with tempfile.TemporaryDirectory() as directory:
+        PAIALogger().update({"level": "INFO", "dir": directory, "file_name": "bench.log", "async": True})
+        model = tiny_model(args.layers, args.hidden)
+        engine = DecodingEngine(model, ByteTokenizer())
+        manager = PAIAServiceManager()
+        manager.register("bench-echo", EchoService)
+        manager.register("bench-tokens", TokenService, streamable=True)
+        manager.register("bench-generate", GenerateService(engine), streamable=True)
+
+        results = {}
+        for name in args.only:
+            started = time.perf_counter()
+            results[name] = bench_tokens(args, model, engine) if name == "tokens" else globals()[f"bench_{name}"](args)
+            print(f"{name}: {time.perf_counter() - started:.1f}s", file=stdout)
+        PAIALogger().close()
+
+    report = {"meta": metadata(), "parameters": vars(args), "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text, file=stdout)
+    if args.compare:
+        compare(results, args.compare, stdout)
+
+
+if __name__ == "__main__":
+    main()
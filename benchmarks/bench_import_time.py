@@ -0,0 +1,72 @@
+# benchmarks/bench_import_time.py
+"""Startup cost of listing services: lazy manifest vs importing every service.
+
+Every scenario runs in a fresh interpreter under ``python -X importtime``.
+``eager`` imports every service module the way the manager did before the
+manifest (on the first ``get_services``), ``lazy`` only lists the manifest
+as ``GET /services`` and startup do now:
+
+    python -m benchmarks.bench_import_time --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SCENARIOS = {
+    "lazy": "PAIAServiceManager().get_services(as_str=True)",
+    "eager": "[spec.load() for spec in PAIAServiceManager().get_services().values()]",
+}
+
+CHILD = """
+import resource, time
+started = time.perf_counter()
+from paia import PAIAServiceManager
+{statement}
+seconds = time.perf_counter() - started
+import json, sys
+heavy = [name for name in ("torch", "transformers", "diffusers", "gtts") if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "heavy": heavy}}))
+"""
+
+
+def import_times(stderr: str) -> dict[str, int]:
+    """Cumulative microseconds of the top level imports in ``-X importtime`` output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def run(scenario: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(statement=SCENARIOS[scenario])],
+        cwd=root, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=root),
+    )
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    times = import_times(result.stderr)
+    stats["import_seconds"] = sum(times.values()) / 1e6
+    stats["slowest"] = sorted(times, key=times.get, reverse=True)[:5]
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'scenario':>8} {'wall s':>8} {'import s':>9} {'rss MB':>8}  heavy modules")
+    for scenario in ("eager", "lazy"):
+        runs = [run(scenario) for _ in range(args.repeat)]
+        best = min(runs, key=lambda stats: stats["seconds"])
+        print(f"{scenario:>8} {best['seconds']:8.2f} {best['import_seconds']:9.2f} {best['max_rss_mb']:8.0f}  {', '.join(best['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_logging.py
+"""Request throughput with DEBUG logging: synchronous eager logging vs the queued pipeline.
+
+Client threads run streaming requests against a stub service registered with
+PAIAServiceManager, through PAIAServiceRequest and the SSE encoder like the
+service handler does, logging every token and event at DEBUG:
+
+    before  synchronous file + console handlers, f-string messages, no sampling
+    queued  QueueHandler/QueueListener, lazy %-style messages, no sampling
+    after   queued, with token/sse sampling (1 in 100)
+
+Console output goes to /dev/null, the log file to a temporary directory:
+
+    python -m benchmarks.bench_logging --clients 8 --requests 50 --tokens 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from paia import PAIALogger, PAIAService, PAIAServiceManager
+from paia.server.api import PAIAServiceRequest
+from paia.server.sse import encode_event
+
+
+class TokenService(PAIAService):
+    def __init__(self, eager: bool):
+        self.eager = eager
+
+    def process(self, query):
+        text = ""
+        for i in range(int(query["tokens"])):
+            token = f" token{i}"
+            text += token
+            if self.eager:
+                PAIALogger().debug(f"Generated text: {text}")
+            else:
+                PAIALogger().debug("Generated text: %s", text, category="token")
+            yield {"result": text, "delta": token}
+
+
+def serve(body: str, eager: bool):
+    request = PAIAServiceRequest(body)
+    try:
+        for event in request.events():
+            if eager:
+                PAIALogger().debug(f"Sending SSE event: {event}")
+            else:
+                PAIALogger().debug("Sending SSE event: %s", PAIALogger().payload(event), category="sse")
+            encode_event(event)
+    finally:
+        request.close()
+
+
+def run(mode: str, clients: int, requests: int, tokens: int, directory: str) -> float:
+    eager = mode == "before"
+    config = {"level": "DEBUG", "dir": directory, "file_name": f"{mode}.log"}
+    if not eager:
+        config.update({"async": True, "max_payload": 1000})
+    if mode == "after":
+        config["sampling"] = {"token": 100, "sse": 100}
+    PAIALogger().update(config)
+    PAIAServiceManager().register("bench-tokens", TokenService(eager))
+    body = f'{{"service": "bench-tokens", "stream": true, "query": {{"tokens": {tokens}}}}}'
+
+    def client():
+        for _ in range(requests):
+            serve(body, eager)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # Queued records are part of the cost, but not of request latency
+    PAIALogger().flush()
+    return clients * requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    stdout = sys.stdout
+    sys.stderr = open(os.devnull, "w")
+    with tempfile.TemporaryDirectory() as directory:
+        results = {mode: run(mode, args.clients, args.requests, args.tokens, directory) for mode in ("before", "queued", "after")}
+        PAIALogger().close()
+        # Rotated files included
+        sizes = {mode: sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if name.startswith(f"{mode}.log")) for mode in results}
+    print(f"{'mode':>8} {'requests/s':>11} {'log MB':>8}", file=stdout)
+    for mode, rate in results.items():
+        print(f"{mode:>8} {rate:11.1f} {sizes[mode] / 2 ** 20:8.1f}", file=stdout)
+
+
+if __name__ == "__main__":
+    main()
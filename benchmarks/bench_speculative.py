@@ -0,0 +1,89 @@
+# benchmarks/bench_speculative.py
+"""Tokens/sec of speculative decoding against plain greedy DecodingEngine.
+
+Runs on CPU with a tiny random-weight GPT-2 as the main model. The draft
+model is its first ``--draft-layers`` layers sharing the embeddings and
+head (layer-skipping self-speculation), ``--draft-noise`` perturbs the
+draft's head so that some proposals are rejected. Every run checks that the
+output is identical to greedy decoding:
+
+    python -m benchmarks.bench_speculative --layers 12 --hidden 256 --draft-tokens 2 4 8
+"""
+import argparse
+import copy
+import time
+
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from paia.generation.decoding import DecodingEngine
+from paia.generation.speculative import SpeculativeDecodingEngine
+
+
+class ByteTokenizer:
+    """Byte-level tokenizer, ids 0-255 are raw UTF-8 bytes."""
+    eos_token_id = None
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def decode(self, token_ids, **kwargs):
+        return bytes(t % 256 for t in token_ids).decode("utf-8", errors="replace")
+
+
+def models(layers: int, hidden: int, draft_layers: int, draft_noise: float):
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=256, n_positions=2048, n_embd=hidden, n_layer=layers, n_head=4, bos_token_id=None, eos_token_id=None)
+    model = GPT2LMHeadModel(config).eval()
+    draft = copy.deepcopy(model)
+    draft.transformer.h = draft.transformer.h[:draft_layers]
+    draft.config.n_layer = draft_layers
+    with torch.no_grad():
+        draft.lm_head.weight = torch.nn.Parameter(draft.lm_head.weight + draft_noise * torch.randn_like(draft.lm_head.weight))
+    return model, draft.eval()
+
+
+def timed(engine, prompt, new_tokens, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stream = engine.generate(prompt, new_tokens)
+        tokens = list(stream)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return tokens, stream.stats, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompt-tokens", type=int, default=64)
+    parser.add_argument("--new-tokens", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=12)
+    parser.add_argument("--hidden", type=int, default=256)
+    parser.add_argument("--draft-layers", type=int, default=1)
+    parser.add_argument("--draft-noise", type=float, default=0.05)
+    parser.add_argument("--draft-tokens", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model, draft = models(args.layers, args.hidden, args.draft_layers, args.draft_noise)
+    tokenizer = ByteTokenizer()
+    prompt = tokenizer.encode(("Příliš žluťoučký kůň úpěl ďábelské ódy. " * 64))[:args.prompt_tokens]
+
+    expected, _, greedy_time = timed(DecodingEngine(model, tokenizer), prompt, args.new_tokens, args.repeat)
+    greedy_rate = len(expected) / greedy_time
+    print(f"{'draft tokens':>12} | {'acceptance':>10} | {'tokens/pass':>11} | {'tok/s':>8} | {'speedup':>7} | identical")
+    print(f"{'greedy':>12} | {'':>10} | {1:>11.2f} | {greedy_rate:>8.1f} | {1:>6.2f}x | yes")
+    for draft_tokens in args.draft_tokens:
+        engine = SpeculativeDecodingEngine(model, tokenizer, draft, num_draft_tokens=draft_tokens)
+        tokens, stats, elapsed = timed(engine, prompt, args.new_tokens, args.repeat)
+        rate = len(tokens) / elapsed
+        speculative = stats["speculative"]
+        print(f"{draft_tokens:>12} | {speculative['acceptance_rate']:>10.3f} | {speculative['speedup']:>11.2f} | {rate:>8.1f} | {rate / greedy_rate:>6.2f}x | {'yes' if tokens == expected else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_text_to_image.py
+"""Images/sec of TextToImageService batching on CPU, batch 1 vs 4.
+
+Uses a tiny random-weight Stable Diffusion pipeline built from configs, run
+through ``TextToImageService.generate`` exactly like ``process``:
+
+    python -m benchmarks.bench_text_to_image --images 8 --size 64
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import torch
+from diffusers import AutoencoderKL, DDIMScheduler, StableDiffusionPipeline, UNet2DConditionModel
+from transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+from paia.service.text_to_image import TextToImageService
+
+
+def tiny_pipeline(args):
+    directory = tempfile.mkdtemp()
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1}
+    for char in "abcdefghijklmnopqrstuvwxyz":
+        vocab[char] = len(vocab)
+        vocab[char + "</w>"] = len(vocab)
+    with open(os.path.join(directory, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(directory, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    tokenizer = CLIPTokenizer(os.path.join(directory, "vocab.json"), os.path.join(directory, "merges.txt"), model_max_length=77)
+
+    torch.manual_seed(0)
+    channels = (args.channels, args.channels * 2)
+    unet = UNet2DConditionModel(block_out_channels=channels, layers_per_block=1, sample_size=args.size // 8, in_channels=4, out_channels=4,
+                                down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"), up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+                                cross_attention_dim=32)
+    vae = AutoencoderKL(block_out_channels=channels, in_channels=3, out_channels=3, latent_channels=4,
+                        down_block_types=("DownEncoderBlock2D", "DownEncoderBlock2D"), up_block_types=("UpDecoderBlock2D", "UpDecoderBlock2D"))
+    text_encoder = CLIPTextModel(CLIPTextConfig(bos_token_id=0, eos_token_id=1, hidden_size=32, intermediate_size=37, num_attention_heads=4,
+                                                num_hidden_layers=2, vocab_size=len(vocab) + 10, max_position_embeddings=77))
+    pipeline = StableDiffusionPipeline(unet=unet, vae=vae, text_encoder=text_encoder, tokenizer=tokenizer, scheduler=DDIMScheduler(),
+                                       safety_checker=None, feature_extractor=None, requires_safety_checker=False)
+    pipeline.set_progress_bar_config(disable=True)
+    return pipeline
+
+
+def run(service, pipeline, args, batch_size):
+    prompts = ["a cat"] * args.images
+    started = time.perf_counter()
+    for _ in service.generate(pipeline, prompts, "ugly", args.size, args.size, args.steps, 6.3, seed=0, batch_size=batch_size):
+        pass
+    return args.images / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--channels", type=int, default=32)
+    args = parser.parse_args()
+
+    service = TextToImageService()
+    pipeline = tiny_pipeline(args)
+    run(service, pipeline, args, 1)  # warmup
+    print(f"{'batch':>5} | {'images/sec':>10} | {'pixels/sec':>12}")
+    for batch_size in (1, 4):
+        images_per_second = run(service, pipeline, args, batch_size)
+        print(f"{batch_size:>5} | {images_per_second:>10.2f} | {images_per_second * args.size ** 2:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
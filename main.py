@@ -16,6 +16,8 @@ class PAIAApplication:
         self.service_server_thread = None
         parser=argparse.ArgumentParser()
         parser.add_argument("--ui-autostart",required=False, choices=[True,False], dest='ui_autostart', type=bool, help='Automatically start User interface service')
+        parser.add_argument("--server",required=False, choices=["threading","asyncio"], dest='server', help='Service server implementation (default: server.engine from config)')
+        parser.add_argument("--gateway",required=False, action="store_true", dest='gateway', help='Route service calls to the backends of gateway.backends instead of serving them')
         self.args=parser.parse_args()
         
     def __getCurrentThread(self):
@@ -81,20 +83,41 @@ class PAIAApplication:
  
     
     def service_server(self):
+        engine = self.args.server or PAIAConfig().getConfig().get("server",{}).get("engine","threading")
         self.run_server(
             id="service",
             host="0.0.0.0",
             port=PAIAConfig().port,
-            server=PAIAServiceServer,
+            server=PAIAAsyncServiceServer if engine == "asyncio" else PAIAServiceServer,
             handler=PAIAServiceHandler,
             description="Service Server"
         )
 
+    def gateway_server(self):
+        self.run_server(
+            id="gateway",
+            host="0.0.0.0",
+            port=PAIAConfig().port,
+            server=PAIAGatewayServer,
+            handler=PAIAGatewayHandler,
+            description="Gateway Server"
+        )
+
     def run(self):
+        # Config file changes are picked up in the background, requests keep reading the current snapshot
+        PAIAConfig().watch()
+        gateway = self.args.gateway or PAIAConfig().getConfig().get("gateway",{}).get("enabled",False)
+        if gateway:
+            # The backends serve the models, the gateway only checks and routes to them
+            from paia.gateway import PAIAGateway
+            PAIAGateway().start()
+        else:
+            # Models of services with preload enabled load and warm up in the background
+            PAIAPreloader().start()
         if PAIAConfig().getConfig().get("ui",{}).get("autostart",True):
             self.ui_server_thread = threading.Thread(target=self.ui_server, name="UI Thread",)
             self.ui_server_thread.start()
-        self.service_server_thread = threading.Thread(target=self.service_server, daemon=True,name="Service Thread")
+        self.service_server_thread = threading.Thread(target=self.gateway_server if gateway else self.service_server, daemon=True,name="Service Thread")
         self.service_server_thread.start()
         while True:
             time.sleep(1)
@@ -3,16 +3,29 @@ __all__ = [
     "PAIASingleton",
     "PAIAConfig",
     "PAIALogger",
+    "PAIAMetrics",
+    "PAIAModelCache",
+    "PAIAMediaStore",
+    "PAIAResponseCache",
+    "PAIASingleFlight",
     "PAIAService",
     "PAIAServiceManager", 
-    "PAIAServiceServer","PAIAServiceHandler","PAIAUIServer","PAIAUIHandler", # ui server
+    "PAIAPreloader",
+    "PAIAServiceServer","PAIAServiceHandler","PAIAAsyncServiceServer","PAIAUIServer","PAIAUIHandler", # ui server
+    "PAIAGatewayServer","PAIAGatewayHandler", # gateway mode
 ]
 
 from .singleton import PAIASingleton
 from .config import PAIAConfig
 from .logger import PAIALogger
+from .metrics import PAIAMetrics
+from .model_cache import PAIAModelCache
+from .media_store import PAIAMediaStore
+from .response_cache import PAIAResponseCache
+from .single_flight import PAIASingleFlight
 from .service.service import PAIAService
 from .service.manager import PAIAServiceManager 
-from .server import PAIAServiceServer, PAIAServiceHandler, PAIAUIServer, PAIAUIHandler
+from .preload import PAIAPreloader
+from .server import PAIAServiceServer, PAIAServiceHandler, PAIAAsyncServiceServer, PAIAUIServer, PAIAUIHandler, PAIAGatewayServer, PAIAGatewayHandler
 
 
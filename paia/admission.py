@@ -0,0 +1,188 @@
+# paia/admission.py
+import collections
+import math
+import threading
+import time
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger
+
+
+class PAIAQueueFull(Exception):
+    """The service queue is at ``max_queue``, retry after ``retry_after`` seconds."""
+
+    def __init__(self, service_name: str, retry_after: int):
+        super().__init__(f"Service '{service_name}' is busy, queue is full")
+        self.retry_after = retry_after
+
+
+class PAIAQueueTimeout(Exception):
+    """A request waited longer than ``max_wait`` for its turn."""
+
+    def __init__(self, service_name: str, retry_after: int):
+        super().__init__(f"Service '{service_name}' is busy, waited too long in queue")
+        self.retry_after = retry_after
+
+
+class PAIAQueueTicket:
+    """A request's place in a service queue, granted when it may run."""
+
+    def __init__(self, queue: "PAIAServiceQueue"):
+        self.queue = queue
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + queue.max_wait if queue.max_wait > 0 else None
+        self.granted_at = None
+        self.released = False
+        self._granted = threading.Event()
+        self._callbacks = []
+
+    @property
+    def granted(self) -> bool:
+        return self._granted.is_set()
+
+    @property
+    def position(self) -> int:
+        """1-based place in the queue, 0 once granted."""
+        return self.queue.position(self)
+
+    def remaining(self) -> float | None:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._granted.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """Call ``callback(ticket)`` once granted (from the releasing thread)."""
+        with self.queue._lock:
+            if not self.granted:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def cancel(self):
+        """Leave the queue, or give the slot back when already granted."""
+        self.queue.release(self)
+
+    release = cancel
+
+    def _grant(self):
+        self.granted_at = time.monotonic()
+        self._granted.set()
+        callbacks, self._callbacks = self._callbacks, []
+        return callbacks
+
+
+class PAIAServiceQueue:
+    """FIFO admission for one service: at most ``max_concurrency`` requests
+    run, at most ``max_queue`` wait (0 = unlimited) for up to ``max_wait``
+    seconds."""
+
+    def __init__(self, service_name: str, max_concurrency: int = 1, max_queue: int = 0, max_wait: float = 0):
+        self.service_name = service_name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = int(max_queue)
+        self.max_wait = float(max_wait)
+        self._lock = threading.Lock()
+        self._waiting: collections.deque[PAIAQueueTicket] = collections.deque()
+        self.running = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving average of how long a request holds its slot, for Retry-After
+        self.average_seconds = 1.0
+
+    def submit(self) -> PAIAQueueTicket:
+        """Take a ticket, granted at once when a slot is free. Raises PAIAQueueFull."""
+        ticket = PAIAQueueTicket(self)
+        with self._lock:
+            if self.running < self.max_concurrency and not self._waiting:
+                self.running += 1
+                ticket._grant()
+                return ticket
+            if self.max_queue and len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                raise PAIAQueueFull(self.service_name, self._retry_after(len(self._waiting) + 1))
+            self._waiting.append(ticket)
+        PAIALogger().debug("Queued %s request at position %s", self.service_name, len(self._waiting))
+        return ticket
+
+    def expire(self, ticket: PAIAQueueTicket) -> PAIAQueueTimeout | None:
+        """Drop a ticket past its deadline, returns the error to answer with."""
+        with self._lock:
+            if ticket.granted or ticket not in self._waiting:
+                return None
+            self._waiting.remove(ticket)
+            ticket.released = True
+            self.timed_out += 1
+            return PAIAQueueTimeout(self.service_name, self._retry_after(len(self._waiting) + 1))
+
+    def release(self, ticket: PAIAQueueTicket):
+        callbacks = []
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self.running -= 1
+                held = time.monotonic() - ticket.granted_at
+                self.average_seconds = 0.8 * self.average_seconds + 0.2 * held
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+            while self.running < self.max_concurrency and self._waiting:
+                self.running += 1
+                granted = self._waiting.popleft()
+                callbacks.extend((granted, callback) for callback in granted._grant())
+        for granted, callback in callbacks:
+            callback(granted)
+
+    def position(self, ticket: PAIAQueueTicket) -> int:
+        with self._lock:
+            if ticket.granted:
+                return 0
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def _retry_after(self, position: int) -> int:
+        return max(1, math.ceil(self.average_seconds * position / self.max_concurrency))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "waiting": len(self._waiting),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "max_wait": self.max_wait,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "average_seconds": round(self.average_seconds, 3),
+            }
+
+
+class PAIAAdmission(metaclass=PAIASingleton):
+    """Per-service queues from ``services.<name>.admission``::
+
+        "admission": {"max_concurrency": 1, "max_queue": 8, "max_wait": 120}
+
+    Services without the section are not limited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: dict[str, PAIAServiceQueue] = {}
+
+    def queue(self, service_name: str) -> PAIAServiceQueue | None:
+        with self._lock:
+            if service_name not in self._queues:
+                config = PAIAConfig().service(service_name).get("admission")
+                self._queues[service_name] = PAIAServiceQueue(
+                    service_name,
+                    max_concurrency=config.get("max_concurrency", 1),
+                    max_queue=config.get("max_queue", 0),
+                    max_wait=config.get("max_wait", 0),
+                ) if config else None
+            return self._queues[service_name]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: queue.stats() for name, queue in self._queues.items() if queue is not None}
@@ -0,0 +1,108 @@
+# paia/backend.py
+import contextlib
+import os
+import threading
+import torch
+
+from paia import PAIAConfig, PAIALogger
+
+
+class PAIABackend:
+    """Execution settings of one service, from ``services.<name>.backend``.
+
+    Example::
+
+        "backend": {"device": "cpu", "quantization": "int8", "autocast": "bfloat16",
+                    "intra_op_threads": 8, "inter_op_threads": 2}
+
+    ``device`` is ``auto`` (cuda when available), ``cpu`` or ``cuda``.
+    On CPU, ``quantization: int8`` applies dynamic int8 quantization to the
+    Linear layers and ``autocast`` runs forward passes in bfloat16 when the
+    CPU supports it (``auto`` enables it only then). Thread counts are
+    process wide, the first service that sets them wins.
+    """
+
+    _threads_lock = threading.Lock()
+    _threads_configured = False
+
+    def __init__(self, service_name: str, default_dtype: torch.dtype = torch.float16, config: dict = None):
+        self.service_name = service_name
+        if config is None:
+            config = PAIAConfig().service(service_name).get("backend", {})
+        self.config = config
+        device = config.get("device", "auto")
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device(device)
+        self.is_cpu = self.device.type == "cpu"
+
+        if config.get("dtype"):
+            self.dtype = getattr(torch, config["dtype"])
+        else:
+            # Half precision matmuls are slow on CPU and dynamic quantization needs float32 weights
+            self.dtype = torch.float32 if self.is_cpu else default_dtype
+
+        self.quantization = config.get("quantization") if self.is_cpu else None
+        if self.quantization not in (None, "int8"):
+            PAIALogger().warning(f"Unsupported quantization '{self.quantization}' for {service_name}, ignoring")
+            self.quantization = None
+
+        autocast = config.get("autocast")
+        self.autocast_dtype = None
+        if self.is_cpu and autocast:
+            if autocast == "auto":
+                self.autocast_dtype = torch.bfloat16 if self.cpu_supports_bfloat16() else None
+            else:
+                self.autocast_dtype = getattr(torch, autocast)
+                if self.autocast_dtype == torch.bfloat16 and not self.cpu_supports_bfloat16():
+                    PAIALogger().warning(f"CPU has no native bfloat16 support, autocast for {service_name} will be slow")
+        self._configure_threads(config)
+        PAIALogger().info("Backend for %s: device=%s, dtype=%s, quantization=%s, autocast=%s", service_name, self.device, self.dtype, self.quantization, self.autocast_dtype)
+
+    @staticmethod
+    def cpu_supports_bfloat16() -> bool:
+        """True when the CPU has native bfloat16 instructions (AVX512-BF16 or AMX)."""
+        try:
+            if os.path.exists("/proc/cpuinfo"):
+                with open("/proc/cpuinfo") as f:
+                    for line in f:
+                        if line.startswith("flags"):
+                            flags = line.split()
+                            return "avx512_bf16" in flags or "amx_bf16" in flags
+            return torch.backends.cpu.get_cpu_capability() in ("AVX512_BF16", "AMX")
+        except Exception:
+            return False
+
+    @classmethod
+    def _configure_threads(cls, config: dict):
+        intra = config.get("intra_op_threads")
+        inter = config.get("inter_op_threads")
+        if not intra and not inter:
+            return
+        with cls._threads_lock:
+            if cls._threads_configured:
+                return
+            cls._threads_configured = True
+            if intra:
+                torch.set_num_threads(int(intra))
+            if inter:
+                try:
+                    torch.set_num_interop_threads(int(inter))
+                except RuntimeError as e:
+                    # Only possible before the first parallel work in the process
+                    PAIALogger().warning(f"Could not set inter-op threads: {str(e)}")
+            PAIALogger().info("Torch threads: intra_op=%s, inter_op=%s", torch.get_num_threads(), torch.get_num_interop_threads())
+
+    def prepare(self, model: torch.nn.Module) -> torch.nn.Module:
+        """Move ``model`` to the device and quantize it if configured."""
+        model = model.to(self.device)
+        model.eval()
+        if self.quantization == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def autocast(self):
+        """Context manager for forward passes."""
+        if self.autocast_dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=self.autocast_dtype)
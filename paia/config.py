@@ -1,40 +1,119 @@
 # ai/PAIAConfig().py
 import os
+import copy
 import json
+import logging
+import threading
 from .singleton import PAIASingleton
 
+logger = logging.getLogger("PAIAService.config")
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes, still JSON serializable."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Config snapshots are read only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+EMPTY = FrozenDict()
+
+
+class PAIAConfigSnapshot:
+    """One loaded config, never changed after it is built.
+
+    Readers take ``PAIAConfig().snapshot`` (or ``getConfig()``) once and
+    see one consistent config, a reload builds a new snapshot and swaps it.
+    """
+
+    def __init__(self, config: dict, config_file: str = None, mtimes: dict = None, version: int = 0):
+        self.config = freeze(config)
+        self.config_file = config_file
+        # Files the snapshot was built from, path -> mtime (None when missing)
+        self.mtimes = mtimes or {}
+        self.version = version
+        self.services = self.config.get("services", EMPTY)
+        server = self.config.get("server", EMPTY)
+        ui = self.config.get("ui", EMPTY)
+        logging_config = self.config.get("logging", EMPTY)
+        self.host = server.get("host", "localhost")
+        self.port = int(server.get("port", 8000))
+        self.ui_dir = ui.get("directory", "ui")
+        self.ui_host = ui.get("host", "localhost")
+        self.ui_port = int(ui.get("port", 8080))
+        self.logging_level = logging_config.get("level", "DEBUG")
+        self.logging_dir = logging_config.get("dir", ".")
+
+    def service(self, name: str) -> FrozenDict:
+        return self.services.get(name, EMPTY)
+
+
 class PAIAConfig(metaclass=PAIASingleton):
     DEFAULT_CONFIG =  {
-    "server": {"host": "localhost", "port": 8000},
+    "server": {"host": "localhost", "port": 8000, "engine": "threading", "workers": 32, "keepalive_timeout": 75},
     "ui": {"directory": "ui","host":"localhost","port":8080,"autostart":True},
-    "logging": {"level": "DEBUG", "dir": ".", "file_name":"app.log"},
+    "logging": {"level": "DEBUG", "dir": ".", "file_name":"app.log", "async": True, "json": False, "max_payload": 1000, "sampling": {"token": 100, "sse": 100}},
+    "model_cache": {"max_bytes": 0, "idle_timeout": 0, "pinned": []},
+    "response_cache": {"memory_bytes": 67108864, "disk_bytes": 1073741824, "ttl": 86400},
+    "media_store": {"memory_bytes": 67108864, "disk_bytes": 1073741824, "ttl": 86400, "directory": "media", "cleanup_interval": 300, "encode_workers": 2},
     "services": {
-        "translate": {"enabled": True, "streamable": False, "parameters": []},
-        "text-generator": {"enabled": True, "streamable": False, "parameters": []}
+        "translate": {"enabled": True, "streamable": True, "parameters": [], "batch_size": 8, "max_segment_chars": 400,
+                      "preload": False, "preload_pairs": [["cs", "en"], ["en", "cs"]],
+                      "cache": {"enabled": True, "parameters": ["text", "source_language", "target_language"]}, "coalesce": {"enabled": True}},
+        "chat": {"history": {"max_tokens": 1024, "keep_ratio": 0.75, "summary_tokens": 96}},
+        "text-generator": {"enabled": True, "streamable": False, "parameters": [], "batching": {"enabled": True, "max_batch_size": 8}, "draft_model": None, "num_draft_tokens": 4},
+        "text-to-image": {"admission": {"max_concurrency": 1, "max_queue": 8, "max_wait": 120}, "max_batch_size": 8, "max_batch_pixels": 1048576, "max_images": 8, "max_prompts": 8,
+                          "cache": {"enabled": True, "parameters": ["text", "num_images", "height", "width", "guidance_scale", "num_inference_steps", "negative_prompt", "seed", "format", "quality"], "required": ["seed"]}, "coalesce": {"enabled": True}},
+        "text-to-speech": {"streamable": True, "engine": "local", "lang": "cs", "voice": None, "max_segment_chars": 300, "sentence_cache_entries": 4096, "preload": False,
+                           "voices": {"local": {}, "gtts": {"com": "com", "co.uk": "co.uk", "com.au": "com.au", "ca": "ca", "co.in": "co.in", "ie": "ie", "co.za": "co.za"}},
+                           "cache": {"enabled": True, "parameters": ["text", "lang", "voice", "engine"]}, "coalesce": {"enabled": True}}
         },
+    "gateway": {"enabled": False, "backends": [], "health_interval": 5, "fail_threshold": 2, "connect_timeout": 5, "timeout": 600},
+    "config": {"watch_interval": 2},
     "is_default": True
     }
-    config = DEFAULT_CONFIG
-    host = "localhost"
-    port = 8000
-    ui_dir = "ui"
-    logging_level = "DEBUG"
-    logging_dir = "."
     base_dir = os.path.dirname(os.path.abspath(__file__))
     root_dir = os.path.abspath(os.path.join(base_dir,".."))
     config_file = os.path.abspath(os.path.join(base_dir,"..","config.json"))
-    
 
     def __init__(self, config_file: str = None):
-        self.configLoaded = False
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._watcher = None
+        self._stopped = threading.Event()
+        self.snapshot = None
         self.__loadConfig(config_file)
-       
+
     def getDefault(self):
         return self.DEFAULT_CONFIG
-    
+
+    # Hot path: one attribute read, no I/O
     def getConfig(self):
-        self.__loadConfig()
-        return self.config
+        return self.snapshot.config
+
+    def service(self, service_name: str):
+        """Config section of one service, empty when not configured."""
+        return self.snapshot.service(service_name)
+
+    @property
+    def config(self):
+        return self.snapshot.config
 
     def update(self, config_file: str = None):
         self.__loadConfig(config_file)
@@ -46,87 +125,139 @@ class PAIAConfig(metaclass=PAIASingleton):
     def getUIAddress(self,ui_dir :str = None) -> str:
         return f"http://{self.ui_host}:{self.ui_port}"
 
+    def getServiceAddress(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def subscribe(self, callback):
+        """Call ``callback(old, new)`` with both snapshots whenever the config is reloaded."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def watch(self, interval: float = None):
+        """Reload in the background whenever the config file or a service config changes."""
+        if interval is None:
+            interval = float(self.getConfig().get("config", {}).get("watch_interval", 2))
+        with self._lock:
+            if self._watcher is not None or interval <= 0:
+                return
+            self._stopped.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True, name="Config watcher")
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stopped.set()
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None and watcher is not threading.current_thread():
+            watcher.join()
+
+    def changed(self) -> bool:
+        """Whether a file the current snapshot was built from changed since."""
+        return any(self._mtime(path) != mtime for path, mtime in self.snapshot.mtimes.items())
+
+    def _watch(self, interval: float):
+        while not self._stopped.wait(interval):
+            try:
+                if self.changed():
+                    logger.info("Config changed, reloading")
+                    self.__loadConfig()
+            except Exception as e:
+                logger.error(f"Config reload failed: {str(e)}")
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
 
-    def __loadConfig(self, config_file: str = None, force_reload : bool = False) -> bool:  
-        # File changed - force reload automatically 
-        if config_file and config_file != self.config_file:
-            self.configLoaded = False
+    def __loadConfig(self, config_file: str = None):
+        """Build a new snapshot from the files and swap it in."""
+        if config_file:
             self.config_file = config_file
-        # Force reload from file 
-        if force_reload:
-            self.configLoaded = False
-        
-        # If actual , return
-        if self.configLoaded:
-            return self.config
-        
+        mtimes = {}
+
         # Load config from file
-        res = False
-        try:
-            print(f"Attempting to load config from: {self.config_file}")
-            if not os.path.exists(self.config_file):
-                print(f"Config file does not exist at: {self.config_file}")
-                raise FileNotFoundError
-            with open(self.config_file, "r") as f:
-                self.config = json.load(f)
-            res = True
-        except FileNotFoundError:
-            print(f"PAIAConfig().json not found at {self.config_file}, using defaults")
-        except (KeyError, json.JSONDecodeError) as e:
-            print(f"Invalid PAIAConfig().json at {self.config_file}: {str(e)}, using defaults")
-        except PermissionError as e:
-            print(f"Permission denied for PAIAConfig().json at {self.config_file}: {str(e)}, using defaults")
-        
-        if not res:
-            self.config = self.getDefault()
-            self.config_file = None
-            print("Loading default config ( file not found or error )")
-                
-        self.__populateFromJSON(self.config)
-        print(f"Loaded config: host={self.host}, port={self.port}, ui_dir={self.ui_dir}, logging_level={self.logging_level}, logging_dir={self.logging_dir}")
+        config = None
+        if self.config_file:
+            mtimes[self.config_file] = self._mtime(self.config_file)
+            try:
+                logger.debug("Loading config from: %s", self.config_file)
+                with open(self.config_file, "r") as f:
+                    config = json.load(f)
+                if not isinstance(config, dict):
+                    raise ValueError("config is not an object")
+            except FileNotFoundError:
+                logger.info("Config not found at %s, using defaults", self.config_file)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Invalid config at {self.config_file}: {str(e)}, using defaults")
+                config = None
+            except PermissionError as e:
+                logger.warning(f"Permission denied for config at {self.config_file}: {str(e)}, using defaults")
+        if config is None:
+            config = copy.deepcopy(self.getDefault())
 
         # Load service-specific configs, overriding matching nodes
         service_dir = os.path.join(self.base_dir, "service")
-        for service_name in self.config.get("services", {}):
+        services = config.setdefault("services", {})
+        for service_name in list(services):
             service_config_path = os.path.join(service_dir, f"{service_name.replace('-', '_')}.json")
+            mtimes[service_config_path] = self._mtime(service_config_path)
+            if mtimes[service_config_path] is None:
+                continue
             try:
-                print(f"Attempting to load service config from: {service_config_path}")
-                if os.path.exists(service_config_path):
-                    with open(service_config_path, "r") as f:
-                        service_config = json.load(f)
-                        # Update global config with service-specific values
-                        self._merge_service_config(service_name, self.config["services"], service_config)
-                        print(f"Updated service config for {service_name}: {self.config['services'][service_name]}")
-                else:
-                    print(f"No service config found for {service_name} at {service_config_path}")
+                with open(service_config_path, "r") as f:
+                    self._merge_service_config(service_name, services, json.load(f))
+                logger.debug("Updated service config for %s from %s", service_name, service_config_path)
             except (json.JSONDecodeError, KeyError) as e:
-                print(f"Invalid service config at {service_config_path}: {str(e)}")
+                logger.warning(f"Invalid service config at {service_config_path}: {str(e)}")
             except PermissionError as e:
-                print(f"Permission denied for service config at {service_config_path}: {str(e)}")
-        
-        self.configLoaded = True
+                logger.warning(f"Permission denied for service config at {service_config_path}: {str(e)}")
+
+        return self.__swap(config, mtimes)
+
+    def apply(self, config: dict):
+        """Swap in a snapshot of ``config`` loaded elsewhere, e.g. a worker process gets its parent's config."""
+        return self.__swap(copy.deepcopy(config), {})
+
+    def __swap(self, config: dict, mtimes: dict):
+        with self._lock:
+            old = self.snapshot
+            self.snapshot = PAIAConfigSnapshot(config, self.config_file, mtimes, 0 if old is None else old.version + 1)
+            subscribers = list(self._subscribers) if old is not None else []
+            self.__populateFromSnapshot(self.snapshot)
+        logger.info("Loaded config: host=%s, port=%s, ui_dir=%s, logging_level=%s, logging_dir=%s", self.host, self.port, self.ui_dir, self.logging_level, self.logging_dir)
+        for callback in subscribers:
+            try:
+                callback(old, self.snapshot)
+            except Exception as e:
+                logger.error(f"Config subscriber failed: {str(e)}")
         return True
 
-    def __populateFromJSON(self, config: json):
-        self.config = config
-        self.host = self.config.get("server",{}).get("host","localhost")
-        self.port =  int(self.config.get("server",{}).get("port",8000))
-        self.ui_dir = self.config.get("ui",{}).get("directory","ui")
-        self.ui_host = self.config.get("ui",{}).get("host","localhost")
-        self.ui_port =  int(self.config.get("ui",{}).get("port",8080))
-        self.logging_level = self.config.get("logging",{}).get("level","DEBUG")
-        self.logging_dir = self.config.get("logging",{}).get("dir","localhost")
-
-
-
-    def _merge_service_config(self, service_name ,global_config, service_config):
-        """ Autocreate in global config """
-        if not global_config.get(service_name):
-            global_config.set(service_name, {})
-
-        """Recursively update global_config with service_config values."""
-        for key, value in service_config.items():
-            if isinstance(value, dict) and key in global_config[service_name] and isinstance(global_config[service_name][key], dict):
-                self._merge_service_config(global_config[service_name][key], value)
-            else:   
-                global_config[service_name][key] = value
+    def __populateFromSnapshot(self, snapshot: PAIAConfigSnapshot):
+        self.host = snapshot.host
+        self.port = snapshot.port
+        self.ui_dir = snapshot.ui_dir
+        self.ui_host = snapshot.ui_host
+        self.ui_port = snapshot.ui_port
+        self.logging_level = snapshot.logging_level
+        self.logging_dir = snapshot.logging_dir
+
+    def _merge_service_config(self, service_name, global_config, service_config):
+        """Update ``global_config[service_name]`` with the service config, creating it when missing."""
+        if not isinstance(global_config.get(service_name), dict):
+            global_config[service_name] = {}
+        self._merge(global_config[service_name], service_config)
+
+    def _merge(self, target: dict, source: dict):
+        """Recursively update ``target`` with ``source`` values."""
+        for key, value in source.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                self._merge(target[key], value)
+            else:
+                target[key] = value
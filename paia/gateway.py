@@ -0,0 +1,191 @@
+# paia/gateway.py
+import http.client
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger
+
+
+class PAIAGatewayNode:
+    """A PAIA node behind the gateway and what its last health check reported."""
+
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlsplit(url if "://" in url else f"http://{url}")
+        self.url = f"{parsed.scheme}://{parsed.netloc}"
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        # Not routed to until its first successful check
+        self.healthy = False
+        self.ready = False
+        self.failures = 0
+        self.services: list[str] = []
+        self.manifest: dict = {}
+        self.queues: dict = {}
+        self.in_flight = 0
+        self.checked = None
+        self.error = None
+
+    def connection(self, timeout: float) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def load(self, service_name: str) -> int:
+        """Requests this gateway has in flight plus what the backend reported running and waiting."""
+        queue = self.queues.get(service_name, {})
+        return self.in_flight + queue.get("running", 0) + queue.get("waiting", 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "ready": self.ready,
+            "failures": self.failures,
+            "services": self.services,
+            "in_flight": self.in_flight,
+            "queues": self.queues,
+            "checked": self.checked,
+            "error": self.error,
+        }
+
+
+class PAIAGateway(metaclass=PAIASingleton):
+    """Routes service calls across PAIA backends, from the ``gateway`` config section::
+
+        "gateway": {"backends": ["http://gpu-1:8000", "http://cpu-1:8000"], "health_interval": 5,
+                    "fail_threshold": 2, "connect_timeout": 5, "timeout": 600}
+
+    A background thread reads every backend's ``/health/ready``,
+    ``/services`` and ``/queues`` each ``health_interval`` seconds. A backend
+    is ejected after ``fail_threshold`` failed checks or requests in a row and
+    routed to again after its next successful check. A request goes to the
+    ready backend serving its service with the lowest load.
+    """
+
+    def __init__(self):
+        config = PAIAConfig().getConfig().get("gateway", {})
+        self.backends = [PAIAGatewayNode(url) for url in config.get("backends", [])]
+        self.health_interval = float(config.get("health_interval", 5))
+        self.fail_threshold = max(1, int(config.get("fail_threshold", 2)))
+        self.connect_timeout = float(config.get("connect_timeout", 5))
+        self.timeout = float(config.get("timeout", 600))
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._checker = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Check every backend once, then keep checking in the background."""
+        self.check()
+        with self._lock:
+            if self._checker is not None or self.health_interval <= 0:
+                return
+            self._stopped.clear()
+            self._checker = threading.Thread(target=self._check_loop, daemon=True, name="Gateway health check")
+        self._checker.start()
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            checker, self._checker = self._checker, None
+        if checker is not None:
+            checker.join()
+
+    def _check_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            self.check()
+
+    def check(self):
+        for backend in self.backends:
+            self.check_backend(backend)
+
+    def _get_json(self, backend: PAIAGatewayNode, path: str) -> tuple[int, dict]:
+        connection = backend.connection(self.connect_timeout)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def check_backend(self, backend: PAIAGatewayNode):
+        try:
+            status, _ = self._get_json(backend, "/health/ready")
+            _, services = self._get_json(backend, "/services")
+            _, queues = self._get_json(backend, "/queues")
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            self.failed(backend, e)
+            return
+        with self._lock:
+            backend.services = list(services.get("services", []))
+            backend.manifest = services.get("manifest", {})
+            backend.queues = queues
+            # Still loading its models, healthy but not routed to yet
+            backend.ready = status == 200
+            backend.checked = time.time()
+        self.succeeded(backend)
+
+    def failed(self, backend: PAIAGatewayNode, error: Exception):
+        with self._lock:
+            backend.failures += 1
+            backend.error = str(error) or type(error).__name__
+            ejected = backend.healthy and backend.failures >= self.fail_threshold
+            if ejected:
+                backend.healthy = False
+        if ejected:
+            PAIALogger().warning(f"Backend {backend.url} ejected after {backend.failures} failures: {backend.error}")
+        else:
+            PAIALogger().debug("Backend %s failed: %s", backend.url, backend.error)
+
+    def succeeded(self, backend: PAIAGatewayNode):
+        with self._lock:
+            restored = not backend.healthy
+            backend.healthy = True
+            backend.failures = 0
+            backend.error = None
+        if restored:
+            PAIALogger().info("Backend %s is healthy", backend.url)
+
+    def services(self) -> dict:
+        """``/services`` of every healthy backend merged, as one node would answer it."""
+        names, manifest = [], {}
+        with self._lock:
+            for backend in self.backends:
+                if not backend.healthy:
+                    continue
+                for name in backend.services:
+                    if name not in manifest:
+                        names.append(name)
+                        manifest[name] = backend.manifest.get(name, {})
+        return {"services": names, "manifest": manifest}
+
+    def known(self, service_name: str) -> bool:
+        """Whether any backend served ``service_name`` at its last check."""
+        with self._lock:
+            return any(service_name in backend.services for backend in self.backends)
+
+    def candidates(self, service_name: str) -> list[PAIAGatewayNode]:
+        """Ready backends serving ``service_name``, least loaded first, taking turns on ties."""
+        with self._lock:
+            backends = [backend for backend in self.backends if backend.healthy and backend.ready and service_name in backend.services]
+            if not backends:
+                return []
+            turn = next(self._turn) % len(backends)
+            backends = backends[turn:] + backends[:turn]
+            return sorted(backends, key=lambda backend: backend.load(service_name))
+
+    def begin(self, backend: PAIAGatewayNode):
+        with self._lock:
+            backend.in_flight += 1
+
+    def end(self, backend: PAIAGatewayNode):
+        with self._lock:
+            backend.in_flight -= 1
+
+    def ready(self) -> bool:
+        with self._lock:
+            return any(backend.healthy and backend.ready for backend in self.backends)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {backend.url: backend.to_dict() for backend in self.backends}
@@ -0,0 +1,4 @@
+# paia/generation/__init__.py
+# Shared text generation building blocks used by the text services.
+# Modules are imported explicitly (paia.generation.decoding, ...) so that
+# importing the package does not pull in torch.
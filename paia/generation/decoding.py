@@ -0,0 +1,270 @@
+# paia/generation/decoding.py
+import collections
+import contextlib
+import threading
+import time
+import torch
+
+from paia import PAIALogger
+from paia.generation.logits import greedy, select_tokens
+from paia.generation.stopping import StopSequenceMatcher
+
+
+def resolve_eos_ids(tokenizer, model=None, eos_token_id=None) -> set[int]:
+    """Collect every token id that ends a sequence (tokenizer and generation config)."""
+    candidates = [eos_token_id]
+    if tokenizer is not None:
+        candidates.append(getattr(tokenizer, "eos_token_id", None))
+    generation_config = getattr(model, "generation_config", None)
+    if generation_config is not None:
+        candidates.append(getattr(generation_config, "eos_token_id", None))
+    result = set()
+    for candidate in candidates:
+        if candidate is None:
+            continue
+        if isinstance(candidate, (list, tuple, set)):
+            result.update(int(c) for c in candidate)
+        else:
+            result.add(int(candidate))
+    return result
+
+
+def cache_to_layers(past_key_values) -> list[tuple]:
+    """Return the model cache as a list of per-layer (key, value) tensors."""
+    if past_key_values is None:
+        return None
+    if isinstance(past_key_values, (tuple, list)):
+        return [tuple(layer) for layer in past_key_values]
+    if hasattr(past_key_values, "layers"):
+        return [(layer.keys, layer.values) for layer in past_key_values.layers]
+    if hasattr(past_key_values, "key_cache"):
+        return list(zip(past_key_values.key_cache, past_key_values.value_cache))
+    return [tuple(layer) for layer in past_key_values.to_legacy_cache()]
+
+
+def layers_to_cache(layers: list[tuple], like=None):
+    """Build a cache of the same kind as ``like`` from per-layer (key, value) tensors."""
+    if like is None or isinstance(like, (tuple, list)):
+        return tuple(layers)
+    cache_class = type(like)
+    if hasattr(cache_class, "from_legacy_cache"):
+        return cache_class.from_legacy_cache(tuple(layers))
+    return cache_class(tuple(layers))
+
+
+def crop_cache(past_key_values, length: int):
+    """Keep only the first ``length`` positions of a model cache."""
+    layers = cache_to_layers(past_key_values)
+    if layers is None or length <= 0:
+        return None
+    return layers_to_cache([(key[:, :, :length, :], value[:, :, :length, :]) for key, value in layers], past_key_values)
+
+
+def cache_nbytes(past_key_values) -> int:
+    layers = cache_to_layers(past_key_values) or []
+    return sum(key.numel() * key.element_size() + value.numel() * value.element_size() for key, value in layers)
+
+
+# Stop string lists come from clients, only the most recently used matchers are kept per engine
+STOP_MATCHERS = 16
+_stop_matchers_lock = threading.Lock()
+
+
+def stop_matcher(engine, strings: list[str]) -> StopSequenceMatcher | None:
+    """Matcher of the stop ``strings`` in the engine's tokens, recent sets of strings are reused."""
+    if not strings:
+        return None
+    key = tuple(strings)
+    with _stop_matchers_lock:
+        matcher = engine._stop_matchers.get(key)
+        if matcher is not None:
+            engine._stop_matchers.move_to_end(key)
+            return matcher
+    matcher = StopSequenceMatcher.from_strings(engine.tokenizer, key)
+    with _stop_matchers_lock:
+        engine._stop_matchers[key] = matcher
+        while len(engine._stop_matchers) > STOP_MATCHERS:
+            engine._stop_matchers.popitem(last=False)
+    return matcher
+
+
+class IncrementalDetokenizer:
+    """Turn a stream of token ids into text deltas.
+
+    Only a short window of tokens is decoded per step instead of the whole
+    sequence. Text is held back while the window ends in an incomplete UTF-8
+    character (byte-fallback tokens) and the window keeps the previous tokens
+    as context, so merged tokens and leading spaces come out right.
+    """
+
+    def __init__(self, tokenizer, prompt_ids: list[int] = None, skip_special_tokens: bool = True, context: int = 5):
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.token_ids = list(prompt_ids[-context:]) if prompt_ids else []
+        self.prefix_offset = 0
+        self.read_offset = len(self.token_ids)
+        self.text = ""
+
+    def _decode(self, token_ids: list[int]) -> str:
+        return self.tokenizer.decode(token_ids, skip_special_tokens=self.skip_special_tokens, clean_up_tokenization_spaces=False)
+
+    def push(self, token_id: int) -> str:
+        """Add one token, return the text that became stable (may be empty)."""
+        self.token_ids.append(token_id)
+        prefix_text = self._decode(self.token_ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.token_ids[self.prefix_offset:])
+        if len(new_text) <= len(prefix_text) or new_text.endswith("\ufffd"):
+            return ""
+        delta = new_text[len(prefix_text):]
+        # Drop tokens that are no longer needed as context
+        del self.token_ids[:self.read_offset]
+        self.prefix_offset = 0
+        self.read_offset = len(self.token_ids)
+        self.text += delta
+        return delta
+
+    def flush(self) -> str:
+        """Emit text still held back when the stream ends."""
+        if self.read_offset >= len(self.token_ids):
+            return ""
+        prefix_text = self._decode(self.token_ids[self.prefix_offset:self.read_offset])
+        new_text = self._decode(self.token_ids[self.prefix_offset:])
+        delta = new_text[len(prefix_text):]
+        self.read_offset = len(self.token_ids)
+        self.text += delta
+        return delta
+
+
+class DecodingStream:
+    """Iterator over the token ids generated for one sequence.
+
+    When iteration ends, ``past_key_values`` holds the model cache for the
+    first ``cached_len`` ids of ``token_ids`` (prompt + generated tokens), so a
+    follow-up call only has to feed ``token_ids[cached_len:]``.
+    """
+
+    def __init__(self, engine, token_ids: list[int], max_new_tokens: int, eos_token_ids: set[int], past_key_values=None, cached_len: int = 0, select=None, stop: StopSequenceMatcher = None):
+        self.engine = engine
+        self.token_ids = list(token_ids)
+        self.prompt_len = len(self.token_ids)
+        self.max_new_tokens = max_new_tokens
+        self.eos_token_ids = eos_token_ids
+        self.past_key_values = past_key_values if cached_len else None
+        self.cached_len = cached_len if past_key_values is not None else 0
+        self.select = select or greedy
+        # Tokens that may start a stop sequence are held back until it is clear they do not
+        self.stop = stop.start() if stop is not None else None
+        self.finish_reason = None
+        self.stats = {}
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        if self._iterator is None:
+            self._iterator = self._run()
+        return next(self._iterator)
+
+    def close(self):
+        if self._iterator is None:
+            self._iterator = iter(())
+        else:
+            self._iterator.close()
+
+    def _release(self, token_id: int) -> list[int]:
+        """The tokens to yield now that ``token_id`` was generated, sets ``finish_reason`` to "stop" on a stop sequence."""
+        if self.stop is None:
+            return [token_id]
+        released = self.stop.push(token_id)
+        if self.stop.stopped:
+            self.finish_reason = "stop"
+        return released
+
+    def _run(self):
+        model = self.engine.model
+        device = self.engine.device
+        new_ids = self.token_ids[self.cached_len:]
+        if not new_ids:
+            raise ValueError("DecodingStream needs at least one uncached token")
+
+        # One mask for the whole request, sliced per step instead of re-concatenated
+        attention_mask = torch.ones((1, self.prompt_len + self.max_new_tokens), dtype=torch.long, device=device)
+        input_ids = torch.tensor([new_ids], dtype=torch.long, device=device)
+        generated = 0
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            for _ in range(self.max_new_tokens):
+                seq_len = len(self.token_ids)
+                # Grad mode is thread local, keep it scoped to the step so the
+                # stream can be resumed from any thread (asyncio server executor)
+                with torch.inference_mode(), self.engine.autocast():
+                    outputs = model(input_ids=input_ids, attention_mask=attention_mask[:, :seq_len], past_key_values=self.past_key_values, use_cache=True)
+                    next_token = select_tokens(outputs.logits[:, -1, :], [self.select], [self.token_ids])
+                self.past_key_values = outputs.past_key_values
+                self.cached_len = seq_len
+                # Feed only the newest token on the next step
+                input_ids = next_token.view(1, 1)
+                # Single host transfer per step, shared by EOS check and detokenization
+                token_id = next_token.tolist()[0]
+                self.token_ids.append(token_id)
+                generated += 1
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield from self._release(token_id)
+                if self.finish_reason == "stop":
+                    break
+                if token_id in self.eos_token_ids:
+                    self.finish_reason = "eos"
+                    break
+            else:
+                self.finish_reason = "length"
+            if self.stop is not None and self.finish_reason != "stop":
+                yield from self.stop.flush()
+        finally:
+            if self.finish_reason is None:
+                self.finish_reason = "stopped"
+            elapsed = time.perf_counter() - started
+            decode_time = elapsed - ((first_token_at or started) - started)
+            self.stats = {
+                "prompt_tokens": self.prompt_len,
+                "generated_tokens": generated,
+                "time_to_first_token": round((first_token_at or started) - started, 6),
+                "total_seconds": round(elapsed, 6),
+                "tokens_per_second": round((generated - 1) / decode_time, 3) if generated > 1 and decode_time > 0 else None,
+                "finish_reason": self.finish_reason,
+            }
+            PAIALogger().debug("Decoding finished: %s", self.stats)
+
+
+class DecodingEngine:
+    """KV-cached incremental decoder shared by the text services.
+
+    The prompt is prefilled once, after that only the newest token is fed to
+    the model together with the cached ``past_key_values``.
+    """
+
+    def __init__(self, model, tokenizer, device=None, autocast=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device if device is not None else next(model.parameters()).device
+        # Context manager factory wrapped around forward passes (see PAIABackend.autocast)
+        self.autocast = autocast or contextlib.nullcontext
+        self.eos_token_ids = resolve_eos_ids(tokenizer, model)
+        self._stop_matchers = collections.OrderedDict()
+
+    def generate(self, token_ids: list[int], max_new_tokens: int, eos_token_id=None, past_key_values=None, cached_len: int = 0, select=None, keep_cache: bool = True, stop: StopSequenceMatcher = None) -> DecodingStream:
+        # keep_cache only matters for BatchScheduler, a DecodingStream always owns its cache
+        eos_token_ids = self.eos_token_ids if eos_token_id is None else resolve_eos_ids(None, None, eos_token_id)
+        self.model.eval()
+        return DecodingStream(self, token_ids, max(0, int(max_new_tokens)), eos_token_ids, past_key_values=past_key_values, cached_len=cached_len, select=select, stop=stop)
+
+    def detokenizer(self, prompt_ids: list[int] = None) -> IncrementalDetokenizer:
+        return IncrementalDetokenizer(self.tokenizer, prompt_ids)
+
+    def stop_matcher(self, strings: list[str]) -> StopSequenceMatcher | None:
+        return stop_matcher(self, strings)
+
+    def close(self):
+        """Nothing to stop, streams run on the caller's thread (BatchScheduler parity)."""
@@ -0,0 +1,145 @@
+# paia/generation/history.py
+import queue
+import threading
+
+from paia import PAIALogger
+
+
+class ChatHistory:
+    """Token budget of a ChatSession's prompt: a summary plus a window of recent turns.
+
+    Every history entry keeps the token ids it added to the transcript
+    (``ids``) and their count (``tokens``), so nothing is tokenized twice and
+    building a prompt costs O(window). When summary and window exceed
+    ``max_tokens`` the oldest turns slide out until ``keep_ratio`` of the
+    budget is used, which leaves room for several turns that reuse the
+    model cache before the prompt has to change again. Turns that slid out
+    are summarized later by a HistoryCompactor.
+    """
+
+    def __init__(self, max_tokens: int = 1024, keep_ratio: float = 0.75):
+        self.max_tokens = max(1, int(max_tokens))
+        self.keep_tokens = int(self.max_tokens * min(1.0, max(0.0, float(keep_ratio))))
+
+    def window(self, session) -> list[dict]:
+        return session.history[session.window_start:]
+
+    def prompt_ids(self, session, head: list[int] = None) -> list[int]:
+        """``head`` (e.g. BOS), the summary and the window's turns."""
+        ids = list(head or []) + session.summary_ids
+        for entry in self.window(session):
+            ids.extend(entry["ids"])
+        return ids
+
+    def context(self, session) -> str:
+        """The prompt as text: the summary and the window's turns."""
+        context = f"{session.summary}\n" if session.summary else ""
+        for entry in self.window(session):
+            context += f"User: {entry['user']}\nBot: {entry['bot']}\n"
+        return context
+
+    def append(self, session, entry: dict, ids: list[int], head: list[int] = None) -> bool:
+        """Add a turn, sliding the window when over budget.
+
+        A slid window changes the prompt, ``session.token_ids`` is rebuilt
+        and its model cache dropped. Returns whether turns wait to be
+        summarized.
+        """
+        session.history.append(dict(entry, ids=list(ids), tokens=len(ids)))
+        session.context_tokens += len(ids)
+        if session.context_tokens > self.max_tokens:
+            # The newest turn always stays verbatim
+            while session.context_tokens > self.keep_tokens and session.window_start < len(session.history) - 1:
+                session.context_tokens -= session.history[session.window_start]["tokens"]
+                session.window_start += 1
+            session.token_ids = self.prompt_ids(session, head)
+            session.drop_cache()
+            PAIALogger().debug("History of %s slid to %s tokens", session.session_id, session.context_tokens)
+        return session.compacted < session.window_start
+
+    def apply_summary(self, session, summary: str, summary_ids: list[int], compacted: int, head: list[int] = None):
+        """Replace the summary with one covering the first ``compacted`` entries."""
+        session.context_tokens += len(summary_ids) - len(session.summary_ids)
+        session.summary = summary
+        session.summary_ids = list(summary_ids)
+        for entry in session.history[session.compacted:compacted]:
+            # Only the text is kept for display, the ids are in the summary now
+            entry.pop("ids", None)
+        session.compacted = compacted
+        session.token_ids = self.prompt_ids(session, head)
+        session.drop_cache()
+
+
+class HistoryCompactor:
+    """Background thread that summarizes the turns that slid out of chat windows.
+
+    ``summarize(summary, entries)`` returns the new summary text and its
+    token ids, it runs without the session lock, so a user's request never
+    waits for it. Turns arriving meanwhile are summarized on the next run.
+    With ``sessions`` (a SessionStore) the session is taken from the store
+    and held in use while summarized, so it is not spilled before the
+    summary lands.
+    """
+
+    def __init__(self, history: ChatHistory, summarize, head=None, name: str = "History compactor", sessions=None):
+        self.history = history
+        self.summarize = summarize
+        # Callable returning the ids the prompt starts with (BOS)
+        self.head = head or (lambda: [])
+        self.sessions = sessions
+        self.name = name
+        self._queue = queue.SimpleQueue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, session):
+        with self._lock:
+            if session.session_id in self._queued:
+                return
+            self._queued.add(session.session_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+                self._thread.start()
+        self._queue.put(session)
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            session = self._queue.get()
+            if session is None:
+                return
+            with self._lock:
+                self._queued.discard(session.session_id)
+            if self.sessions is not None:
+                # The submitted one may have been spilled since, the store loads it back
+                session = self.sessions.get(session.session_id)
+            try:
+                self.compact(session)
+            except Exception as e:
+                PAIALogger().error(f"History compaction of {session.session_id} failed: {str(e)}")
+            finally:
+                if self.sessions is not None:
+                    self.sessions.put(session)
+
+    def compact(self, session):
+        with session.lock:
+            upto = session.window_start
+            entries = [dict(entry) for entry in session.history[session.compacted:upto]]
+            summary = session.summary
+            start = session.compacted
+        if not entries:
+            return
+        text, ids = self.summarize(summary, entries)
+        with session.lock:
+            # Another run got there first
+            if session.compacted != start:
+                return
+            self.history.apply_summary(session, text, ids, upto, self.head())
+        PAIALogger().debug("History of %s compacted up to turn %s", session.session_id, upto)
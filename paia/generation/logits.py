@@ -0,0 +1,133 @@
+# paia/generation/logits.py
+import torch
+
+
+def greedy(logits: torch.Tensor) -> torch.Tensor:
+    """Pick the most likely token for every row of ``logits`` ([batch, vocab])."""
+    return torch.argmax(logits, dim=-1)
+
+
+class LogitsProcessor:
+    """Sampling settings of one request, applied to a whole batch of logits at once.
+
+    Repetition penalty (CTRL style, over the prompt and the generated
+    tokens), temperature, top-k and top-p, then sampling. ``temperature``
+    0 picks the most likely token. Requests with different settings in one
+    BatchScheduler step are processed together by ``select_tokens``, with
+    one tensor per setting instead of a loop over rows.
+
+    Keeps a mask of the tokens its request saw, so use one per request.
+    """
+
+    def __init__(self, temperature: float = 1.0, top_k: int = 0, top_p: float = 1.0, repetition_penalty: float = 1.0, seed: int = None):
+        self.temperature = max(0.0, float(temperature))
+        self.top_k = max(0, int(top_k or 0))
+        self.top_p = min(1.0, max(0.0, float(1.0 if top_p is None else top_p)))
+        self.repetition_penalty = float(repetition_penalty or 1.0)
+        self.generator = None
+        if seed is not None:
+            self.generator = torch.Generator()
+            self.generator.manual_seed(int(seed))
+        self._seen = None
+        self._seen_ids = None
+        self._seen_len = 0
+
+    @classmethod
+    def from_query(cls, query: dict, defaults: dict = None) -> "LogitsProcessor | None":
+        """Settings of a request, query values over ``defaults``, None when decoding is plain greedy."""
+        settings = dict(defaults or {})
+        settings.update({key: query[key] for key in ("temperature", "top_k", "top_p", "repetition_penalty", "seed") if query.get(key) is not None})
+        processor = cls(**settings)
+        return None if processor.greedy else processor
+
+    @property
+    def greedy(self) -> bool:
+        return self.temperature == 0 and self.repetition_penalty == 1.0
+
+    def seen(self, token_ids: list[int], vocab_size: int, device) -> torch.Tensor:
+        """Bool mask of the tokens in ``token_ids``, updated with the tokens added since the last call."""
+        if self._seen is None or self._seen_ids is not token_ids or self._seen_len > len(token_ids) or self._seen.shape[0] != vocab_size or self._seen.device != device:
+            self._seen = torch.zeros(vocab_size, dtype=torch.bool, device=device)
+            self._seen_ids = token_ids
+            self._seen_len = 0
+        if self._seen_len < len(token_ids):
+            new_ids = [token_id for token_id in token_ids[self._seen_len:] if token_id < vocab_size]
+            self._seen[torch.tensor(new_ids, dtype=torch.long, device=device)] = True
+            self._seen_len = len(token_ids)
+        return self._seen
+
+    def __call__(self, logits: torch.Tensor, token_ids: list[int] = None) -> torch.Tensor:
+        return select_tokens(logits, [self] * logits.shape[0], [token_ids or []] * logits.shape[0])
+
+
+def process_logits(processors: list[LogitsProcessor], logits: torch.Tensor, histories: list[list[int]]) -> torch.Tensor:
+    """Logits of every row ([batch, vocab]) after its processor's penalty, temperature, top-k and top-p."""
+    rows, vocab_size = logits.shape
+    device = logits.device
+    logits = logits.float()
+    penalties = [processor.repetition_penalty for processor in processors]
+    if any(penalty != 1.0 for penalty in penalties):
+        seen = torch.stack([
+            processor.seen(history, vocab_size, device) if processor.repetition_penalty != 1.0 else torch.zeros(vocab_size, dtype=torch.bool, device=device)
+            for processor, history in zip(processors, histories)
+        ])
+        penalty = torch.tensor(penalties, dtype=logits.dtype, device=device).unsqueeze(1)
+        logits = torch.where(seen, torch.where(logits < 0, logits * penalty, logits / penalty), logits)
+    temperatures = torch.tensor([processor.temperature or 1.0 for processor in processors], dtype=logits.dtype, device=device)
+    logits = logits / temperatures.unsqueeze(1)
+
+    top_k = [processor.top_k if 0 < processor.top_k < vocab_size else vocab_size for processor in processors]
+    if min(top_k) < vocab_size:
+        largest = torch.topk(logits, max(k for k in top_k if k < vocab_size), dim=-1).values
+        # Rows without top-k keep everything, their threshold is -inf
+        kth = largest.gather(1, torch.tensor([min(k, largest.shape[1]) - 1 for k in top_k], device=device).unsqueeze(1))
+        kth = torch.where(torch.tensor([k < vocab_size for k in top_k], device=device).unsqueeze(1), kth, torch.full_like(kth, float("-inf")))
+        logits = logits.masked_fill(logits < kth, float("-inf"))
+
+    top_p = [processor.top_p for processor in processors]
+    if min(top_p) < 1.0:
+        ordered, order = torch.sort(logits, dim=-1, descending=True)
+        probabilities = ordered.softmax(dim=-1)
+        # Drop a token once the more likely ones already cover top_p, the most likely is always kept
+        remove = probabilities.cumsum(dim=-1) - probabilities > torch.tensor(top_p, dtype=logits.dtype, device=device).unsqueeze(1)
+        remove[:, 0] = False
+        logits = logits.masked_fill(remove.scatter(1, order, remove), float("-inf"))
+    return logits
+
+
+def select_tokens(logits: torch.Tensor, selects: list, histories: list[list[int]]) -> torch.Tensor:
+    """Next token of every row of ``logits``, ``selects`` and ``histories`` are per row.
+
+    Rows of LogitsProcessor (and greedy) selects are processed and sampled
+    together, other select callables get their rows as one call each.
+    """
+    if all(select is greedy for select in selects):
+        return greedy(logits)
+    if all(select is greedy or isinstance(select, LogitsProcessor) for select in selects):
+        processors = [_GREEDY if select is greedy else select for select in selects]
+        processed = process_logits(processors, logits, histories)
+        tokens = greedy(processed)
+        sampled = [row for row, processor in enumerate(processors) if processor.temperature > 0]
+        if sampled:
+            probabilities = processed[sampled].softmax(dim=-1)
+            generators = [processors[row].generator for row in sampled]
+            if any(generator is not None for generator in generators):
+                # Seeded requests draw from their own generator, row by row
+                draws = torch.cat([torch.multinomial(probabilities[index:index + 1].cpu(), 1, generator=generator).to(logits.device) for index, generator in enumerate(generators)])
+            else:
+                draws = torch.multinomial(probabilities, 1)
+            tokens[torch.tensor(sampled, device=logits.device)] = draws.view(-1)
+        return tokens
+    groups = {}
+    for row, select in enumerate(selects):
+        groups.setdefault(select, []).append(row)
+    if len(groups) == 1:
+        return next(iter(groups))(logits)
+    tokens = torch.empty(logits.shape[0], dtype=torch.long, device=logits.device)
+    for select, rows in groups.items():
+        index = torch.tensor(rows, device=logits.device)
+        tokens[index] = select(logits.index_select(0, index))
+    return tokens
+
+
+_GREEDY = LogitsProcessor(temperature=0)
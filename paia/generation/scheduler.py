@@ -0,0 +1,298 @@
+# paia/generation/scheduler.py
+import collections
+import contextlib
+import queue
+import threading
+import time
+import torch
+
+from paia import PAIALogger
+from paia.generation.decoding import IncrementalDetokenizer, greedy, resolve_eos_ids, cache_to_layers, layers_to_cache, stop_matcher
+from paia.generation.logits import select_tokens
+from paia.generation.stopping import StopSequenceMatcher
+
+_DONE = object()
+
+
+def _pad_left(tensor: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+    if length <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = length
+    return torch.cat((tensor.new_zeros(shape), tensor), dim=dim)
+
+
+class BatchStream:
+    """Token stream of one request served by a BatchScheduler.
+
+    Same interface as DecodingStream: iterate token ids, then read
+    ``token_ids``, ``finish_reason``, ``stats`` and (with ``keep_cache``)
+    ``past_key_values``/``cached_len``. Tokens are produced on the scheduler
+    thread and handed over through a queue.
+    """
+
+    def __init__(self, token_ids: list[int], max_new_tokens: int, eos_token_ids: set[int], past_key_values=None, cached_len: int = 0, select=None, keep_cache: bool = False, stop: StopSequenceMatcher = None):
+        self.token_ids = list(token_ids)
+        self.prompt_len = len(self.token_ids)
+        self.max_new_tokens = max_new_tokens
+        self.eos_token_ids = eos_token_ids
+        self.past_key_values = past_key_values if cached_len else None
+        self.cached_len = cached_len if past_key_values is not None else 0
+        self.select = select or greedy
+        self.stop = stop.start() if stop is not None else None
+        self.keep_cache = keep_cache
+        self.cancelled = False
+        self.finish_reason = None
+        self.stats = {}
+        self.generated = 0
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.first_token_at = None
+        self.done = False
+        self._queue = queue.SimpleQueue()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> int:
+        item = self._queue.get()
+        if item is _DONE:
+            self._queue.put(_DONE)
+            raise StopIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def close(self):
+        """Leave the batch at the next step boundary (client went away)."""
+        self.cancelled = True
+
+    @property
+    def active(self) -> bool:
+        return self.finish_reason is None and not self.cancelled
+
+    def _emit(self, token_id: int):
+        self.token_ids.append(token_id)
+        self.generated += 1
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        if self.stop is None:
+            self._queue.put(token_id)
+        else:
+            # Held back while it may be part of a stop sequence, the scheduler drops the stream at the step boundary
+            for released in self.stop.push(token_id):
+                self._queue.put(released)
+            if self.stop.stopped:
+                self.finish_reason = "stop"
+                return
+        if token_id in self.eos_token_ids:
+            self.finish_reason = "eos"
+        elif self.generated >= self.max_new_tokens:
+            self.finish_reason = "length"
+        if self.finish_reason is not None and self.stop is not None:
+            for released in self.stop.flush():
+                self._queue.put(released)
+
+    def _finish(self, error: BaseException = None):
+        if self.done:
+            return
+        self.done = True
+        if self.finish_reason is None:
+            self.finish_reason = "error" if error else "stopped"
+        now = time.perf_counter()
+        started = self.started_at or now
+        first = self.first_token_at or now
+        decode_time = now - first
+        self.stats = {
+            "prompt_tokens": self.prompt_len,
+            "generated_tokens": self.generated,
+            "queue_seconds": round(started - self.submitted_at, 6),
+            "time_to_first_token": round(first - self.submitted_at, 6),
+            "total_seconds": round(now - self.submitted_at, 6),
+            "tokens_per_second": round((self.generated - 1) / decode_time, 3) if self.generated > 1 and decode_time > 0 else None,
+            "finish_reason": self.finish_reason,
+        }
+        if error:
+            self._queue.put(error)
+        self._queue.put(_DONE)
+
+
+class BatchScheduler:
+    """Continuous (iteration-level) batching for one causal LM.
+
+    The scheduler thread owns the model. Every step it admits waiting
+    requests (prefilled one by one, then merged into the batch with left
+    padding), runs a single forward pass for all in-flight sequences and
+    drops finished or cancelled ones, so requests join and leave at step
+    boundaries instead of each running its own batch-size-1 loop.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size: int = 8, device=None, name: str = "batch", autocast=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.autocast = autocast or contextlib.nullcontext
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.device = device if device is not None else next(model.parameters()).device
+        self.eos_token_ids = resolve_eos_ids(tokenizer, model)
+        self.name = name
+        self._stop_matchers = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._pending = collections.deque()
+        self._running = False
+        self._thread = None
+        # Batch state, only touched by the scheduler thread
+        self._active: list[BatchStream] = []
+        self._past = None
+        self._attention_mask = None
+        self._next_tokens = None
+
+    def generate(self, token_ids: list[int], max_new_tokens: int, eos_token_id=None, past_key_values=None, cached_len: int = 0, select=None, keep_cache: bool = False, stop: StopSequenceMatcher = None) -> BatchStream:
+        eos_token_ids = self.eos_token_ids if eos_token_id is None else resolve_eos_ids(None, None, eos_token_id)
+        stream = BatchStream(token_ids, max(0, int(max_new_tokens)), eos_token_ids, past_key_values=past_key_values, cached_len=cached_len, select=select, keep_cache=keep_cache, stop=stop)
+        if not stream.token_ids[stream.cached_len:]:
+            raise ValueError("BatchScheduler needs at least one uncached token")
+        with self._condition:
+            self._pending.append(stream)
+            if not self._running:
+                self._running = True
+                self.model.eval()
+                self._thread = threading.Thread(target=self._loop, daemon=True, name=f"{self.name} scheduler")
+                self._thread.start()
+            self._condition.notify()
+        return stream
+
+    def detokenizer(self, prompt_ids: list[int] = None) -> IncrementalDetokenizer:
+        return IncrementalDetokenizer(self.tokenizer, prompt_ids)
+
+    def stop_matcher(self, strings: list[str]) -> StopSequenceMatcher | None:
+        return stop_matcher(self, strings)
+
+    @property
+    def batch_size(self) -> int:
+        return len(self._active)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _loop(self):
+        PAIALogger().debug("Scheduler %s started", self.name)
+        while True:
+            with self._condition:
+                while self._running and not self._pending and not self._active:
+                    self._condition.wait()
+                if not self._running:
+                    break
+                admitted = []
+                while self._pending and len(self._active) + len(admitted) < self.max_batch_size:
+                    admitted.append(self._pending.popleft())
+            try:
+                with torch.inference_mode(), self.autocast():
+                    for stream in admitted:
+                        stream.started_at = time.perf_counter()
+                        if stream.max_new_tokens == 0 or stream.cancelled:
+                            stream._finish()
+                            continue
+                        self._prefill(stream)
+                    self._evict()
+                    if self._active:
+                        self._step()
+                        self._evict()
+            except Exception as e:
+                PAIALogger().error(f"Scheduler {self.name} step failed: {str(e)}")
+                for stream in self._active + admitted:
+                    stream._finish(e)
+                self._reset()
+        # Shutting down, release everybody still waiting
+        with self._condition:
+            waiting = list(self._pending)
+            self._pending.clear()
+        for stream in self._active + waiting:
+            stream._finish()
+        self._reset()
+        PAIALogger().debug("Scheduler %s stopped", self.name)
+
+    def _reset(self):
+        self._active = []
+        self._past = None
+        self._attention_mask = None
+        self._next_tokens = None
+
+    def _select(self, logits: torch.Tensor) -> torch.Tensor:
+        return select_tokens(logits, [stream.select for stream in self._active], [stream.token_ids for stream in self._active])
+
+    def _prefill(self, stream: BatchStream):
+        new_ids = stream.token_ids[stream.cached_len:]
+        input_ids = torch.tensor([new_ids], dtype=torch.long, device=self.device)
+        attention_mask = torch.ones((1, len(stream.token_ids)), dtype=torch.long, device=self.device)
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, past_key_values=stream.past_key_values, use_cache=True)
+        stream.past_key_values = None
+        next_token = select_tokens(outputs.logits[:, -1, :], [stream.select], [stream.token_ids])
+        self._join(outputs.past_key_values, attention_mask, next_token.view(1, 1))
+        self._active.append(stream)
+        stream._emit(next_token.tolist()[0])
+
+    def _join(self, past_key_values, attention_mask: torch.Tensor, next_tokens: torch.Tensor):
+        if self._past is None:
+            self._past = past_key_values
+            self._attention_mask = attention_mask
+            self._next_tokens = next_tokens
+            return
+        batch_len = self._attention_mask.shape[1]
+        new_len = attention_mask.shape[1]
+        length = max(batch_len, new_len)
+        layers = []
+        for (batch_key, batch_value), (key, value) in zip(cache_to_layers(self._past), cache_to_layers(past_key_values)):
+            layers.append((
+                torch.cat((_pad_left(batch_key, length - batch_len, -2), _pad_left(key, length - new_len, -2)), dim=0),
+                torch.cat((_pad_left(batch_value, length - batch_len, -2), _pad_left(value, length - new_len, -2)), dim=0),
+            ))
+        self._past = layers_to_cache(layers, self._past)
+        self._attention_mask = torch.cat((_pad_left(self._attention_mask, length - batch_len, 1), _pad_left(attention_mask, length - new_len, 1)), dim=0)
+        self._next_tokens = torch.cat((self._next_tokens, next_tokens), dim=0)
+
+    def _step(self):
+        batch = len(self._active)
+        attention_mask = torch.cat((self._attention_mask, self._attention_mask.new_ones((batch, 1))), dim=1)
+        # Left padding shifts positions, so pass them explicitly
+        position_ids = attention_mask.sum(dim=-1, keepdim=True) - 1
+        outputs = self.model(input_ids=self._next_tokens, attention_mask=attention_mask, position_ids=position_ids, past_key_values=self._past, use_cache=True)
+        self._past = outputs.past_key_values
+        self._attention_mask = attention_mask
+        next_tokens = self._select(outputs.logits[:, -1, :])
+        self._next_tokens = next_tokens.view(-1, 1)
+        for stream, token_id in zip(self._active, next_tokens.tolist()):
+            stream._emit(token_id)
+
+    def _evict(self):
+        keep = [row for row, stream in enumerate(self._active) if stream.active]
+        if len(keep) == len(self._active):
+            return
+        layers = cache_to_layers(self._past)
+        for row, stream in enumerate(self._active):
+            if row in keep:
+                continue
+            if stream.keep_cache:
+                # The last sampled token has not been fed yet, so it is not cached
+                padding = int(self._attention_mask.shape[1] - self._attention_mask[row].sum())
+                stream.past_key_values = layers_to_cache([(key[row:row + 1, :, padding:, :].clone(), value[row:row + 1, :, padding:, :].clone()) for key, value in layers], self._past)
+                stream.cached_len = len(stream.token_ids) - 1
+            stream._finish()
+        if not keep:
+            self._reset()
+            return
+        index = torch.tensor(keep, device=self._attention_mask.device)
+        attention_mask = self._attention_mask.index_select(0, index)
+        # Drop padding columns nobody needs any more
+        trim = int((attention_mask.sum(dim=0) > 0).nonzero()[0])
+        self._attention_mask = attention_mask[:, trim:]
+        self._past = layers_to_cache([(key.index_select(0, index)[:, :, trim:, :], value.index_select(0, index)[:, :, trim:, :]) for key, value in layers], self._past)
+        self._next_tokens = self._next_tokens.index_select(0, index)
+        self._active = [self._active[row] for row in keep]
@@ -0,0 +1,205 @@
+# paia/generation/session.py
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from paia import PAIALogger
+from paia.generation.decoding import cache_nbytes, crop_cache
+
+
+class ChatSession:
+    """One conversation: transcript token ids, history entries and the model
+    cache for the already processed prefix (``token_ids[:cached_len]``).
+
+    The transcript is the summary of the first ``compacted`` history entries
+    followed by the entries from ``window_start`` on, ``context_tokens`` is
+    its length without the prompt head (see ChatHistory).
+    """
+
+    def __init__(self, session_id: str, token_ids: list[int] = None, history: list[dict] = None, summary: str = "", summary_ids: list[int] = None, compacted: int = 0, window_start: int = 0):
+        self.session_id = session_id
+        self.token_ids = list(token_ids or [])
+        self.history = list(history or [])
+        self.summary = summary
+        self.summary_ids = list(summary_ids or [])
+        self.compacted = compacted
+        self.window_start = window_start
+        self.context_tokens = len(self.summary_ids) + sum(entry.get("tokens", 0) for entry in self.history[window_start:])
+        self.past_key_values = None
+        self.cached_len = 0
+        self.cache_bytes = 0
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+        # Turns between SessionStore.get and put, the store does not spill the session meanwhile
+        self.users = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.token_ids) * 8 + self.cache_bytes
+
+    def set_cache(self, past_key_values, cached_len: int):
+        """Store the cache, cropped to the part that matches ``token_ids``."""
+        cached_len = min(cached_len, len(self.token_ids))
+        if past_key_values is None or cached_len <= 0:
+            self.drop_cache()
+            return
+        self.past_key_values = crop_cache(past_key_values, cached_len)
+        self.cached_len = cached_len
+        self.cache_bytes = cache_nbytes(self.past_key_values)
+
+    def drop_cache(self):
+        self.past_key_values = None
+        self.cached_len = 0
+        self.cache_bytes = 0
+
+    def to_record(self) -> str:
+        return json.dumps({
+            "token_ids": self.token_ids,
+            "history": self.history,
+            "summary": self.summary,
+            "summary_ids": self.summary_ids,
+            "compacted": self.compacted,
+            "window_start": self.window_start,
+        })
+
+    @classmethod
+    def from_record(cls, session_id: str, record: str) -> "ChatSession":
+        data = json.loads(record)
+        history = data.get("history") or []
+        if history and "tokens" not in history[-1]:
+            # Record without token counts, its transcript stands in for a summary of all entries
+            return cls(session_id, data.get("token_ids"), history, summary_ids=data.get("token_ids"), compacted=len(history), window_start=len(history))
+        return cls(session_id, data.get("token_ids"), history, data.get("summary", ""), data.get("summary_ids"), data.get("compacted", 0), data.get("window_start", 0))
+
+
+class SessionStore:
+    """Session-keyed conversations bounded by count, memory and idle time.
+
+    Recently used sessions stay in memory (LRU). Sessions over the budget or
+    idle for longer than ``ttl`` seconds are spilled to sqlite without their
+    model cache, which is rebuilt by a single prefill on the next turn.
+    Spilled sessions are deleted after ``disk_ttl`` seconds.
+    """
+
+    def __init__(self, db_path: str = None, max_sessions: int = 256, max_bytes: int = 2 * 1024 ** 3, ttl: float = 1800, disk_ttl: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        self._lock = threading.Lock()
+        self._sessions: collections.OrderedDict[str, ChatSession] = collections.OrderedDict()
+        self._db = None
+        self._last_disk_cleanup = 0.0
+
+    def _connection(self) -> sqlite3.Connection | None:
+        if self._db is None and self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, record TEXT NOT NULL, updated REAL NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def get(self, session_id: str) -> ChatSession:
+        """Return the session, loading it from disk or creating it, hand it back with ``put``.
+
+        The session is marked in use before the store lock is released, so
+        it is not spilled before the caller takes ``session.lock``.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load(session_id) or ChatSession(session_id)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.users += 1
+            session.last_used = time.time()
+            self._enforce_budget(keep=session_id)
+        return session
+
+    def put(self, session: ChatSession):
+        """Account a finished turn, release the session taken by ``get`` and spill other sessions if over budget."""
+        with self._lock:
+            session.users = max(0, session.users - 1)
+            session.last_used = time.time()
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            self._enforce_budget(keep=session.session_id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            db = self._connection()
+            if db:
+                db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions_in_memory": len(self._sessions),
+                "bytes_in_memory": sum(s.nbytes for s in self._sessions.values()),
+            }
+
+    def _load(self, session_id: str) -> ChatSession | None:
+        db = self._connection()
+        if not db:
+            return None
+        row = db.execute("SELECT record FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if not row:
+            return None
+        PAIALogger().debug("Session %s loaded from disk", session_id)
+        return ChatSession.from_record(session_id, row[0])
+
+    def close(self):
+        """Spill every session, waiting for turns in progress, and close the database."""
+        with self._lock:
+            for session in list(self._sessions.values()):
+                with session.lock:
+                    self._write(session)
+                    session.drop_cache()
+            self._sessions.clear()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _write(self, session: ChatSession):
+        db = self._connection()
+        if db:
+            db.execute("INSERT OR REPLACE INTO sessions (session_id, record, updated) VALUES (?, ?, ?)", (session.session_id, session.to_record(), session.last_used))
+            db.commit()
+
+    def _spill(self, session: ChatSession) -> bool:
+        # A session in the middle of a turn stays in memory
+        if session.users or not session.lock.acquire(blocking=False):
+            return False
+        try:
+            self._write(session)
+            session.drop_cache()
+            del self._sessions[session.session_id]
+            PAIALogger().debug("Session %s spilled", session.session_id)
+            return True
+        finally:
+            session.lock.release()
+
+    def _enforce_budget(self, keep: str = None):
+        now = time.time()
+        total = sum(s.nbytes for s in self._sessions.values())
+        for session in list(self._sessions.values()):
+            if session.session_id == keep:
+                continue
+            idle = now - session.last_used > self.ttl
+            over = len(self._sessions) > self.max_sessions or total > self.max_bytes
+            if not idle and not over:
+                # Oldest first, nothing further down is idle or needed
+                break
+            nbytes = session.nbytes
+            if self._spill(session):
+                total -= nbytes
+        if self._db is not None and now - self._last_disk_cleanup > 60:
+            self._last_disk_cleanup = now
+            self._db.execute("DELETE FROM sessions WHERE updated < ?", (now - self.disk_ttl,))
+            self._db.commit()
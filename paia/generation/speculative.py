@@ -0,0 +1,155 @@
+# paia/generation/speculative.py
+import time
+import torch
+
+from paia import PAIALogger
+from paia.generation.decoding import DecodingEngine, DecodingStream, crop_cache, greedy, resolve_eos_ids
+
+
+def truncate_cache(past_key_values, length: int):
+    """Drop the cached positions from ``length`` on, in place when the cache supports it."""
+    if past_key_values is None or length <= 0:
+        return None
+    if hasattr(past_key_values, "crop"):
+        excess = past_key_values.get_seq_length() - length
+        if excess > 0:
+            past_key_values.crop(-excess)
+        return past_key_values
+    return crop_cache(past_key_values, length)
+
+
+class SpeculativeStream(DecodingStream):
+    """Greedy DecodingStream where a draft model proposes tokens the main model verifies.
+
+    Every round the draft model greedily proposes ``num_draft_tokens``
+    tokens, the main model scores all of them in one forward pass. Proposals
+    are accepted up to the first one that differs from the main model's own
+    greedy choice, which is emitted in its place (or after them all, as a
+    bonus token), so the output is the main model's greedy output. Accepted
+    tokens are yielded one by one as soon as a round is verified.
+    """
+
+    def __init__(self, engine, *args, num_draft_tokens: int = 4, **kwargs):
+        super().__init__(engine, *args, **kwargs)
+        self.num_draft_tokens = max(1, int(num_draft_tokens))
+
+    def _forward(self, model, input_ids: list[int], past_key_values, seq_len: int, attention_mask):
+        with torch.inference_mode(), self.engine.autocast():
+            outputs = model(
+                input_ids=torch.tensor([input_ids], dtype=torch.long, device=self.engine.device),
+                attention_mask=attention_mask[:, :seq_len],
+                past_key_values=past_key_values,
+                use_cache=True,
+            )
+            return outputs.past_key_values, greedy(outputs.logits[0])
+
+    def _run(self):
+        model = self.engine.model
+        draft_model = self.engine.draft_model
+        if not self.token_ids[self.cached_len:]:
+            raise ValueError("DecodingStream needs at least one uncached token")
+
+        # Longest sequence a round can feed: every proposal of the last round on top of max_new_tokens
+        attention_mask = torch.ones((1, self.prompt_len + self.max_new_tokens + self.num_draft_tokens), dtype=torch.long, device=self.engine.device)
+        # The draft cache is private to the stream, it always starts from the whole prompt
+        draft_past, draft_cached = None, 0
+        generated = proposed = accepted = rounds = 0
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            while generated < self.max_new_tokens:
+                # The round's corrected or bonus token counts as well
+                num_draft = min(self.num_draft_tokens, self.max_new_tokens - generated - 1)
+                drafts = []
+                for _ in range(num_draft):
+                    # Only what the draft cache lacks, earlier proposals of the round are already in it
+                    draft_input = (self.token_ids + drafts)[draft_cached:]
+                    draft_past, draft_ids = self._forward(draft_model, draft_input, draft_past, len(self.token_ids) + len(drafts), attention_mask)
+                    draft_cached = len(self.token_ids) + len(drafts)
+                    drafts.append(draft_ids[-1].item())
+                    if drafts[-1] in self.eos_token_ids:
+                        break
+
+                # One pass of the main model scores the uncached tokens and every proposal
+                seq_len = len(self.token_ids) + len(drafts)
+                verify_input = self.token_ids[self.cached_len:] + drafts
+                self.past_key_values, target_ids = self._forward(model, verify_input, self.past_key_values, seq_len, attention_mask)
+                # Main model's choice after the last uncached token and after every proposal
+                choices = target_ids[-(len(drafts) + 1):].tolist()
+                matched = 0
+                while matched < len(drafts) and drafts[matched] == choices[matched]:
+                    matched += 1
+                tokens = drafts[:matched] + [choices[matched]]
+                rounds += 1
+                proposed += len(drafts)
+                accepted += matched
+
+                # Cached positions past the accepted tokens hold rejected proposals
+                base = len(self.token_ids)
+                self.cached_len = base + matched
+                self.past_key_values = truncate_cache(self.past_key_values, self.cached_len)
+                draft_cached = min(draft_cached, base + matched)
+                draft_past = truncate_cache(draft_past, draft_cached)
+                if draft_past is None:
+                    draft_cached = 0
+
+                for token_id in tokens:
+                    self.token_ids.append(token_id)
+                    generated += 1
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield from self._release(token_id)
+                    if self.finish_reason == "stop":
+                        break
+                    if token_id in self.eos_token_ids:
+                        self.finish_reason = "eos"
+                        break
+                if self.finish_reason is not None:
+                    break
+            else:
+                self.finish_reason = "length"
+            if self.stop is not None and self.finish_reason != "stop":
+                yield from self.stop.flush()
+        finally:
+            if self.finish_reason is None:
+                self.finish_reason = "stopped"
+            elapsed = time.perf_counter() - started
+            decode_time = elapsed - ((first_token_at or started) - started)
+            self.stats = {
+                "prompt_tokens": self.prompt_len,
+                "generated_tokens": generated,
+                "time_to_first_token": round((first_token_at or started) - started, 6),
+                "total_seconds": round(elapsed, 6),
+                "tokens_per_second": round((generated - 1) / decode_time, 3) if generated > 1 and decode_time > 0 else None,
+                "finish_reason": self.finish_reason,
+                "speculative": {
+                    "draft_tokens": proposed,
+                    "accepted_tokens": accepted,
+                    "acceptance_rate": round(accepted / proposed, 3) if proposed else None,
+                    "target_passes": rounds,
+                    # Main model passes saved, the draft model's cost is not included
+                    "speedup": round(generated / rounds, 3) if rounds else None,
+                },
+            }
+            PAIALogger().debug("Speculative decoding finished: %s", self.stats)
+
+
+class SpeculativeDecodingEngine(DecodingEngine):
+    """DecodingEngine that decodes greedily with the help of a small ``draft_model``.
+
+    The draft model must share the main model's tokenizer. Requests with a
+    custom ``select`` (sampling) decode token by token like DecodingEngine.
+    """
+
+    def __init__(self, model, tokenizer, draft_model, num_draft_tokens: int = 4, device=None, autocast=None):
+        super().__init__(model, tokenizer, device=device, autocast=autocast)
+        self.draft_model = draft_model
+        self.num_draft_tokens = num_draft_tokens
+
+    def generate(self, token_ids: list[int], max_new_tokens: int, eos_token_id=None, past_key_values=None, cached_len: int = 0, select=None, keep_cache: bool = True, stop=None) -> DecodingStream:
+        if select is not None and select is not greedy:
+            return super().generate(token_ids, max_new_tokens, eos_token_id, past_key_values, cached_len, select, keep_cache, stop)
+        eos_token_ids = self.eos_token_ids if eos_token_id is None else resolve_eos_ids(None, None, eos_token_id)
+        self.model.eval()
+        self.draft_model.eval()
+        return SpeculativeStream(self, token_ids, max(0, int(max_new_tokens)), eos_token_ids, past_key_values=past_key_values, cached_len=cached_len, stop=stop, num_draft_tokens=self.num_draft_tokens)
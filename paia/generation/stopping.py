@@ -0,0 +1,116 @@
+# paia/generation/stopping.py
+
+
+def stop_sequences(tokenizer, strings: list[str]) -> list[list[int]]:
+    """Token ids of every stop string, as generated at the start of a line, after a space and on its own.
+
+    Most tokenizers encode a word differently depending on what precedes
+    it, the in-context ids are the encoding of ``prefix + string`` minus the
+    encoding of ``prefix``.
+    """
+    sequences = []
+    for string in strings:
+        for prefix in ("", " ", "\n"):
+            prefix_ids = tokenizer.encode(prefix, add_special_tokens=False) if prefix else []
+            ids = tokenizer.encode(prefix + string, add_special_tokens=False)
+            if prefix_ids and ids[:len(prefix_ids)] == prefix_ids:
+                ids = ids[len(prefix_ids):]
+            if ids and ids not in sequences:
+                sequences.append(ids)
+    return sequences
+
+
+class StopSequenceMatcher:
+    """Aho-Corasick automaton over token id sequences.
+
+    Immutable once built and shared by all streams, each stream follows it
+    with its own StopState. A state is the longest suffix of the generated
+    tokens that is a prefix of some stop sequence, so its ``depth`` is the
+    number of trailing tokens that may still turn out to be a stop. Missing
+    transitions follow the failure links, nothing is written after the
+    build, so concurrent streams need no lock. Most tokens cost one lookup
+    in the root's transitions.
+    """
+
+    def __init__(self, sequences: list[list[int]]):
+        self.sequences = [list(sequence) for sequence in sequences if sequence]
+        self._goto: list[dict[int, int]] = [{}]
+        self._fail = [0]
+        self.depth = [0]
+        # Length of the longest stop sequence ending in the state, 0 for none
+        self.match = [0]
+        for sequence in self.sequences:
+            state = 0
+            for token_id in sequence:
+                if token_id not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self.depth.append(self.depth[state] + 1)
+                    self.match.append(0)
+                    self._goto[state][token_id] = len(self._goto) - 1
+                state = self._goto[state][token_id]
+            self.match[state] = len(sequence)
+        # Breadth first, a state's failure link is shallower than the state
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for token_id, child in self._goto[state].items():
+                queue.append(child)
+                if state:
+                    self._fail[child] = self.next(self._fail[state], token_id)
+                self.match[child] = self.match[child] or self.match[self._fail[child]]
+
+    @classmethod
+    def from_strings(cls, tokenizer, strings: list[str]) -> "StopSequenceMatcher":
+        return cls(stop_sequences(tokenizer, strings))
+
+    def next(self, state: int, token_id: int) -> int:
+        goto = self._goto
+        while True:
+            following = goto[state].get(token_id)
+            if following is not None:
+                return following
+            if state == 0:
+                return 0
+            state = self._fail[state]
+
+    def start(self) -> "StopState":
+        return StopState(self)
+
+
+class StopState:
+    """Where one stream is in a StopSequenceMatcher, and the tokens held back meanwhile.
+
+    ``push`` returns the tokens that can no longer be part of a stop
+    sequence, so a partial stop sequence is never sent to the client and a
+    complete one is dropped.
+    """
+
+    __slots__ = ("matcher", "state", "held", "stopped")
+
+    def __init__(self, matcher: StopSequenceMatcher):
+        self.matcher = matcher
+        self.state = 0
+        self.held: list[int] = []
+        self.stopped = False
+
+    def push(self, token_id: int) -> list[int]:
+        matcher = self.matcher
+        self.state = matcher.next(self.state, token_id)
+        self.held.append(token_id)
+        matched = matcher.match[self.state]
+        if matched:
+            self.stopped = True
+            released = self.held[:len(self.held) - matched]
+            self.held = []
+            return released
+        keep = matcher.depth[self.state]
+        if keep == len(self.held):
+            return []
+        released = self.held[:len(self.held) - keep]
+        self.held = self.held[len(self.held) - keep:]
+        return released
+
+    def flush(self) -> list[int]:
+        """Tokens still held back, once the stream ends for another reason."""
+        released, self.held = self.held, []
+        return released
@@ -1,29 +1,106 @@
 # ai/logger.py
+import atexit
 import logging
 import logging.handlers
 import os
 import json
+import queue
+
+from paia import PAIASingleton, PAIAConfig
+
+# Arguments that cannot change after the call, formatting them can wait for the listener thread
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+class _Payload:
+    """A logged payload, converted to a (truncated) string only when the record is emitted."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.value)
+        if self.limit and len(text) > self.limit:
+            return f"{text[:self.limit]}... ({len(text)} chars)"
+        return text
+
+    __repr__ = __str__
+
+
+class _JSONFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        category = getattr(record, "category", None)
+        if category:
+            entry["category"] = category
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Formats on the listener thread when the arguments are immutable, else like QueueHandler."""
+
+    def prepare(self, record):
+        if not record.exc_info and isinstance(record.args, tuple) and all(type(arg) in _IMMUTABLE for arg in record.args):
+            return record
+        return super().prepare(record)
 
-from paia import PAIASingleton
 
 class PAIALogger(metaclass=PAIASingleton):
+    """Application logger, configured from the ``logging`` config section::
+
+        "logging": {"level": "DEBUG", "dir": ".", "file_name": "app.log", "async": true,
+                    "json": false, "max_payload": 1000, "sampling": {"token": 100, "sse": 100}}
+
+    With ``async`` request threads only enqueue records, a QueueListener
+    thread formats and writes them. Messages take lazy ``%`` arguments,
+    ``category`` names hot-loop events of which only every n-th (``sampling``)
+    is logged and ``payload()`` truncates large payloads to ``max_payload``
+    characters when they are written.
+    """
 
     config_default = {"level": "DEBUG", "dir": ".", "file_name":"app.log"}
 
     def __init__(self):
         self.loggerLoaded = False
         self.logger = None
-        self.__populateFromConfig(self.config_default)
-        
+        self.listener = None
+        self._handlers = []
+        self._counters = {}
+        self.__populateFromConfig(dict(PAIAConfig().getConfig().get("logging") or self.config_default))
+        atexit.register(self.close)
+        # A changed logging section is applied when the config is reloaded
+        PAIAConfig().subscribe(self._config_changed)
+
+    def _config_changed(self, old, new):
+        if old.config.get("logging") != new.config.get("logging"):
+            self.update(dict(new.config.get("logging") or self.config_default))
+
     def __populateFromConfig(self, config:json = None):
         if config:
             self.logging_dir = config.get("dir",self.config_default.get("dir"))
             self.logging_file = config.get("file_name",self.config_default.get("file_name"))
             self.level = config.get("level",self.config_default.get("level"))
             self.logging_fullpath = os.path.join(self.logging_dir,self.logging_file)
+            self.use_queue = config.get("async", False)
+            self.use_json = config.get("json", False)
+            self.console = config.get("console", True)
+            self.max_payload = int(config.get("max_payload", 1000))
+            self.sampling = {category: int(every) for category, every in (config.get("sampling") or {}).items()}
             self.config = config
-        
-    
+
+
     def __loadLogger(self, config:json = None):
         if not self.loggerLoaded:
             self.__populateFromConfig(config)
@@ -31,19 +108,29 @@ class PAIALogger(metaclass=PAIASingleton):
             self.logger = logging.getLogger('PAIAService')
             self.logger.setLevel(self.level)
             # Clean handlers
-            if self.logger.hasHandlers():
-                for handler in self.logger.handlers:
-                    self.logger.removeHandler(handler)
+            self.close()
+            for handler in list(self.logger.handlers) + self._handlers:
+                self.logger.removeHandler(handler)
+                handler.close()
             # Recreat handlers on load/reload
-            handler = logging.handlers.RotatingFileHandler(self.logging_fullpath, maxBytes=5*1024*1024, backupCount=3)
-            handler.setFormatter(logging.Formatter('%(asctime)s [%(threadName)s] %(levelname)s: %(message)s'))
-            self.logger.addHandler(handler)
-            console = logging.StreamHandler()
-            console.setFormatter(logging.Formatter('%(asctime)s [%(threadName)s] %(levelname)s: %(message)s'))
-            self.logger.addHandler(console)
+            formatter = _JSONFormatter() if self.use_json else logging.Formatter('%(asctime)s [%(threadName)s] %(levelname)s: %(message)s')
+            handlers = [logging.handlers.RotatingFileHandler(self.logging_fullpath, maxBytes=5*1024*1024, backupCount=3)]
+            if self.console:
+                handlers.append(logging.StreamHandler())
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            if self.use_queue:
+                records = queue.SimpleQueue()
+                self.logger.addHandler(_QueueHandler(records))
+                self.listener = logging.handlers.QueueListener(records, *handlers)
+                self.listener.start()
+            else:
+                for handler in handlers:
+                    self.logger.addHandler(handler)
+            self._handlers = handlers
             self.loggerLoaded = True
         return self.logger
-    
+
     def update(self, config:json = None):
         self.loggerLoaded = False
         return self.__loadLogger(config)
@@ -51,14 +138,48 @@ class PAIALogger(metaclass=PAIASingleton):
     def getLogger(self):
         return self.__loadLogger()
 
-    def info(self, val):
-        return self.__loadLogger().info(val)
+    def flush(self):
+        """Wait until the queued records are written."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener.start()
+
+    def close(self):
+        """Stop the listener thread, writing what is queued."""
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+
+    def payload(self, value) -> _Payload:
+        """``value`` for a ``%s`` argument, truncated to ``max_payload`` characters when written."""
+        return _Payload(value, self.max_payload)
+
+    def _sampled(self, category: str) -> bool:
+        every = self.sampling.get(category, 1)
+        if every <= 1:
+            return True
+        # Racy without a lock, a sampled event more or less does not matter
+        count = self._counters.get(category, 0)
+        self._counters[category] = count + 1
+        return count % every == 0
+
+    def _log(self, level: int, msg, args, category):
+        logger = self.logger if self.loggerLoaded else self.__loadLogger()
+        if not logger.isEnabledFor(level):
+            return
+        if category is None:
+            logger.log(level, msg, *args)
+        elif self._sampled(category):
+            logger.log(level, msg, *args, extra={"category": category})
+
+    def info(self, val, *args, category: str = None):
+        return self._log(logging.INFO, val, args, category)
 
-    def warning(self, val):
-        return self.__loadLogger().warning(val)    
+    def warning(self, val, *args, category: str = None):
+        return self._log(logging.WARNING, val, args, category)
 
-    def error(self, val):
-        return self.__loadLogger().error(val)
+    def error(self, val, *args, category: str = None):
+        return self._log(logging.ERROR, val, args, category)
 
-    def debug(self, val):
-        return self.__loadLogger().debug(val)
\ No newline at end of file
+    def debug(self, val, *args, category: str = None):
+        return self._log(logging.DEBUG, val, args, category)
@@ -0,0 +1,268 @@
+# paia/media_store.py
+import base64
+import collections
+import concurrent.futures
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+}
+
+# Image formats a service may ask for, with their PIL names
+IMAGE_FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG"}
+
+_NAME = re.compile(r"([0-9a-f]{64})(?:\.([a-z0-9]+))?")
+
+
+class PAIAMediaItem:
+    def __init__(self, name: str, data: bytes, created: float):
+        self.name = name
+        self.hash, _, self.extension = name.partition(".")
+        self.data = data
+        self.created = created
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES.get(self.extension, "application/octet-stream")
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.hash}"'
+
+    def data_url(self) -> str:
+        return f"data:{self.content_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+class PAIAMediaStore(metaclass=PAIASingleton):
+    """Content addressed store of generated media (images, audio).
+
+    Limits come from the ``media_store`` section::
+
+        "media_store": {"memory_bytes": 67108864, "disk_bytes": 1073741824, "ttl": 86400,
+                        "directory": "media", "cleanup_interval": 300, "encode_workers": 2}
+
+    An item is named ``<sha256>.<extension>`` after its bytes, so identical
+    results share one file and names never collide. Recent items live in a
+    memory LRU, every item is also written to ``directory`` where a
+    background thread drops files unused for ``ttl`` seconds, then the least
+    recently used ones until within ``disk_bytes``. Items are served on
+    ``/media/<name>`` of the service server.
+    """
+
+    def __init__(self):
+        config = PAIAConfig().getConfig().get("media_store", {})
+        self.memory_bytes = int(config.get("memory_bytes", 64 * 1024 ** 2))
+        self.disk_bytes = int(config.get("disk_bytes", 1024 ** 3))
+        self.ttl = float(config.get("ttl", 24 * 3600))
+        self.directory = os.path.join(PAIAConfig().root_dir, config.get("directory", "media"))
+        self.cleanup_interval = float(config.get("cleanup_interval", 300))
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(config.get("encode_workers", 2)), thread_name_prefix="Media encoder")
+        self._lock = threading.Lock()
+        self._memory: collections.OrderedDict[str, PAIAMediaItem] = collections.OrderedDict()
+        self._memory_used = 0
+        self._cleaner = None
+        self._stopped = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, data: bytes, extension: str) -> str:
+        """Store ``data``, returns its name."""
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension.lower()}"
+        item = PAIAMediaItem(name, data, time.time())
+        with self._lock:
+            self._remember(item)
+        self._write(item)
+        self._start_cleaner()
+        return name
+
+    def encode(self, image, format: str = "png", quality: int = None) -> concurrent.futures.Future:
+        """Encode a PIL image and store it on the encoder pool, the future's result is the name."""
+        format = format.lower()
+        if format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {format}")
+        return self.executor.submit(self._encode, image, format, quality)
+
+    def _encode(self, image, format: str, quality: int = None) -> str:
+        options = {}
+        if IMAGE_FORMATS[format] == "PNG":
+            # Lossless, quality trades size for speed instead (zlib level 1..9)
+            options["compress_level"] = 6 if quality is None else max(1, min(9, round(9 - int(quality) * 8 / 100)))
+        elif quality is not None:
+            options["quality"] = max(1, min(100, int(quality)))
+        if IMAGE_FORMATS[format] == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=IMAGE_FORMATS[format], **options)
+        return self.put(buffer.getvalue(), "jpeg" if format == "jpg" else format)
+
+    def get(self, name: str) -> PAIAMediaItem | None:
+        """The item named ``name`` (with or without extension), None when unknown or expired."""
+        match = _NAME.fullmatch(name)
+        if match is None:
+            return None
+        digest = match.group(1)
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(digest)
+            if item is not None and now - item.created > self.ttl:
+                self._forget(digest)
+                item = None
+            if item is not None:
+                self._memory.move_to_end(digest)
+                self.hits += 1
+                return item
+        item = self._read(digest, match.group(2), now)
+        with self._lock:
+            if item is None:
+                self.misses += 1
+                return None
+            self._remember(item)
+            self.hits += 1
+        return item
+
+    def contains(self, name: str) -> bool:
+        match = _NAME.fullmatch(name)
+        if match is None:
+            return False
+        with self._lock:
+            if match.group(1) in self._memory:
+                return True
+        return self._path(match.group(1), match.group(2)) is not None
+
+    def url(self, name: str) -> str:
+        return f"{PAIAConfig().getServiceAddress()}/media/{name}"
+
+    def event(self, name: str, media_type: str) -> dict:
+        """The result event of a stored item."""
+        return {"result": self.url(name), "type": media_type, "media": name}
+
+    def inline(self, event: dict) -> dict:
+        """``event`` with the bytes of its media as a ``data`` URL, for clients that skip the extra fetch."""
+        item = self.get(event["media"])
+        return event if item is None else dict(event, data=item.data_url())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries_in_memory": len(self._memory),
+                "bytes_in_memory": self._memory_used,
+            }
+
+    def cleanup(self, now: float = None):
+        """Drop files unused for ``ttl``, then the least recently used until within ``disk_bytes``."""
+        now = time.time() if now is None else now
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file() and _NAME.fullmatch(entry.name)]
+        except FileNotFoundError:
+            return
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                self._remove(entry.path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def close(self):
+        self._stopped.set()
+        self.executor.shutdown(wait=False)
+
+    def _remember(self, item: PAIAMediaItem):
+        self._forget(item.hash)
+        if len(item.data) > self.memory_bytes:
+            return
+        self._memory[item.hash] = item
+        self._memory_used += len(item.data)
+        while self._memory_used > self.memory_bytes:
+            _, oldest = self._memory.popitem(last=False)
+            self._memory_used -= len(oldest.data)
+
+    def _forget(self, digest: str):
+        item = self._memory.pop(digest, None)
+        if item is not None:
+            self._memory_used -= len(item.data)
+
+    def _path(self, digest: str, extension: str = None) -> str | None:
+        # Built from the name, a bare digest tries the known extensions instead of listing the directory
+        for candidate in ([extension] if extension else CONTENT_TYPES):
+            path = os.path.join(self.directory, f"{digest}.{candidate}")
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _write(self, item: PAIAMediaItem):
+        if self.disk_bytes <= 0:
+            return
+        path = os.path.join(self.directory, item.name)
+        try:
+            if os.path.exists(path):
+                # Same content again, only its age is refreshed
+                os.utime(path)
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(item.data)
+            os.replace(temporary, path)
+        except OSError as e:
+            PAIALogger().error(f"Failed to store media {item.name}: {str(e)}")
+
+    def _read(self, digest: str, extension: str, now: float) -> PAIAMediaItem | None:
+        path = self._path(digest, extension)
+        if path is None:
+            return None
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                self._remove(path)
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            # The mtime is the last use, cleanup drops the least recently used files first
+            os.utime(path)
+        except OSError:
+            return None
+        return PAIAMediaItem(os.path.basename(path), data, now)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _start_cleaner(self):
+        if self._cleaner is not None or self.cleanup_interval <= 0:
+            return
+        with self._lock:
+            if self._cleaner is not None:
+                return
+            self._cleaner = threading.Thread(target=self._clean, daemon=True, name="Media cleanup")
+        self._cleaner.start()
+
+    def _clean(self):
+        while not self._stopped.wait(self.cleanup_interval):
+            try:
+                self.cleanup()
+            except Exception as e:
+                PAIALogger().error(f"Media cleanup failed: {str(e)}")
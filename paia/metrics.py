@@ -0,0 +1,211 @@
+# paia/metrics.py
+import bisect
+import math
+import threading
+
+from paia import PAIASingleton
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_GAP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base of the lock-light metrics.
+
+    Every thread records into its own cells (a dict of label values to a
+    list), registered once per thread. Recording never takes a lock, the
+    cells of all threads are merged when ``/metrics`` is scraped. Cells of
+    threads that ended (one per connection with ThreadingTCPServer) are
+    folded into ``_base`` and dropped then and whenever a new thread
+    registers, so they do not pile up on a node nobody scrapes.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads: list[tuple[threading.Thread, dict]] = []
+        self._base: dict[tuple, list] = {}
+
+    def _cells(self) -> dict:
+        cells = getattr(self._local, "cells", None)
+        if cells is None:
+            cells = self._local.cells = {}
+            with self._lock:
+                self._prune()
+                self._threads.append((threading.current_thread(), cells))
+        return cells
+
+    def _new_cell(self) -> list:
+        return [0.0]
+
+    def _cell(self, labels: tuple) -> list:
+        cells = self._cells()
+        cell = cells.get(labels)
+        if cell is None:
+            cell = cells[labels] = self._new_cell()
+        return cell
+
+    @staticmethod
+    def _add(merged: dict, cells: dict):
+        for labels, cell in list(cells.items()):
+            total = merged.get(labels)
+            if total is None:
+                merged[labels] = list(cell)
+            else:
+                for i, value in enumerate(cell):
+                    total[i] += value
+
+    def _prune(self):
+        """Fold the cells of finished threads into ``_base``, under ``_lock``."""
+        alive = []
+        for thread, cells in self._threads:
+            if thread.is_alive():
+                alive.append((thread, cells))
+            else:
+                # A finished thread records nothing more
+                self._add(self._base, cells)
+        self._threads = alive
+
+    def _merged(self) -> dict[tuple, list]:
+        with self._lock:
+            self._prune()
+            alive = list(self._threads)
+            merged = {labels: list(cell) for labels, cell in self._base.items()}
+        for _, cells in alive:
+            self._add(merged, cells)
+        return merged
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for labels, cell in sorted(self._merged().items()):
+            lines.extend(self._render_cell(labels, cell))
+        return lines
+
+    def _render_cell(self, labels: tuple, cell: list) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(cell[0])}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self._cell(labels)[0] += amount
+
+    def value(self, *labels) -> float:
+        cell = self._merged().get(labels)
+        return cell[0] if cell else 0.0
+
+
+class Gauge(Counter):
+    """Summed over threads, so ``inc`` and ``dec`` may happen on different threads."""
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self._cell(labels)[0] -= amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_cell(self) -> list:
+        # Per bucket counts (not cumulative), +Inf, sum, count
+        return [0.0] * (len(self.buckets) + 3)
+
+    def observe(self, value: float, *labels):
+        cell = self._cell(labels)
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def _render_cell(self, labels: tuple, cell: list) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), cell):
+            cumulative += count
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_number(cumulative)}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(cell[-2])}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cell[-1])}")
+        return lines
+
+
+class PAIAMetrics(metaclass=PAIASingleton):
+    """Process wide metrics, exposed in the Prometheus text format on ``/metrics``.
+
+    Rates (tokens/sec, images/sec, pixels/sec) are counters, e.g.
+    ``rate(paia_generated_tokens_total[1m])``.
+    """
+
+    def __init__(self):
+        self.requests = Counter("paia_requests_total", "Service requests received.", ("service",))
+        self.errors = Counter("paia_request_errors_total", "Service requests that failed, by status.", ("service", "status"))
+        self.request_seconds = Histogram("paia_request_duration_seconds", "Total request latency, queue wait included.", ("service",))
+        self.queue_seconds = Histogram("paia_queue_wait_seconds", "Time spent waiting for admission.", ("service",))
+        self.first_event_seconds = Histogram("paia_time_to_first_token_seconds", "Time from admission to the first result event.", ("service",))
+        self.event_gap_seconds = Histogram("paia_inter_token_seconds", "Time between consecutive result events.", ("service",), TOKEN_GAP_BUCKETS)
+        self.model_load_seconds = Histogram("paia_model_load_seconds", "Model load time on a model cache miss.", ("model",))
+        self.tokens = Counter("paia_generated_tokens_total", "Tokens generated by text services.", ("service",))
+        self.generation_seconds = Counter("paia_generation_seconds_total", "Time spent generating, for tokens/sec and images/sec.", ("service",))
+        self.images = Counter("paia_images_total", "Images generated.", ("service",))
+        self.pixels = Counter("paia_pixels_total", "Pixels generated.", ("service",))
+        self.active_streams = Gauge("paia_active_streams", "SSE responses currently streaming.", ("service",))
+        self._metrics = [
+            self.requests, self.errors, self.request_seconds, self.queue_seconds, self.first_event_seconds,
+            self.event_gap_seconds, self.model_load_seconds, self.tokens, self.generation_seconds, self.images,
+            self.pixels, self.active_streams,
+        ]
+        self._collectors = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, name: str, collector):
+        """``collector()`` returns exposition lines computed at scrape time."""
+        self._collectors[name] = collector
+
+    def observe_stats(self, service_name: str, stats: dict):
+        """Account the ``{"stats": ...}`` event of a service."""
+        if stats.get("generated_tokens"):
+            self.tokens.inc(service_name, amount=stats["generated_tokens"])
+        if stats.get("images"):
+            self.images.inc(service_name, amount=stats["images"])
+            self.pixels.inc(service_name, amount=stats.get("pixels", 0))
+        seconds = stats.get("total_seconds")
+        if seconds:
+            self.generation_seconds.inc(service_name, amount=seconds)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in list(self._collectors.values()):
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
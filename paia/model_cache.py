@@ -0,0 +1,281 @@
+# paia/model_cache.py
+import collections
+import contextlib
+import gc
+import sys
+import threading
+import time
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger
+from paia.metrics import PAIAMetrics, escape_label
+
+
+def estimate_size(value, _seen: set = None) -> int:
+    """Bytes held by a model-like object (torch modules, HF pipelines, bundles)."""
+    seen = _seen if _seen is not None else set()
+    if value is None or id(value) in seen:
+        return 0
+    seen.add(id(value))
+    torch = sys.modules.get("torch")
+    if torch is not None and isinstance(value, torch.nn.Module):
+        total = 0
+        for tensor in list(value.parameters()) + list(value.buffers()):
+            # Tied weights are shared between modules, count them once
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+        return total
+    if isinstance(value, dict):
+        return sum(estimate_size(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_size(v, seen) for v in value)
+    # diffusers pipelines expose their modules as components, HF pipelines as model
+    components = getattr(value, "components", None)
+    if isinstance(components, dict):
+        return estimate_size(components, seen)
+    return estimate_size(getattr(value, "model", None), seen)
+
+
+class _Entry:
+    def __init__(self, key, value, size, pinned, on_evict, load_seconds):
+        self.key = key
+        self.value = value
+        self.size = size
+        self.pinned = pinned
+        self.on_evict = on_evict
+        self.load_seconds = load_seconds
+        self.refs = 0
+        self.last_used = time.time()
+
+
+class _Loading:
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+
+class PAIAModelCache(metaclass=PAIASingleton):
+    """Process wide cache of loaded models, every service loads through it.
+
+    Configured by the ``model_cache`` section::
+
+        "model_cache": {"max_bytes": 8589934592, "idle_timeout": 900, "pinned": ["text-generator:..."]}
+
+    Models are accounted by their weight size and evicted least recently used
+    first when the budget is exceeded, or after ``idle_timeout`` seconds
+    without use. Pinned models and models leased by a running request are
+    never evicted. Concurrent first requests for the same key share a single
+    load (single-flight).
+    """
+
+    def __init__(self):
+        config = PAIAConfig().getConfig().get("model_cache", {})
+        self.max_bytes = int(config.get("max_bytes", 0))  # 0 = unlimited
+        self.idle_timeout = float(config.get("idle_timeout", 0))  # 0 = never
+        self._pinned_keys = set(config.get("pinned", []))
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[str, _Entry] = collections.OrderedDict()
+        self._loading: dict[str, _Loading] = {}
+        self._reaper = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_failures = 0
+        PAIAMetrics().add_collector("model_cache", self._collect_metrics)
+
+    def configure(self, max_bytes: int = None, idle_timeout: float = None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = int(max_bytes)
+            if idle_timeout is not None:
+                self.idle_timeout = float(idle_timeout)
+            evicted = self._enforce_budget()
+        self._finalize(evicted)
+
+    def acquire(self, key: str, loader, size=None, pin: bool = False, on_evict=None):
+        """Return the model for ``key`` and lease it until ``release(key)``.
+
+        ``loader()`` builds the model on a miss. ``size`` is bytes or a
+        callable taking the model (default: estimate_size). ``on_evict`` is
+        called with the model when it leaves the cache.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    entry.refs += 1
+                    entry.last_used = time.time()
+                    self._entries.move_to_end(key)
+                    return entry.value
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = _Loading()
+                    self.misses += 1
+                    break
+            # Somebody else is loading this key, wait for it and retry
+            loading.event.wait()
+            if loading.error is not None:
+                raise loading.error
+
+        try:
+            started = time.perf_counter()
+            PAIALogger().info("Model cache: loading %s", key)
+            value = loader()
+            load_seconds = time.perf_counter() - started
+            PAIAMetrics().model_load_seconds.observe(load_seconds, key)
+            nbytes = size(value) if callable(size) else size if size is not None else estimate_size(value)
+        except BaseException as e:
+            with self._lock:
+                self.load_failures += 1
+                del self._loading[key]
+            loading.error = e
+            loading.event.set()
+            raise
+
+        with self._lock:
+            entry = _Entry(key, value, int(nbytes), pin or key in self._pinned_keys, on_evict, load_seconds)
+            entry.refs = 1
+            self._entries[key] = entry
+            del self._loading[key]
+            evicted = self._enforce_budget()
+        loading.event.set()
+        PAIALogger().info("Model cache: loaded %s (%.1f MB in %.1fs)", key, entry.size / 2 ** 20, load_seconds)
+        self._finalize(evicted)
+        self._start_reaper()
+        return value
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.time()
+            evicted = self._enforce_budget()
+        self._finalize(evicted)
+
+    @contextlib.contextmanager
+    def use(self, key: str, loader, size=None, pin: bool = False, on_evict=None):
+        """Lease a model for the duration of a ``with`` block."""
+        value = self.acquire(key, loader, size=size, pin=pin, on_evict=on_evict)
+        try:
+            yield value
+        finally:
+            self.release(key)
+
+    def pin(self, key: str, pinned: bool = True):
+        with self._lock:
+            if pinned:
+                self._pinned_keys.add(key)
+            else:
+                self._pinned_keys.discard(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.pinned = pinned
+            evicted = self._enforce_budget()
+        self._finalize(evicted)
+
+    def unpin(self, key: str):
+        self.pin(key, False)
+
+    def evict(self, key: str) -> bool:
+        """Drop an unused model now, returns False when it is leased or absent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refs > 0:
+                return False
+            self._remove(entry)
+        self._finalize([entry])
+        return True
+
+    def contains(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_failures": self.load_failures,
+                "max_bytes": self.max_bytes,
+                "total_bytes": self.total_bytes,
+                "models": {
+                    entry.key: {
+                        "bytes": entry.size,
+                        "refs": entry.refs,
+                        "pinned": entry.pinned,
+                        "idle_seconds": round(now - entry.last_used, 3),
+                        "load_seconds": round(entry.load_seconds, 3),
+                    }
+                    for entry in self._entries.values()
+                },
+                "loading": list(self._loading),
+            }
+
+    def _collect_metrics(self) -> list[str]:
+        stats = self.stats()
+        lines = ["# HELP paia_model_cache_bytes Bytes of a model resident in the model cache.", "# TYPE paia_model_cache_bytes gauge"]
+        lines += [f'paia_model_cache_bytes{{model="{escape_label(key)}"}} {model["bytes"]}' for key, model in stats["models"].items()]
+        lines += ["# HELP paia_model_cache_leases Requests currently using a cached model.", "# TYPE paia_model_cache_leases gauge"]
+        lines += [f'paia_model_cache_leases{{model="{escape_label(key)}"}} {model["refs"]}' for key, model in stats["models"].items()]
+        for name in ("hits", "misses", "evictions", "load_failures"):
+            lines += [f"# TYPE paia_model_cache_{name}_total counter", f"paia_model_cache_{name}_total {stats[name]}"]
+        lines += ["# TYPE paia_model_cache_total_bytes gauge", f"paia_model_cache_total_bytes {stats['total_bytes']}"]
+        return lines
+
+    def _remove(self, entry: _Entry):
+        del self._entries[entry.key]
+        self.evictions += 1
+        PAIALogger().info("Model cache: evicted %s (%.1f MB)", entry.key, entry.size / 2 ** 20)
+
+    def _enforce_budget(self) -> list[_Entry]:
+        """Evict (under the lock) until within budget and idle limits, LRU first."""
+        evicted = []
+        now = time.time()
+        total = self.total_bytes
+        for entry in list(self._entries.values()):
+            if entry.pinned or entry.refs > 0:
+                continue
+            over = self.max_bytes and total > self.max_bytes
+            idle = self.idle_timeout and now - entry.last_used > self.idle_timeout
+            if over or idle:
+                self._remove(entry)
+                total -= entry.size
+                evicted.append(entry)
+        return evicted
+
+    def _finalize(self, evicted: list[_Entry]):
+        """Release evicted models outside the lock."""
+        if not evicted:
+            return
+        for entry in evicted:
+            if entry.on_evict:
+                try:
+                    entry.on_evict(entry.value)
+                except Exception as e:
+                    PAIALogger().error(f"Model cache: on_evict for {entry.key} failed: {str(e)}")
+            entry.value = None
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _start_reaper(self):
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap, daemon=True, name="Model cache reaper")
+        self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1.0, min(self.idle_timeout / 2, 30.0)) if self.idle_timeout > 0 else 30.0)
+            with self._lock:
+                evicted = self._enforce_budget()
+            self._finalize(evicted)
@@ -0,0 +1,101 @@
+# paia/preload.py
+import threading
+import time
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger, PAIAModelCache, PAIAServiceManager
+
+
+class _ModelState:
+    def __init__(self, service_name: str, key: str):
+        self.service_name = service_name
+        self.key = key
+        self.state = "pending"
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "service": self.service_name,
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
+
+
+class PAIAPreloader(metaclass=PAIASingleton):
+    """Loads and warms up the models of services with ``preload: true``.
+
+    Every model is loaded in its own background thread through
+    PAIAModelCache (pinned, so it stays resident), then runs one warmup
+    inference. ``ready()`` is True once every preloaded model is warm.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: dict[str, _ModelState] = {}
+        self._threads: list[threading.Thread] = []
+        self.started = None
+
+    def start(self, services: dict = None):
+        """Start preloading, ``services`` maps names to instances (default: from PAIAServiceManager)."""
+        if services is None:
+            configs = PAIAConfig().getConfig().get("services", {})
+            services = {name: PAIAServiceManager().get_service(name) for name, config in configs.items() if config.get("preload") and config.get("enabled", True)}
+        self.started = time.time()
+        for service_name, service in services.items():
+            if service is None:
+                continue
+            try:
+                models = service.preload_models()
+            except Exception as e:
+                PAIALogger().error(f"Preload of {service_name} failed: {str(e)}")
+                continue
+            for key, loader, on_evict, warmup in models:
+                state = _ModelState(service_name, key)
+                with self._lock:
+                    if key in self._models:
+                        continue
+                    self._models[key] = state
+                thread = threading.Thread(target=self._preload, args=(state, loader, on_evict, warmup), daemon=True, name=f"Preload {key}")
+                self._threads.append(thread)
+                thread.start()
+
+    def _preload(self, state: _ModelState, loader, on_evict, warmup):
+        cache = PAIAModelCache()
+        try:
+            state.state = "loading"
+            started = time.perf_counter()
+            model = cache.acquire(state.key, loader, on_evict=on_evict)
+            cache.pin(state.key)
+            state.load_seconds = round(time.perf_counter() - started, 3)
+            try:
+                if warmup is not None:
+                    state.state = "warming"
+                    started = time.perf_counter()
+                    warmup(model)
+                    state.warmup_seconds = round(time.perf_counter() - started, 3)
+            finally:
+                cache.release(state.key)
+            state.state = "ready"
+            PAIALogger().info("Preloaded %s (load %ss, warmup %ss)", state.key, state.load_seconds, state.warmup_seconds)
+        except Exception as e:
+            state.state = "failed"
+            state.error = str(e)
+            PAIALogger().error(f"Preload of {state.key} failed: {str(e)}")
+
+    def wait(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in list(self._threads):
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return self.ready()
+
+    def ready(self) -> bool:
+        with self._lock:
+            return all(state.state == "ready" for state in self._models.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            models = {key: state.to_dict() for key, state in self._models.items()}
+        return {"ready": all(model["state"] == "ready" for model in models.values()), "models": models}
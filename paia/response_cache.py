@@ -0,0 +1,223 @@
+# paia/response_cache.py
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger, PAIAMediaStore
+
+
+def _normalize(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return None if value is None else str(value).strip()
+
+
+def request_key(service_name: str, query: dict, parameters: list = None, required: list = None) -> str | None:
+    """Hash of the service name and the query restricted to ``parameters`` (all when empty).
+
+    Values are normalized to stripped strings, None when the query misses
+    one of the ``required`` parameters.
+    """
+    if not isinstance(query, dict):
+        return None
+    if any(query.get(name) in (None, "") for name in required or []):
+        return None
+    normalized = {name: _normalize(query.get(name)) for name in parameters or sorted(query)}
+    payload = json.dumps({"service": service_name, "query": normalized}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PAIAResponseCache(metaclass=PAIASingleton):
+    """Content addressed cache of service responses, in front of ``process``.
+
+    Global limits come from the ``response_cache`` section::
+
+        "response_cache": {"memory_bytes": 67108864, "disk_bytes": 1073741824,
+                           "ttl": 86400, "db_path": "responses.db"}
+
+    A service opts in with ``services.<name>.cache``::
+
+        "cache": {"enabled": true, "parameters": ["text", "lang"], "required": ["seed"]}
+
+    The key is a hash of the service name and the query restricted to
+    ``parameters`` (the whole query when empty), values normalized to
+    strings. Requests missing any ``required`` parameter (e.g. a seed for
+    sampling services) are not cached. The recorded events of a complete,
+    error free run are kept in a memory LRU and in sqlite, and replayed on
+    a hit for both streaming and non streaming requests.
+    """
+
+    def __init__(self):
+        config = PAIAConfig().getConfig().get("response_cache", {})
+        self.memory_bytes = int(config.get("memory_bytes", 64 * 1024 ** 2))
+        self.disk_bytes = int(config.get("disk_bytes", 1024 ** 3))
+        self.ttl = float(config.get("ttl", 24 * 3600))
+        self.db_path = config.get("db_path", os.path.join(PAIAConfig().root_dir, "responses.db"))
+        # Guards the memory tier only, sqlite has its own lock so memory hits never wait on disk I/O
+        self._lock = threading.Lock()
+        self._memory: collections.OrderedDict[str, tuple[float, str]] = collections.OrderedDict()
+        self._memory_used = 0
+        self._db_lock = threading.Lock()
+        self._db = None
+        # Bytes of the stored records, summed once when the database is opened and kept up to date
+        self._disk_used = 0
+        self._last_disk_cleanup = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, service_name: str, query: dict) -> str | None:
+        """Cache key of a request, None when the service or request is not cacheable."""
+        config = PAIAConfig().service(service_name).get("cache", {})
+        if not config.get("enabled", False):
+            return None
+        return request_key(service_name, query, config.get("parameters"), config.get("required"))
+
+    def process(self, service_name: str, service, query: dict):
+        """``service.process(query)`` served from the cache when possible."""
+        key = self.key(service_name, query)
+        if key is None:
+            return service.process(query)
+        events = self.get(key)
+        if events is not None:
+            PAIALogger().debug("Response cache hit for %s: %s", service_name, key)
+            return self._replay(events)
+        return self._record(key, service.process(query))
+
+    def _replay(self, events: list[dict]):
+        yield from events
+        yield {"stats": {"cache": "hit"}}
+
+    def _record(self, key: str, events):
+        recorded = []
+        for event in events:
+            if "error" in event:
+                # Failed runs are passed through and never stored
+                recorded = None
+            elif recorded is not None and set(event) != {"stats"}:
+                recorded.append(event)
+            yield event
+        # Only reached when the client consumed the whole response
+        if recorded:
+            self.put(key, recorded)
+
+    def get(self, key: str) -> list[dict] | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                self._forget(key)
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._load(key, now)
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self._remember(key, *entry)
+        events = json.loads(entry[1])
+        # Media is referenced by name (or path), a response whose media is gone is stale
+        if any(not self._media_exists(event) for event in events):
+            self.delete(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return events
+
+    @staticmethod
+    def _media_exists(event: dict) -> bool:
+        if "media" in event and not PAIAMediaStore().contains(event["media"]):
+            return False
+        return all(os.path.exists(path) for name, path in event.items() if name.endswith("_path"))
+
+    def put(self, key: str, events: list[dict]):
+        record = json.dumps(events, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, record)
+        with self._db_lock:
+            db = self._connection()
+            if db:
+                self._disk_used += len(record) - self._stored_size(db, key)
+                db.execute("INSERT OR REPLACE INTO responses (key, record, size, created) VALUES (?, ?, ?, ?)", (key, record, len(record), now))
+                self._cleanup_disk(now)
+                db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._forget(key)
+        with self._db_lock:
+            db = self._connection()
+            if db:
+                self._disk_used -= self._stored_size(db, key)
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries_in_memory": len(self._memory),
+                "bytes_in_memory": self._memory_used,
+            }
+
+    def _remember(self, key: str, created: float, record: str):
+        self._forget(key)
+        if len(record) > self.memory_bytes:
+            return
+        self._memory[key] = (created, record)
+        self._memory_used += len(record)
+        while self._memory_used > self.memory_bytes:
+            _, (_, oldest) = self._memory.popitem(last=False)
+            self._memory_used -= len(oldest)
+
+    def _forget(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= len(entry[1])
+
+    def _connection(self) -> sqlite3.Connection | None:
+        if self._db is None and self.db_path and self.disk_bytes > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, record TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL)")
+            self._db.commit()
+            self._disk_used = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._db
+
+    @staticmethod
+    def _stored_size(db: sqlite3.Connection, key: str) -> int:
+        row = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _load(self, key: str, now: float) -> tuple[float, str] | None:
+        with self._db_lock:
+            db = self._connection()
+            if not db:
+                return None
+            row = db.execute("SELECT created, record FROM responses WHERE key = ?", (key,)).fetchone()
+        if not row or now - row[0] > self.ttl:
+            return None
+        return row[0], row[1]
+
+    def _cleanup_disk(self, now: float):
+        """Drop expired responses, then the oldest ones until within ``disk_bytes``, under ``_db_lock``."""
+        db = self._db
+        if now - self._last_disk_cleanup > 60:
+            self._last_disk_cleanup = now
+            self._disk_used -= db.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE created < ?", (now - self.ttl,)).fetchone()[0]
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        if self._disk_used > self.disk_bytes:
+            for key, size in db.execute("SELECT key, size FROM responses ORDER BY created").fetchall():
+                if self._disk_used <= self.disk_bytes:
+                    break
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._disk_used -= size
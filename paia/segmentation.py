@@ -0,0 +1,66 @@
+# paia/segmentation.py
+import re
+
+# Sentence end punctuation (optionally closed by quotes / brackets) followed by whitespace, or a line break
+_BOUNDARY = re.compile(r"([.!?…。！？]+[\"'”’»)\]]*)(\s+)|(\s*\n\s*)")
+# Preferred places to cut a sentence that is too long, strongest first
+_CUTS = (re.compile(r"[;:]\s+"), re.compile(r",\s+"), re.compile(r"\s+"))
+
+
+def split_sentences(text: str) -> list[tuple[str, str]]:
+    """Split ``text`` into ``(sentence, separator)`` pairs.
+
+    Joining every sentence with its separator gives back the original text
+    (minus leading whitespace), so translated sentences can be reassembled
+    with the same spacing and line breaks.
+    """
+    pieces = []
+    pos = len(text) - len(text.lstrip())
+    for match in _BOUNDARY.finditer(text, pos):
+        if match.group(1):
+            end, separator = match.end(1), match.group(2)
+        else:
+            end, separator = match.start(), match.group(3)
+        sentence = text[pos:end]
+        if sentence.strip():
+            pieces.append((sentence, separator))
+        elif pieces:
+            sentence, previous = pieces[-1]
+            pieces[-1] = (sentence, previous + separator)
+        pos = match.end()
+    if text[pos:].strip():
+        pieces.append((text[pos:].rstrip(), text[len(text.rstrip()):]))
+    return pieces
+
+
+def _cut(sentence: str, max_chars: int) -> list[tuple[str, str]]:
+    pieces = []
+    while len(sentence) > max_chars:
+        window = sentence[:max_chars + 1]
+        for pattern in _CUTS:
+            matches = [m for m in pattern.finditer(window) if m.start() > 0]
+            if matches:
+                last = matches[-1]
+                pieces.append((sentence[:last.start() + len(last.group().rstrip())], last.group()[len(last.group().rstrip()):]))
+                sentence = sentence[last.end():]
+                break
+        else:
+            # One very long word, cut it hard
+            pieces.append((sentence[:max_chars], ""))
+            sentence = sentence[max_chars:]
+    pieces.append((sentence, ""))
+    return pieces
+
+
+def segment_text(text: str, max_chars: int = 400) -> list[tuple[str, str]]:
+    """Sentences of ``text`` with the ones longer than ``max_chars`` cut at
+    clause or word boundaries, as ``(segment, separator)`` pairs."""
+    segments = []
+    for sentence, separator in split_sentences(text):
+        if max_chars and len(sentence) > max_chars:
+            pieces = _cut(sentence, max_chars)
+            pieces[-1] = (pieces[-1][0], separator)
+            segments.extend(pieces)
+        else:
+            segments.append((sentence, separator))
+    return segments
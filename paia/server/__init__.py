@@ -1,4 +1,6 @@
-__all__ = ["PAIAServiceServer","PAIAServiceHandler","PAIAUIServer","PAIAUIHandler"]
+__all__ = ["PAIAServiceServer","PAIAServiceHandler","PAIAAsyncServiceServer","PAIAUIServer","PAIAUIHandler","PAIAGatewayServer","PAIAGatewayHandler"]
 
 from .service import PAIAServiceServer, PAIAServiceHandler
-from .ui import PAIAUIServer, PAIAUIHandler
\ No newline at end of file
+from .aio import PAIAAsyncServiceServer
+from .ui import PAIAUIServer, PAIAUIHandler
+from .gateway import PAIAGatewayServer, PAIAGatewayHandler
\ No newline at end of file
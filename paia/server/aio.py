@@ -0,0 +1,268 @@
+# paia/server/aio.py
+import asyncio
+import concurrent.futures
+import http
+import json
+import threading
+
+from paia import PAIALogger, PAIAConfig
+from .api import PAIAAPIError, PAIAServiceRequest, handle_get
+from .sse import encode_event
+
+_END = object()
+
+
+class PAIAAsyncServiceServer:
+    """asyncio HTTP/1.1 server for the service API (``server.engine: asyncio``).
+
+    Same REST/SSE API as PAIAServiceServer, but connections are coroutines:
+    keep-alive connections and long SSE streams do not hold a thread. Blocking
+    ``service.process`` generators are advanced one event at a time in a
+    bounded executor (``server.workers``) and every write is awaited, so a
+    slow client slows down its own stream instead of buffering it in memory.
+
+    Mirrors the socketserver interface used by PAIAApplication.run_server
+    (context manager, ``serve_forever``, ``shutdown``, ``server_close``).
+    """
+
+    def __init__(self, server_address: tuple, handler=None, workers: int = None, keepalive_timeout: float = None, max_body: int = None):
+        config = PAIAConfig().getConfig().get("server", {})
+        self.server_address = server_address
+        self.workers = int(workers or config.get("workers", 32))
+        self.keepalive_timeout = float(keepalive_timeout or config.get("keepalive_timeout", 75))
+        self.max_body = int(max_body or config.get("max_body", 16 * 1024 ** 2))
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Service worker")
+        self.loop = None
+        self._server = None
+        self._stopped = None
+        self.ready = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.server_close()
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    def shutdown(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+
+    def server_close(self):
+        self.shutdown()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        host, port = self.server_address
+        self._server = await asyncio.start_server(self._connection, host, port, limit=64 * 1024)
+        self.server_address = self._server.sockets[0].getsockname()[:2]
+        self.ready.set()
+        async with self._server:
+            await self._stopped.wait()
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send_json(writer, 431, {"error": "Request header fields too large"}, False)
+                    break
+                keep_alive = await self._request(head, reader, writer)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            PAIALogger().error(f"Server error: {str(e)}")
+        finally:
+            writer.close()
+
+    async def _request(self, head: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """Serve one request, returns whether the connection stays open."""
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ", 2)
+        except ValueError:
+            await self._send_json(writer, 400, {"error": "Bad request"}, False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        http11 = version == "HTTP/1.1"
+        keep_alive = connection != "close" if http11 else connection == "keep-alive"
+
+        length = int(headers.get("content-length", 0) or 0)
+        if length > self.max_body:
+            await self._send_json(writer, 413, {"error": "Payload too large"}, False)
+            return False
+        body = await reader.readexactly(length) if length else b""
+
+        if method == "GET":
+            PAIALogger().debug("GET request: %s", path)
+            try:
+                status, response_headers, body = await self._blocking(handle_get, path, headers)
+                await self._send(writer, status, response_headers, body, keep_alive)
+            except PAIAAPIError as e:
+                await self._send_error(writer, e, keep_alive)
+        elif method == "POST":
+            keep_alive = await self._post(body, writer, keep_alive, http11)
+        elif method == "OPTIONS":
+            PAIALogger().debug("OPTIONS request")
+            await self._send(writer, 200, {
+                "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type",
+                "Content-Length": "0",
+            }, b"", keep_alive)
+        else:
+            await self._send_json(writer, 501, {"error": f"Unsupported method ({method})"}, keep_alive)
+        return keep_alive
+
+    async def _post(self, body: bytes, writer: asyncio.StreamWriter, keep_alive: bool, http11: bool) -> bool:
+        try:
+            request = await self._blocking(PAIAServiceRequest, body)
+        except PAIAAPIError as e:
+            await self._send_error(writer, e, keep_alive)
+            return keep_alive
+        except Exception as e:
+            PAIALogger().error(f"Server error: {str(e)}")
+            await self._send_error(writer, PAIAAPIError(500, f"Server error: {str(e)}"), keep_alive)
+            return keep_alive
+        try:
+            return await self._respond(request, writer, keep_alive, http11)
+        finally:
+            # Also leaves the queue when the client disconnects while waiting
+            request.close()
+
+    async def _respond(self, request: PAIAServiceRequest, writer: asyncio.StreamWriter, keep_alive: bool, http11: bool) -> bool:
+        # SSE: chunked on HTTP/1.1 so the connection can be reused, else closed at the end
+        stream_keep_alive = keep_alive and http11
+        chunked = stream_keep_alive
+        started = False
+        try:
+            if request.stream and request.queue_events and not request.admitted:
+                # Headers go out right away, the client sees its queue position
+                await self._start_stream(writer, chunked)
+                started = True
+
+                async def on_position(position):
+                    await self._write(writer, encode_event({"queue": {"position": position}}), chunked)
+                await self._admit(request, on_position)
+            else:
+                await self._admit(request)
+            if not request.stream:
+                await self._send_json(writer, 200, await self._blocking(request.response), keep_alive)
+                return keep_alive
+        except PAIAAPIError as e:
+            if not started:
+                await self._send_error(writer, e, keep_alive)
+                return keep_alive
+            await self._write(writer, encode_event(e.event()), chunked)
+            await self._end_stream(writer, chunked)
+            return stream_keep_alive
+        except Exception as e:
+            if started:
+                raise
+            PAIALogger().error(f"Server error: {str(e)}")
+            await self._send_error(writer, PAIAAPIError(500, f"Server error: {str(e)}"), keep_alive)
+            return keep_alive
+
+        if not started:
+            await self._start_stream(writer, chunked)
+        events = request.events()
+        try:
+            while True:
+                try:
+                    event = await self._blocking(next, events, _END)
+                except Exception as e:
+                    event_data = {"error": f"Streaming error: {str(e)}"}
+                    PAIALogger().error(f"Streaming error: {json.dumps(event_data)}")
+                    await self._write(writer, encode_event(event_data), chunked)
+                    break
+                if event is _END:
+                    break
+                PAIALogger().debug("Sending SSE event: %s", PAIALogger().payload(event), category="sse")
+                # Awaiting the drain is the backpressure, the next event is produced after it
+                await self._write(writer, encode_event(event), chunked)
+            await self._end_stream(writer, chunked)
+        finally:
+            # Client gone or stream done, release the service (and its model lease) on a worker
+            try:
+                await self._blocking(events.close)
+            except ValueError:
+                # Still running on a worker (server shutdown), it finishes on its own
+                pass
+        return stream_keep_alive
+
+    async def _admit(self, request: PAIAServiceRequest, on_position=None, interval: float = 1.0):
+        """Wait for the request's turn without holding a worker thread."""
+        if request.admitted:
+            return
+        granted = self.loop.create_future()
+
+        def grant():
+            if not granted.done():
+                granted.set_result(True)
+        request.ticket.add_done_callback(lambda ticket: self.loop.call_soon_threadsafe(grant))
+        position = None
+        while not granted.done():
+            if on_position is not None and request.ticket.position not in (position, 0):
+                position = request.ticket.position
+                await on_position(position)
+            remaining = request.ticket.remaining()
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), interval if remaining is None else min(interval, remaining))
+            except asyncio.TimeoutError:
+                if remaining is not None and remaining <= interval:
+                    error = request.timeout_error()
+                    if error is not None:
+                        raise error
+
+    async def _start_stream(self, writer: asyncio.StreamWriter, chunked: bool):
+        headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        if chunked:
+            headers["Transfer-Encoding"] = "chunked"
+        await self._send(writer, 200, headers, None, chunked)
+
+    async def _end_stream(self, writer: asyncio.StreamWriter, chunked: bool):
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def _blocking(self, function, *args):
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    async def _write(self, writer: asyncio.StreamWriter, data: bytes, chunked: bool):
+        if chunked:
+            data = b"%x\r\n%s\r\n" % (len(data), data)
+        writer.write(data)
+        await writer.drain()
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, headers: dict, body: bytes | None, keep_alive: bool):
+        lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}", "Access-Control-Allow-Origin: *"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if body:
+            writer.write(body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, data: dict, keep_alive: bool):
+        body = json.dumps(data).encode("utf-8")
+        await self._send(writer, status, {"Content-Type": "application/json", "Content-Length": str(len(body))}, body, keep_alive)
+        PAIALogger().debug("Sent response: status=%s, data=%s", status, PAIALogger().payload(data))
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: PAIAAPIError, keep_alive: bool):
+        body = json.dumps({"error": error.message}).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+        headers.update(error.headers)
+        await self._send(writer, error.status, headers, body, keep_alive)
+        PAIALogger().error(f"Sent error: status={error.status}, message={error.message}")
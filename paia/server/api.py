@@ -0,0 +1,336 @@
+# paia/server/api.py
+import json
+import time
+
+from paia import PAIALogger, PAIAConfig, PAIAServiceManager, PAIAModelCache, PAIAMediaStore, PAIAResponseCache, PAIASingleFlight, PAIAMetrics, PAIAPreloader
+from paia.admission import PAIAAdmission, PAIAQueueFull
+from paia import worker
+from paia.single_flight import PAIAFlightSubscription
+from .sse import make_encoder
+
+
+class PAIAAPIError(Exception):
+    """An error answered to the client as ``{"error": message}``."""
+
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+    def event(self) -> dict:
+        """The error as an SSE event, for streams whose headers are already sent."""
+        event = {"error": self.message, "status": self.status}
+        if "Retry-After" in self.headers:
+            event["retry_after"] = int(self.headers["Retry-After"])
+        return event
+
+
+def _services():
+    # From the manifest, no service module is imported to answer
+    specs = PAIAServiceManager().get_services()
+    PAIALogger().info("Returning services: %s", list(specs))
+    return {"services": list(specs), "manifest": {name: spec.to_dict() for name, spec in specs.items()}}
+
+
+def _config():
+    try:
+        PAIALogger().info("Returning config")
+        return PAIAConfig().getConfig()
+    except Exception:
+        PAIALogger().error(f"Permission denied for config file : {PAIAConfig().config_file}")
+        raise PAIAAPIError(500, "Permission denied for config file")
+
+
+# GET routes shared by the threading and asyncio servers
+ROUTES = {
+    "/services": _services,
+    "/config": _config,
+    "/models": lambda: PAIAModelCache().stats(),
+    "/cache": lambda: PAIAResponseCache().stats(),
+    "/queues": lambda: PAIAAdmission().stats(),
+    "/media": lambda: PAIAMediaStore().stats(),
+    "/flights": lambda: PAIASingleFlight().stats(),
+    "/workers": worker.stats,
+}
+
+
+# GET routes answered as plain text instead of JSON
+TEXT_ROUTES = {
+    "/metrics": lambda: PAIAMetrics().render(),
+}
+
+
+def _ready():
+    status = PAIAPreloader().status()
+    # Not ready (503) until every preloaded model is warm, so load balancers wait for it
+    return (200 if status["ready"] else 503), status
+
+
+# GET routes that choose their own status code
+STATUS_ROUTES = {
+    "/health/live": lambda: (200, {"status": "live"}),
+    "/health/ready": _ready,
+}
+
+
+def _byte_range(value: str, size: int) -> tuple[int, int] | None:
+    """Inclusive ``(start, end)`` of a single ``bytes=`` range, None to send everything."""
+    unit, _, spec = value.partition("=")
+    if unit.strip() != "bytes" or "," in spec or "-" not in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise PAIAAPIError(416, "Range not satisfiable", {"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _media(name: str, headers: dict) -> tuple[int, dict, bytes]:
+    item = PAIAMediaStore().get(name)
+    if item is None:
+        raise PAIAAPIError(404, "Media not found")
+    # Content addressed, a name always has the same bytes
+    response_headers = {
+        "Content-Type": item.content_type,
+        "ETag": item.etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if item.etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")] or headers.get("if-none-match") == "*":
+        return 304, response_headers, b""
+    size = len(item.data)
+    byte_range = _byte_range(headers["range"], size) if "range" in headers else None
+    if byte_range is None:
+        return 200, dict(response_headers, **{"Content-Length": str(size)}), item.data
+    start, end = byte_range
+    response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response_headers["Content-Length"] = str(end - start + 1)
+    return 206, response_headers, item.data[start:end + 1]
+
+
+def handle_get(path: str, headers: dict = None) -> tuple[int, dict, bytes]:
+    """Status, headers and body of a GET route, ``headers`` are the request's (lower case names)."""
+    if path.startswith("/media/"):
+        return _media(path[len("/media/"):].split("?", 1)[0], headers or {})
+    if path in TEXT_ROUTES:
+        content_type, body = "text/plain; version=0.0.4; charset=utf-8", TEXT_ROUTES[path]().encode("utf-8")
+        status = 200
+    elif path in STATUS_ROUTES:
+        status, data = STATUS_ROUTES[path]()
+        content_type, body = "application/json", json.dumps(data).encode("utf-8")
+    else:
+        route = ROUTES.get(path)
+        if route is None:
+            PAIALogger().warning(f"Unknown path: {path}")
+            raise PAIAAPIError(404, "Not found")
+        status, content_type, body = 200, "application/json", json.dumps(route()).encode("utf-8")
+    return status, {"Content-Type": content_type, "Content-Length": str(len(body))}, body
+
+
+class PAIAServiceRequest:
+    """A validated POST to a service, independent of the server implementation."""
+
+    def __init__(self, body: bytes | str):
+        self.started = time.perf_counter()
+        self.finished = False
+        # Metrics label, unknown names are not used as labels
+        self.label = "unknown"
+        self.ticket = None
+        self.service = None
+        self.holds_service = False
+        self.flight = None
+        try:
+            self._validate(body)
+        except PAIAAPIError as e:
+            PAIAMetrics().errors.inc(self.label, str(e.status))
+            self.close()
+            raise
+
+    def _validate(self, body: bytes | str):
+        try:
+            request_data = json.loads(body)
+        except json.JSONDecodeError:
+            PAIALogger().error("Invalid JSON payload")
+            raise PAIAAPIError(400, "Invalid JSON payload")
+        PAIALogger().debug("Received POST: %s", PAIALogger().payload(request_data))
+
+        self.service_name = request_data.get("service")
+        self.query = request_data.get("query", {})
+        self.stream = request_data.get("stream", False)
+        self.delta = request_data.get("delta", False)
+        # Opt-in {"queue": {"position": n}} events while an SSE request waits for its turn
+        self.queue_events = request_data.get("queue_events", False)
+        # Media results carry their bytes as a base64 data URL too
+        self.inline = request_data.get("inline", False)
+        if not self.service_name:
+            PAIALogger().error("Missing service name")
+            raise PAIAAPIError(400, "Service name is required")
+        if not PAIAConfig().service(self.service_name).get("enabled", True):
+            PAIALogger().warning(f"Service disabled: {self.service_name}")
+            raise PAIAAPIError(403, f"Service '{self.service_name}' is disabled")
+        # Held until the request ends, a config change meanwhile closes the instance only after it
+        self.service = PAIAServiceManager().acquire(self.service_name)
+        self.holds_service = self.service is not None
+        if not self.service:
+            PAIALogger().error(f"Service not found: {self.service_name}")
+            raise PAIAAPIError(404, f"Service '{self.service_name}' not found")
+        self.label = self.service_name
+        PAIAMetrics().requests.inc(self.label)
+        validate = getattr(self.service, "validate", None)
+        error = validate(self.query) if validate is not None else None
+        if error:
+            PAIALogger().warning(f"Invalid {self.service_name} query: {error}")
+            raise PAIAAPIError(400, error)
+        # A request identical to one in flight shares its events and takes no service slot
+        self.flight = PAIASingleFlight().join(self.service_name, self.query)
+        queue = PAIAAdmission().queue(self.service_name) if self.flight is None else None
+        if queue is not None:
+            try:
+                self.ticket = queue.submit()
+            except PAIAQueueFull as e:
+                PAIALogger().warning(str(e))
+                raise PAIAAPIError(429, str(e), {"Retry-After": str(e.retry_after)})
+        PAIALogger().info("Processing %s, stream=%s", self.service_name, self.stream)
+
+    @property
+    def admitted(self) -> bool:
+        return self.ticket is None or self.ticket.granted
+
+    def timeout_error(self) -> "PAIAAPIError | None":
+        """Leave the queue when past ``max_wait``, returns the 503 to answer with."""
+        error = self.ticket.queue.expire(self.ticket)
+        if error is None:
+            return None
+        PAIALogger().warning(str(error))
+        PAIAMetrics().errors.inc(self.label, "503")
+        return PAIAAPIError(503, str(error), {"Retry-After": str(error.retry_after)})
+
+    def admit(self, interval: float = 1.0):
+        """Block until the request may run, yielding queue position events.
+
+        Raises PAIAAPIError (503) when ``max_wait`` passes first.
+        """
+        position = None
+        while not self.admitted:
+            if self.ticket.position != position:
+                position = self.ticket.position
+                yield {"queue": {"position": position}}
+            remaining = self.ticket.remaining()
+            if self.ticket.wait(interval if remaining is None else min(interval, remaining)):
+                break
+            if remaining is not None and remaining <= interval:
+                error = self.timeout_error()
+                if error is not None:
+                    raise error
+
+    def close(self):
+        """Give the service slot back, safe to call more than once."""
+        if self.ticket is not None:
+            self.ticket.release()
+        if self.flight is not None:
+            self.flight.close()
+        if not self.finished:
+            self.finished = True
+            if self.service is not None:
+                PAIAMetrics().request_seconds.observe(time.perf_counter() - self.started, self.label)
+                if self.holds_service:
+                    PAIAServiceManager().release(self.service)
+
+    def results(self):
+        """Raw service results, shared with identical requests in flight and served from the response cache when possible."""
+        metrics = PAIAMetrics()
+        if self.ticket is not None and self.ticket.granted_at is not None:
+            metrics.queue_seconds.observe(self.ticket.granted_at - self.ticket.submitted, self.label)
+        if self.flight is not None:
+            results = self.flight
+        else:
+            ticket, service = self.ticket, self.service
+
+            def release():
+                if ticket is not None:
+                    ticket.release()
+                PAIAServiceManager().release(service)
+
+            results = PAIASingleFlight().process(self.service_name, self.query, lambda: PAIAResponseCache().process(self.service_name, self.service, self.query), release)
+            if isinstance(results, PAIAFlightSubscription) and results.leader:
+                # The service slot and instance now belong to the flight, released when its run ends
+                self.ticket = None
+                self.holds_service = False
+        # Tokens and images of a shared run are accounted once, by the request that started it
+        follower = isinstance(results, PAIAFlightSubscription) and not results.leader
+        admitted = last = time.perf_counter()
+        first = True
+        try:
+            for result in results:
+                now = time.perf_counter()
+                if set(result) == {"stats"}:
+                    if not follower:
+                        metrics.observe_stats(self.label, result["stats"])
+                elif "error" in result:
+                    metrics.errors.inc(self.label, "event")
+                else:
+                    if first:
+                        metrics.first_event_seconds.observe(now - admitted, self.label)
+                        first = False
+                    else:
+                        metrics.event_gap_seconds.observe(now - last, self.label)
+                    last = now
+                    if self.inline and "media" in result:
+                        result = PAIAMediaStore().inline(result)
+                yield result
+        except Exception:
+            metrics.errors.inc(self.label, "500")
+            raise
+        finally:
+            results.close()
+
+    def events(self):
+        """SSE payloads for a streaming response, the final event included."""
+        encoder = make_encoder(self.delta)
+        results = self.results()
+        PAIAMetrics().active_streams.inc(self.label)
+        try:
+            for result in results:
+                event = encoder.encode(result)
+                if event is not None:
+                    yield event
+        finally:
+            PAIAMetrics().active_streams.dec(self.label)
+            results.close()
+        event = encoder.final()
+        if event is not None:
+            yield event
+
+    def response(self) -> dict:
+        """Body of a non-streaming response."""
+        PAIALogger().info("Non-streaming for: %s", self.service_name)
+        # Streamed services yield growing results, the last event is the complete one
+        encoder = make_encoder()
+        response = None
+        media = []
+        results = self.results()
+        try:
+            for result in results:
+                result = encoder.encode(result)
+                if result is None:
+                    continue
+                response = result
+                if "error" in result:
+                    break
+                if result.get("type") in ("image", "audio"):
+                    media.append(result)
+        finally:
+            results.close()
+        if response is None:
+            return {"result": ""}
+        # Several images (num_images, prompt lists) are all listed, the last one stays the result
+        if len(media) > 1 and "error" not in response:
+            response = dict(response, results=media)
+        return response
@@ -0,0 +1,139 @@
+# paia/server/gateway.py
+import http.client
+import http.server
+import json
+import socketserver
+
+from paia import PAIALogger
+from paia.gateway import PAIAGateway
+
+# Not forwarded, they describe one connection and not the response
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "proxy-authenticate", "proxy-authorization"}
+# Request headers passed on to the backends
+FORWARDED = ("Content-Type", "Range", "If-None-Match", "Accept")
+
+
+class PAIAGatewayServer(socketserver.ThreadingTCPServer):
+    pass
+
+
+class PAIAGatewayHandler(http.server.BaseHTTPRequestHandler):
+    """The service API of a PAIA node, answered by the backends PAIAGateway routes to."""
+
+    def do_GET(self):
+        PAIALogger().debug("Gateway GET request: %s", self.path)
+        gateway = PAIAGateway()
+        if self.path == "/services":
+            self.__send_json(200, gateway.services())
+        elif self.path == "/gateway":
+            self.__send_json(200, gateway.stats())
+        elif self.path == "/health/live":
+            self.__send_json(200, {"status": "live"})
+        elif self.path == "/health/ready":
+            ready = gateway.ready()
+            self.__send_json(200 if ready else 503, {"ready": ready})
+        else:
+            # Media and the stats routes, from the first backend that has them
+            for backend in [backend for backend in gateway.backends if backend.healthy]:
+                if self.__proxy(backend, "GET", None, retry_on=(404,)):
+                    return
+            self.__send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        gateway = PAIAGateway()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            service_name = json.loads(body).get("service")
+        except (ValueError, AttributeError):
+            self.__send_json(400, {"error": "Invalid JSON payload"})
+            return
+        if not service_name:
+            self.__send_json(400, {"error": "Service name is required"})
+            return
+        # Requests that fail before any byte was answered are tried on the next backend
+        for backend in gateway.candidates(service_name):
+            if self.__proxy(backend, "POST", body):
+                return
+        if gateway.known(service_name):
+            self.__send_json(503, {"error": f"No backend of service '{service_name}' is available"}, {"Retry-After": str(max(1, int(gateway.health_interval)))})
+        else:
+            self.__send_json(404, {"error": f"Service '{service_name}' not found"})
+
+    def __proxy(self, backend, method: str, body: bytes | None, retry_on: tuple = ()) -> bool:
+        """Relay the request to ``backend``, False when it never reached the backend (try the next one)."""
+        gateway = PAIAGateway()
+        connection = backend.connection(gateway.connect_timeout)
+        gateway.begin(backend)
+        try:
+            try:
+                connection.connect()
+                # Connecting is quick or the node is down, answers may take minutes
+                connection.sock.settimeout(gateway.timeout)
+                headers = {name: self.headers[name] for name in FORWARDED if self.headers.get(name)}
+                connection.request(method, self.path, body=body, headers=headers)
+            except (OSError, http.client.HTTPException) as e:
+                gateway.failed(backend, e)
+                return False
+            try:
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                # The backend has the request and may still be running it, another one would run it twice
+                gateway.failed(backend, e)
+                PAIALogger().error(f"Gateway {method} {self.path} to {backend.url} got no response: {str(e)}")
+                if isinstance(e, TimeoutError):
+                    self.__send_json(504, {"error": f"Backend did not answer within {gateway.timeout} seconds"})
+                else:
+                    self.__send_json(502, {"error": f"Backend failed: {str(e)}"})
+                return True
+            if response.status in retry_on:
+                return False
+            PAIALogger().debug("Gateway %s %s -> %s (%s)", method, self.path, backend.url, response.status)
+            try:
+                self.__relay(response)
+            except (OSError, http.client.HTTPException) as e:
+                # The client went away or the backend broke off, either way the response is over
+                PAIALogger().warning(f"Relaying {self.path} from {backend.url} stopped: {str(e)}")
+                self.close_connection = True
+            return True
+        finally:
+            gateway.end(backend)
+            connection.close()
+
+    def __relay(self, response: http.client.HTTPResponse):
+        self.send_response(response.status)
+        length = None
+        for name, value in response.getheaders():
+            if name.lower() in HOP_BY_HOP:
+                continue
+            if name.lower() == "content-length":
+                length = value
+            self.send_header(name, value)
+        self.end_headers()
+        if length is None:
+            # Streams end when the connection closes, as the backends send them
+            self.close_connection = True
+        # read1 returns what arrived so far, every SSE event is passed on as soon as the backend wrote it
+        while True:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            self.wfile.flush()
+
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.end_headers()
+
+    def __send_json(self, status: int, data: dict, headers: dict = None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
@@ -3,7 +3,9 @@ import http
 import json
 import http.server
 
-from paia import PAIALogger,PAIAConfig,PAIAServiceManager
+from paia import PAIALogger
+from .api import PAIAAPIError, PAIAServiceRequest, handle_get
+from .sse import encode_event
 
 # Server
 class PAIAServiceServer(socketserver.ThreadingTCPServer):
@@ -12,77 +14,76 @@ class PAIAServiceServer(socketserver.ThreadingTCPServer):
 class PAIAServiceHandler(http.server.BaseHTTPRequestHandler):
     ## REST API
     def do_GET(self):
-        PAIALogger().debug(f"GET request: {self.path}")
-        if self.path == "/services":
-            services = PAIAServiceManager().get_services(as_str=True)
-            PAIALogger().info(f"Returning services: {services}")
-            self.__send_response(200, {"services": services["services"]})
-            
-        elif self.path == "/config":
-            try:
-                PAIALogger().info("Returning config")
-                self.__send_response(200, PAIAConfig().getConfig())
-            except:
-                PAIALogger().error(f"Permission denied for config file : {PAIAConfig().config_file}")
-                self.__send_error(500, "Permission denied for config file")
-        else:
-            PAIALogger().warning(f"Unknown path: {self.path}")
-            self.__send_error(404, "Not found")
+        PAIALogger().debug("GET request: %s", self.path)
+        try:
+            status, headers, body = handle_get(self.path, {name.lower(): value for name, value in self.headers.items()})
+        except PAIAAPIError as e:
+            self.__send_error(e.status, e.message, e.headers)
+            return
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
     ## SERVICE API
     def do_POST(self):
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length).decode('utf-8')
-            request_data = json.loads(post_data)
-            PAIALogger().debug(f"Received POST: {request_data}")
-
-            service_name = request_data.get("service")
-            query = request_data.get("query", {})
-            stream = request_data.get("stream", False)
-            if not service_name:
-                PAIALogger().error("Missing service name")
-                self.__send_error(400, "Service name is required")
-                return
-            if not PAIAConfig().getConfig().get("services", {}).get(service_name, {}).get("enabled", True):
-                PAIALogger().warning(f"Service disabled: {service_name}")
-                self.__send_error(403, f"Service '{service_name}' is disabled")
-                return
-            service = PAIAServiceManager().get_service(service_name)
-            if not service:
-                PAIALogger().error(f"Service not found: {service_name}")
-                self.__send_error(404, f"Service '{service_name}' not found")
-                return
-            PAIALogger().info(f"Processing {service_name}, stream={stream}")
-            if stream:
-                self.send_response(200)
-                self.send_header("Content-Type", "text/event-stream")
-                self.send_header("Cache-Control", "no-cache")
-                self.send_header("Connection", "keep-alive")
-                self.send_header("Access-Control-Allow-Origin", "*")
-                self.end_headers()
-                try:
-                    for result in service.process(query):
-                        event_data = json.dumps(result)
-                        PAIALogger().debug(f"Sending SSE event: {event_data}")
-                        self.wfile.write(f"data: {event_data}\n\n".encode('utf-8'))
+            request = PAIAServiceRequest(post_data)
+            try:
+                if request.stream and request.queue_events:
+                    # Headers go out right away, the client sees its queue position
+                    self.__start_stream()
+                    try:
+                        for event in request.admit():
+                            self.wfile.write(encode_event(event))
+                            self.wfile.flush()
+                    except PAIAAPIError as e:
+                        self.wfile.write(encode_event(e.event()))
                         self.wfile.flush()
-                except Exception as e:
-                    event_data = json.dumps({"error": f"Streaming error: {str(e)}"})
-                    PAIALogger().error(f"Streaming error: {event_data}")
-                    self.wfile.write(f"data: {event_data}\n\n".encode('utf-8'))
-                    self.wfile.flush()
-            else:
-                PAIALogger().info(f"Non-streaming for: {service_name}")
-                for result in service.process(query):
-                    self.__send_response(200, result)
-                    break
-        except json.JSONDecodeError:
-            PAIALogger().error("Invalid JSON payload")
-            self.__send_error(400, "Invalid JSON payload")
+                        return
+                    self.__stream(request)
+                else:
+                    for _ in request.admit():
+                        pass
+                    if request.stream:
+                        self.__start_stream()
+                        self.__stream(request)
+                    else:
+                        self.__send_response(200, request.response())
+            finally:
+                request.close()
+        except PAIAAPIError as e:
+            self.__send_error(e.status, e.message, e.headers)
         except Exception as e:
             PAIALogger().error(f"Server error: {str(e)}")
             self.__send_error(500, f"Server error: {str(e)}")
 
+    def __start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        # The stream has no length, closing the connection is what ends it for the client
+        self.close_connection = True
+
+    def __stream(self, request):
+        try:
+            for event in request.events():
+                PAIALogger().debug("Sending SSE event: %s", PAIALogger().payload(event), category="sse")
+                self.wfile.write(encode_event(event))
+                self.wfile.flush()
+        except Exception as e:
+            event_data = json.dumps({"error": f"Streaming error: {str(e)}"})
+            PAIALogger().error(f"Streaming error: {event_data}")
+            self.wfile.write(f"data: {event_data}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
     def do_OPTIONS(self):
         PAIALogger().debug("OPTIONS request")
         self.send_response(200)
@@ -97,12 +98,14 @@ class PAIAServiceHandler(http.server.BaseHTTPRequestHandler):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.end_headers()
         self.wfile.write(json.dumps(data).encode('utf-8'))
-        PAIALogger().debug(f"Sent response: status={status}, data={data}")
+        PAIALogger().debug("Sent response: status=%s, data=%s", status, PAIALogger().payload(data))
 
-    def __send_error(self, status, message):
+    def __send_error(self, status, message, headers=None):
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", "*")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(json.dumps({"error": message}).encode('utf-8'))
         PAIALogger().error(f"Sent error: status={status}, message={message}")
\ No newline at end of file
@@ -0,0 +1,80 @@
+# paia/server/sse.py
+import json
+import time
+
+
+def encode_event(data: dict) -> bytes:
+    """Serialize one Server-Sent Event."""
+    return f"data: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class FullTextEncoder:
+    """Original protocol: every event carries the whole result so far.
+
+    Text services also send ``delta`` and stats-only events, both are
+    dropped here so old clients see exactly the payload they always did.
+    """
+
+    def encode(self, result: dict) -> dict | None:
+        if set(result) == {"stats"}:
+            return None
+        if "delta" in result:
+            result = {key: value for key, value in result.items() if key != "delta"}
+        return result
+
+    def final(self) -> dict | None:
+        return None
+
+
+class DeltaEncoder:
+    """Opt-in protocol (``"delta": true`` in the request).
+
+    Text events carry only the appended ``delta`` and a sequence number
+    ``seq``. Other events (images, audio, errors) pass through with a
+    ``seq``. The final event has ``done``, the full ``result`` and ``stats``.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.seq = 0
+        self.stats = {}
+        self.started = time.perf_counter()
+        self.first_event = None
+
+    def encode(self, result: dict) -> dict | None:
+        if set(result) == {"stats"}:
+            self.stats.update(result["stats"])
+            return None
+        if self.first_event is None:
+            self.first_event = time.perf_counter()
+        text = result.get("result")
+        if "delta" in result:
+            delta = result["delta"]
+        elif isinstance(text, str) and result.get("type", "text") == "text" and text.startswith(self.text):
+            delta = text[len(self.text):]
+        else:
+            delta = None
+        if delta is None:
+            event = dict(result)
+        else:
+            event = {key: value for key, value in result.items() if key != "result"}
+            event["delta"] = delta
+            self.text += delta
+        event["seq"] = self.seq
+        self.seq += 1
+        return event
+
+    def final(self) -> dict:
+        now = time.perf_counter()
+        stats = {
+            "events": self.seq,
+            "chars": len(self.text),
+            "seconds": round(now - self.started, 6),
+            "time_to_first_event": round((self.first_event or now) - self.started, 6),
+        }
+        stats.update(self.stats)
+        return {"done": True, "result": self.text, "seq": self.seq, "stats": stats}
+
+
+def make_encoder(delta: bool = False):
+    return DeltaEncoder() if delta else FullTextEncoder()
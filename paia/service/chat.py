@@ -1,7 +1,14 @@
+import os
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+from transformers import AutoModelForCausalLM, AutoTokenizer
 from datetime import datetime
-from paia import PAIAService,PAIALogger
+from paia import PAIAService,PAIALogger,PAIAConfig,PAIAModelCache
+from paia.generation.decoding import DecodingEngine
+from paia.generation.history import ChatHistory, HistoryCompactor
+from paia.generation.logits import LogitsProcessor
+from paia.generation.scheduler import BatchScheduler
+from paia.generation.session import SessionStore
+from paia.backend import PAIABackend
 
 logger = PAIALogger()
 
@@ -9,101 +16,150 @@ class Chat(PAIAService):
     def __init__(self, model_id="Heartsync/NSFW-Uncensored"):
         """Initialize the chatbot with a specified model and conversation history."""
         self.model_id = model_id
-        self.model = None
-        self.tokenizer = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.history = []  # List to store conversation history
-        self.max_history_length = 50  # Limit history to last 5 exchanges
+        # Conversations are kept per session id, bounded in memory and spilled to disk
+        sessions = PAIAConfig().service("chat").get("sessions", {})
+        self.sessions = SessionStore(
+            db_path=sessions.get("db_path", os.path.join(PAIAConfig().root_dir, "sessions.db")),
+            max_sessions=int(sessions.get("max_sessions", 256)),
+            max_bytes=int(sessions.get("max_bytes", 2 * 1024 ** 3)),
+            ttl=float(sessions.get("ttl", 1800)),
+        )
+        # The prompt is a summary plus the recent turns within a token budget, older turns are summarized in the background
+        history = PAIAConfig().service("chat").get("history", {})
+        self.history = ChatHistory(max_tokens=int(history.get("max_tokens", 1024)), keep_ratio=float(history.get("keep_ratio", 0.75)))
+        self.summary_tokens = int(history.get("summary_tokens", 96))
+        self.head_ids = []
+        self.compactor = HistoryCompactor(self.history, self.summarize, head=lambda: self.head_ids, name="chat history", sessions=self.sessions)
+
+    def close(self):
+        """Stop compacting and spill every session, the manager drops the instance on a config change."""
+        self.compactor.close()
+        self.sessions.close()
 
     def load_model(self):
-        if self.model:
-            return
-        """Load the pre-trained model and tokenizer."""
-        try:
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_id, 
-                torch_dtype=torch.bfloat16 if self.device == "cuda" else torch.float32
-            ).to(self.device)
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_id)
-            self.history_pipe = pipeline("summarization",model=self.model,tokenizer=self.tokenizer)
-        except Exception as e:
-            raise
+        """Load the pre-trained model and tokenizer, called by PAIAModelCache on a miss."""
+        backend = PAIABackend("chat", default_dtype=torch.bfloat16)
+        model = backend.prepare(AutoModelForCausalLM.from_pretrained(
+            self.model_id, 
+            torch_dtype=backend.dtype
+        ))
+        tokenizer = AutoTokenizer.from_pretrained(self.model_id)
+        batching = PAIAConfig().service("chat").get("batching", {})
+        if batching.get("enabled", True):
+            return BatchScheduler(model, tokenizer, max_batch_size=batching.get("max_batch_size", 8), device=backend.device, name="chat", autocast=backend.autocast)
+        return DecodingEngine(model, tokenizer, device=backend.device, autocast=backend.autocast)
+
+    def unload_model(self, engine):
+        engine.close()
+
+    @property
+    def cache_key(self):
+        return f"chat:{self.model_id}"
+
+    def warmup(self, engine):
+        stream = engine.generate(engine.tokenizer.encode("User: Hello\nBot: "), 4)
+        for _ in stream:
+            pass
 
-    def add_to_history(self, user_input, response):
-        self.load_model()
-        """Add a user input and bot response to the conversation history."""
+    def preload_models(self):
+        return [(self.cache_key, self.load_model, self.unload_model, self.warmup)]
+
+    def add_to_history(self, session, engine, user_input, response, token_ids):
+        """Add a turn and the token ids it added to the transcript to the conversation history."""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.history.append({"timestamp": timestamp, "user": user_input, "bot": response})
-        # Keep only the last max_history_length exchanges
-        if len(self.history) > self.max_history_length:
-            self.history = self.history_pipe(self.get_history_context())[0]["summary"]
-
-    def get_history_context(self):
-        """Build a context string from the conversation history."""
-        context = ""
-        for entry in self.history:
-            context += f"User: {entry['user']}\nBot: {entry['bot']}\n"
-        return context
+        if self.history.append(session, {"timestamp": timestamp, "user": user_input, "bot": response}, token_ids, self.head_ids):
+            # Turns that slid out of the window are summarized off the request path
+            self.compactor.submit(session)
+
+    def get_history_context(self, session):
+        """Build a context string from the summary and the recent turns."""
+        return self.history.context(session)
+
+    def summarize(self, summary, entries):
+        """Summary of an earlier summary and the turns after it, run by the compactor."""
+        conversation = "".join(f"User: {entry['user']}\nBot: {entry['bot']}\n" for entry in entries)
+        prompt = f"Summarize the following conversation in a few sentences.\n\n{summary}\n{conversation}\nSummary:"
+        with PAIAModelCache().use(self.cache_key, self.load_model, on_evict=self.unload_model) as engine:
+            stream = engine.generate(engine.tokenizer.encode(prompt), self.summary_tokens, stop=engine.stop_matcher(["User:", "Bot:"]))
+            text = engine.tokenizer.decode([token_id for token_id in stream if token_id not in engine.eos_token_ids], skip_special_tokens=True).strip()
+            summary_ids = engine.tokenizer.encode(f"Summary of the conversation so far: {text}\n", add_special_tokens=False)
+        return text, summary_ids
 
     def process(self,query):
-        self.load_model()
-        """Generate a response to the user input, incorporating history."""
+        """Generate a response to the user input, continuing the session transcript."""
         user_input = query.get("text","")
+        session_id = str(query.get("session_id", "default"))
         max_length = int(query.get("max_length",50))
         max_tokens=max_length
-        temperature=0.8
+        config = PAIAConfig().service("chat")
+        # Sampling settings from the query over services.chat.sampling, one processor per request
+        select = LogitsProcessor.from_query(query, dict({"temperature": 0.8}, **config.get("sampling", {})))
+        stop_strings = query.get("stop") or config.get("stop", ["User:", "Bot:"])
 
         if not user_input.strip():
             return "Please provide a valid input."
         
+        session = self.sessions.get(session_id)
         try:
-            # Build prompt with history and current input
-            context = self.get_history_context()
-            prompt = f"{context}User: {user_input}\nBot: "
-            input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(self.device)
-            attention_mask = torch.ones(input_ids.shape, dtype=torch.long).to(self.device)
-
-            # Generate response in streaming mode
-            self.model.eval()
-            generated_ids = input_ids
-            generated_text = ""
-            with torch.no_grad():
-                for step in range(max_length + input_ids.shape[1]):
-                    outputs = self.model(generated_ids,is_assistant=True, attention_mask=attention_mask, max_new_tokens=1 + input_ids.shape[1],stop_strings=["Bot","\n"],generate_full_text=False)
-                    next_token_logits = outputs.logits[:, -1, :]
-                    next_token_id = torch.argmax(next_token_logits, dim=-1).unsqueeze(-1)
-                    generated_ids = torch.cat((generated_ids, next_token_id), dim=1)
-                    attention_mask = torch.cat((attention_mask, torch.ones((1, 1), dtype=torch.long).to(self.device)), dim=1)
-
-                    # Decode the new token
-                    new_token = self.tokenizer.decode(next_token_id[0], skip_special_tokens=True)
-                    if new_token in ["Bot","User"]:
-                        break
-                    if new_token:
-                        generated_text += new_token
-                        logger.debug(f"Streaming token: {new_token}")
-                        yield {"result": generated_text}
-
-                    # Stop if EOS token is reached
-                    if next_token_id.item() == self.tokenizer.eos_token_id:
-                        logger.info("EOS token reached")
-                        break
-
-            # Add final response to history
-            self.add_to_history(user_input, generated_text)
+            with session.lock, PAIAModelCache().use(self.cache_key, self.load_model, on_evict=self.unload_model) as engine:
+                # Only the new turn is encoded, the transcript is kept as token ids
+                self.head_ids = engine.tokenizer.encode("", add_special_tokens=True)
+                turn_ids = engine.tokenizer.encode(f"User: {user_input}\nBot: ", add_special_tokens=False)
+                input_ids = (session.token_ids or self.head_ids) + turn_ids
+
+                # Generate response in streaming mode, prefilling only what is not cached yet
+                stream = engine.generate(input_ids, max_tokens, past_key_values=session.past_key_values, cached_len=session.cached_len, keep_cache=True, select=select, stop=engine.stop_matcher(stop_strings))
+                detokenizer = engine.detokenizer(input_ids)
+                generated_text = ""
+                reply_ids = []
+                try:
+                    # The stream ends at a stop sequence (next speaker), its tokens are never yielded
+                    for token_id in stream:
+                        new_token = detokenizer.push(token_id)
+                        if token_id not in engine.eos_token_ids:
+                            reply_ids.append(token_id)
+                        if new_token:
+                            generated_text += new_token
+                            logger.debug("Streaming token: %s", new_token, category="token")
+                            yield {"result": generated_text, "delta": new_token}
+                finally:
+                    # Leaves the shared batch at the next step, wait for the cache to be handed back
+                    stream.close()
+                    for _ in stream:
+                        pass
+                new_token = detokenizer.flush()
+                if new_token:
+                    generated_text += new_token
+                    yield {"result": generated_text, "delta": new_token}
+                if stream.finish_reason == "eos":
+                    logger.info("EOS token reached")
+
+                # Keep the transcript and the cache of its processed prefix for the next turn
+                newline_ids = engine.tokenizer.encode("\n", add_special_tokens=False)
+                session.token_ids = input_ids + reply_ids + newline_ids
+                session.set_cache(stream.past_key_values, min(stream.cached_len, len(input_ids) + len(reply_ids)))
+
+                # Add final response to history, over the token budget the oldest turns leave the transcript
+                self.add_to_history(session, engine, user_input, generated_text, turn_ids + reply_ids + newline_ids)
+            yield {"stats": stream.stats}
 
         except Exception as e:
             logger.error(f"Error generating streaming response: {str(e)}")
             yield {"error": f"Streaming response failed: {str(e)}"}
+        finally:
+            # Hands the session back to the store, which may spill it from now on
+            self.sessions.put(session)
 
-    def display_history(self):
+    def display_history(self, session_id="default"):
         """Display the conversation history."""
-        if not self.history:
+        session = self.sessions.get(session_id)
+        self.sessions.put(session)
+        history = session.history
+        if not history:
             print("No conversation history yet.")
             return
         print("\n--- Conversation History ---")
-        for entry in self.history:
+        for entry in history:
             print(f"[{entry['timestamp']}] User: {entry['user']}")
             print(f"[{entry['timestamp']}] Bot: {entry['bot']}")
         print("---------------------------\n")
-
@@ -1,79 +1,155 @@
 import threading
-import importlib
 import inspect
-import os
 
 from paia import PAIASingleton,PAIALogger,PAIAConfig,PAIAService
+from .manifest import MANIFEST, PAIAServiceSpec
 
 class PAIAServiceManager(metaclass=PAIASingleton):
+    """Services by name, from the manifest and ``register``.
+
+    Listing services imports nothing, a service module is imported when the
+    service is first used (or preloaded). Services outside the package are
+    declared in config with ``services.<name>.module`` and ``class``.
+    With ``services.<name>.worker.enabled`` a service runs in worker
+    processes (see paia.worker) instead of the server process.
+
+    Requests take their instance with ``acquire`` and hand it back with
+    ``release``. An instance dropped by ``register`` or a config change is
+    no longer served, and is closed once its last request released it.
+    """
+
     def __init__(self):
         self._lock = threading.Lock()
-        self._service_names : dict[str] = {}
-        self._service_registry : dict[type] = {}
-        self._service_instances : dict[PAIAService] = {}
-        self._services_loaded : bool = False
-
-    def get_services(self, as_str : bool = False): 
-        if not self._services_loaded:
-            self._load_services()
-        
-        if as_str:
-            return self._service_names
-        
-        return self._service_registry
-        
-    def get_service(self, service_name: str) -> PAIAService | None:
-        if not self._services_loaded:
-            self._load_services()
-        result = None
-        try:
-            self._lock.acquire()
-            service_class = self._service_registry[service_name]
-            if service_class:
-                if not service_name in self._service_instances:
-                    PAIALogger().debug(f"Adding service: {service_name}")
-                    self._service_instances[service_name] = service_class()
-                result = self._service_instances[service_name]
-        except Exception as e:
-            PAIALogger().error(f"{str(e)}")
-        if self._lock.locked():
-            self._lock.release()
-        if result:
-            return result
+        self._specs : dict[str, PAIAServiceSpec] = {}
+        self._service_locks : dict[str, threading.Lock] = {}
+        self._service_instances : dict[str, PAIAService] = {}
+        # Requests using an instance, by id, and dropped instances closed when their last one ends
+        self._uses : dict[int, int] = {}
+        self._retired : dict[int, tuple[PAIAService, PAIAServiceSpec]] = {}
+        # Bumped when a name's instance is dropped, acquire retries if it changed under it
+        self._generations : dict[str, int] = {}
+        for spec in MANIFEST:
+            self._specs[spec.name] = spec
+        self._register_configured(PAIAConfig().getConfig().get("services", {}))
+        PAIAConfig().subscribe(self._config_changed)
+
+    def _register_configured(self, services: dict):
+        for name, config in services.items():
+            if config.get("module") and config.get("class"):
+                self.register(name, module=config["module"], class_name=config["class"], streamable=config.get("streamable", False), parameters=config.get("parameters"))
+
+    def _config_changed(self, old, new):
+        """Services whose config section changed are created again on their next use."""
+        changed = {name for name in set(old.services) | set(new.services) if old.service(name) != new.service(name)}
+        with self._lock:
+            dropped = {name: self._drop(name, self._specs.get(name)) for name in changed}
+        for name, (instance, spec) in dropped.items():
+            if instance is not None:
+                PAIALogger().info("Config of %s changed, service will be reloaded", name)
+            self._close(instance, spec)
+        self._register_configured({name: new.service(name) for name in changed})
+
+    def register(self, name: str, service=None, module: str = None, class_name: str = None, streamable: bool = False, parameters: list = None):
+        """Declare a service: a PAIAService class or instance, or a ``module`` and ``class_name`` imported on first use.
 
-        PAIALogger().error(f"Service not found: {service_name}")
-        return None
-    
-    def _load_services(self) -> bool:
-        if self._services_loaded:
-            return True
+        Replaces a service of the same name.
+        """
+        spec = PAIAServiceSpec(name, module, class_name, streamable, parameters, service)
+        with self._lock:
+            instance, previous = self._drop(name, self._specs.get(name))
+            self._specs[name] = spec
+        self._close(instance, previous)
+        PAIALogger().info("Registered service: %s", name)
+        return spec
+
+    def acquire(self, service_name: str) -> PAIAService | None:
+        """``get_service`` for a request, the instance stays open until it is given back with ``release``."""
+        while True:
+            with self._lock:
+                generation = self._generations.get(service_name, 0)
+            instance = self.get_service(service_name)
+            if instance is None:
+                return None
+            with self._lock:
+                # Dropped since get_service returned it, the next call creates the new one
+                if self._generations.get(service_name, 0) == generation:
+                    self._uses[id(instance)] = self._uses.get(id(instance), 0) + 1
+                    return instance
+
+    def release(self, instance: PAIAService):
+        """Hand back an instance taken with ``acquire``, closes it if it was dropped meanwhile."""
+        with self._lock:
+            uses = self._uses.get(id(instance), 0) - 1
+            if uses > 0:
+                self._uses[id(instance)] = uses
+                return
+            self._uses.pop(id(instance), None)
+            instance, spec = self._retired.pop(id(instance), (None, None))
+        self._close(instance, spec)
+
+    def _drop(self, name: str, spec: PAIAServiceSpec) -> tuple[PAIAService | None, PAIAServiceSpec]:
+        # Under self._lock: stop serving the instance, returned to be closed unless requests still use it
+        self._generations[name] = self._generations.get(name, 0) + 1
+        instance = self._service_instances.pop(name, None)
+        if instance is not None and self._uses.get(id(instance)):
+            self._retired[id(instance)] = (instance, spec)
+            return None, spec
+        return instance, spec
+
+    def _close(self, instance, spec: PAIAServiceSpec = None):
+        # Instances registered from code belong to their owner and may be served again
+        if instance is None or (spec is not None and spec.service is instance):
+            return
+        close = getattr(instance, "close", None)
+        if close is None:
+            return
         try:
-            self._lock.acquire()
-            service_dir = os.path.dirname(__file__)       
-            self._service_names["services"] = []             
-            for filename in os.listdir(service_dir):
-                if filename.endswith(".py") and filename not in ["__init__.py", "service.py","manager.py"]:
-                    module_name = filename[:-3]
-                    service_name = module_name.replace("_", "-")
-                    is_enabled = PAIAConfig().getConfig().get("services", {}).get(service_name, {}).get("enabled", True)
-                    if not is_enabled:
-                        PAIALogger().getLogger().info(f"Skipping disabled service: {service_name}")
-                        continue
-                    try:
-                        module = importlib.import_module(f"paia.service.{module_name}")
-                        for _,module_obj in inspect.getmembers(module, inspect.isclass):
-                            if issubclass(module_obj, PAIAService) and module_obj != PAIAService:
-                                PAIALogger().info(f"Loading service: {service_name}")
-                                self._service_names["services"].append(service_name)
-                                self._service_registry[service_name] = module_obj
-                                PAIALogger().info(f"Loaded service: {service_name}")
-                    except ImportError as e:
-                        PAIALogger().error(f"Error importing {module_name}: {str(e)}")
-                    except Exception as e:
-                        PAIALogger().error(f"Error loading {service_name}: {str(e)}")
+            close()
         except Exception as e:
-            PAIALogger().error(f"Error loading {service_name}: {str(e)}")
-            # Loaded ok        
-        if self._lock.locked(): self._lock.release()
-        self._services_loaded = True
-        return True
+            PAIALogger().error(f"Error closing service: {str(e)}")
+
+    def _enabled(self, name: str) -> bool:
+        return PAIAConfig().service(name).get("enabled", True)
+
+    def get_services(self, as_str : bool = False):
+        """Names of the enabled services (``as_str``), else their specs, without importing them."""
+        with self._lock:
+            specs = {name: spec for name, spec in self._specs.items() if self._enabled(name)}
+        if as_str:
+            return {"services": list(specs)}
+        return specs
+
+    def get_service(self, service_name: str) -> PAIAService | None:
+        # Fast path without locking, the instance never changes once created
+        result = self._service_instances.get(service_name)
+        if result is not None:
+            return result
+        with self._lock:
+            spec = self._specs.get(service_name)
+            service_lock = self._service_locks.setdefault(service_name, threading.Lock())
+        if spec is None or not self._enabled(service_name):
+            PAIALogger().error(f"Service not found: {service_name}")
+            return None
+        # One lock per service, importing a heavy module does not block the other services
+        with service_lock:
+            result = self._service_instances.get(service_name)
+            if result is None:
+                try:
+                    PAIALogger().info("Loading service: %s", service_name)
+                    worker = PAIAConfig().service(service_name).get("worker", {})
+                    if worker.get("enabled") and spec.module:
+                        # Isolated in worker processes, the module is only imported there
+                        from paia.worker import PAIAWorkerService
+                        result = PAIAWorkerService(spec, PAIAConfig().service(service_name))
+                    else:
+                        service = spec.load()
+                        result = service() if inspect.isclass(service) else service
+                except Exception as e:
+                    PAIALogger().error(f"Error loading {service_name}: {str(e)}")
+                    return None
+                with self._lock:
+                    # Not published when re-registered meanwhile
+                    if self._specs.get(service_name) is spec:
+                        self._service_instances[service_name] = result
+                PAIALogger().info("Loaded service: %s", service_name)
+        return result
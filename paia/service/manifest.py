@@ -0,0 +1,49 @@
+# paia/service/manifest.py
+import importlib
+
+from paia import PAIAConfig
+
+
+class PAIAServiceSpec:
+    """A service the manager can list without importing it.
+
+    ``module`` and ``class_name`` are imported on first use (or at preload),
+    so torch, transformers and diffusers are only loaded by services a node
+    actually serves. ``service`` is an already available class or instance,
+    for services registered from code (stubs, plugins).
+    """
+
+    def __init__(self, name: str, module: str = None, class_name: str = None, streamable: bool = False, parameters: list = None, service=None):
+        if service is None and not (module and class_name):
+            raise ValueError(f"Service '{name}' needs a module and class, or a service")
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.streamable = streamable
+        self.parameters = parameters or []
+        self.service = service
+
+    def load(self):
+        """The service class (or instance), importing its module."""
+        if self.service is None:
+            self.service = getattr(importlib.import_module(self.module), self.class_name)
+        return self.service
+
+    def to_dict(self) -> dict:
+        # Config values override the declared defaults, like the UI reads them
+        config = PAIAConfig().service(self.name)
+        return {
+            "module": self.module,
+            "class": self.class_name,
+            "streamable": config.get("streamable", self.streamable),
+            "parameters": config.get("parameters", self.parameters),
+        }
+
+
+MANIFEST = [
+    PAIAServiceSpec("chat", "paia.service.chat", "Chat", streamable=True),
+    PAIAServiceSpec("text-generator", "paia.service.text_generator", "TextGenerationService"),
+    PAIAServiceSpec("text-to-image", "paia.service.text_to_image", "TextToImageService"),
+    PAIAServiceSpec("text-to-speech", "paia.service.text_to_speech", "TextToSpeechService", streamable=True),
+    PAIAServiceSpec("translate", "paia.service.translate", "TranslateService", streamable=True),
+]
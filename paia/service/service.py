@@ -9,3 +9,19 @@ class PAIAService:
     def process(self, query):
         raise NotImplementedError("Subclasses must implement process method")
 
+    def validate(self, query) -> str | None:
+        """Why ``query`` is rejected with 400 before it is queued, None when it is valid."""
+        return None
+
+    def close(self):
+        """Release what the instance holds (threads, files), called when the manager drops it."""
+
+    def preload_models(self) -> list[tuple]:
+        """Models to load at startup when ``services.<name>.preload`` is set.
+
+        Returns ``(cache key, loader, on_evict, warmup)`` tuples matching the
+        PAIAModelCache lease used by ``process``. ``warmup(model)`` runs one
+        small inference, or is None.
+        """
+        return []
+
@@ -0,0 +1,117 @@
+# paia/service/text_generator.py
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from paia import PAIAService, PAIALogger, PAIAConfig, PAIAModelCache
+from paia.generation.decoding import DecodingEngine
+from paia.generation.logits import LogitsProcessor
+from paia.generation.scheduler import BatchScheduler
+from paia.backend import PAIABackend
+import torch
+
+class TextGenerationService(PAIAService):
+    model_id = "Novaciano/NSFW-AMEBA-3.2-1B"
+
+    def loadModel(self):
+        """Build the decoding engine, called by PAIAModelCache on a miss."""
+        model_id = self.model_id
+        try:
+            backend = PAIABackend("text-generator", default_dtype=torch.bfloat16)
+            model = backend.prepare(AutoModelForCausalLM.from_pretrained(
+                model_id, trust_remote_code=True, torch_dtype=backend.dtype
+            ))
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_id, trust_remote_code=True
+            )
+
+            tokenizer.pad_token = tokenizer.eos_token
+            PAIALogger().info("TextGenerationService initialized")
+            config = PAIAConfig().service("text-generator")
+            if self.draft_model_id:
+                # Greedy decoding verified by the main model, requests are not batched then
+                from paia.generation.speculative import SpeculativeDecodingEngine
+                PAIALogger().info("Loading draft model : %s", self.draft_model_id)
+                draft_model = backend.prepare(AutoModelForCausalLM.from_pretrained(
+                    self.draft_model_id, trust_remote_code=True, torch_dtype=backend.dtype
+                ))
+                return SpeculativeDecodingEngine(model, tokenizer, draft_model, num_draft_tokens=int(config.get("num_draft_tokens", 4)), device=backend.device, autocast=backend.autocast)
+            # Concurrent requests share one batched decoding loop unless disabled
+            batching = config.get("batching", {})
+            if batching.get("enabled", True):
+                return BatchScheduler(model, tokenizer, max_batch_size=batching.get("max_batch_size", 8), device=backend.device, name="text-generator", autocast=backend.autocast)
+            return DecodingEngine(model, tokenizer, device=backend.device, autocast=backend.autocast)
+        except Exception as e:
+            PAIALogger().error(f"Failed to load model {model_id}: {str(e)}")
+            raise
+
+    def unloadModel(self, engine):
+        engine.close()
+
+    @property
+    def draft_model_id(self):
+        """Small model sharing the tokenizer, enables speculative decoding (``services.text-generator.draft_model``)."""
+        return PAIAConfig().service("text-generator").get("draft_model")
+
+    @property
+    def cache_key(self):
+        if self.draft_model_id:
+            return f"text-generator:{self.model_id}+{self.draft_model_id}"
+        return f"text-generator:{self.model_id}"
+
+    def warmup(self, engine):
+        stream = engine.generate(engine.tokenizer.encode("Hello"), 4)
+        for _ in stream:
+            pass
+
+    def preload_models(self):
+        return [(self.cache_key, self.loadModel, self.unloadModel, self.warmup)]
+
+    def process(self, query):
+        prompt = query.get("text", "")
+        prefix = query.get("prefix", "")
+        context = query.get("context", "")
+        max_length = int(query.get("max_length", 50))
+        config = PAIAConfig().service("text-generator")
+        # Greedy unless the query or services.text-generator.sampling asks for sampling
+        select = LogitsProcessor.from_query(query, dict({"temperature": 0}, **config.get("sampling", {})))
+        stop_strings = query.get("stop") or config.get("stop")
+        PAIALogger().debug("Processing query: prompt='%s', prefix='%s', context='%s', max_length=%s", PAIALogger().payload(prompt), PAIALogger().payload(prefix), PAIALogger().payload(context), max_length)
+
+        if not prompt:
+            PAIALogger().error("No prompt provided")
+            yield {"error": "No prompt provided for text generation"}
+            return
+
+        try:
+            with PAIAModelCache().use(self.cache_key, self.loadModel, on_evict=self.unloadModel) as engine:
+                full_prompt = f"{prefix} {prompt}".strip()
+                PAIALogger().debug("Full prompt: %s", PAIALogger().payload(full_prompt))
+                input_ids = engine.tokenizer.encode(full_prompt)
+
+                # max_length counts the prompt as well, a prompt already that long still gets one new token
+                stream = engine.generate(input_ids, max(1, max_length - len(input_ids)), select=select, stop=engine.stop_matcher(stop_strings))
+                detokenizer = engine.detokenizer(input_ids)
+                generated_text = engine.tokenizer.decode(input_ids, skip_special_tokens=True)
+                # The result starts with the prompt, the first delta carries it
+                pending = generated_text
+                try:
+                    for token_id in stream:
+                        delta = detokenizer.push(token_id)
+                        if delta:
+                            generated_text += delta
+                            yield {"result": generated_text, "delta": pending + delta}
+                            pending = ""
+                finally:
+                    stream.close()
+                delta = detokenizer.flush()
+                if delta:
+                    generated_text += delta
+                    yield {"result": generated_text, "delta": pending + delta}
+                yield {"stats": stream.stats}
+                PAIALogger().debug("Generated text: %s", generated_text, category="token")
+                if stream.finish_reason == "eos":
+                    PAIALogger().info("EOS token reached")
+
+        except Exception as e:
+            PAIALogger().error(f"Error in text generation: {str(e)}")
+            yield {"error": f"Text generation failed: {str(e)}"}
+
+        PAIALogger().debug("End thread")
@@ -1,77 +1,139 @@
 # ai/service/text_generator.py
 from diffusers import DiffusionPipeline
 from paia import *
-import os
-from pathlib import Path
 import torch
 import time
+from paia.backend import PAIABackend
+from paia.media_store import IMAGE_FORMATS
 
 class TextToImageService(PAIAService):
+    model_id = "Heartsync/NSFW-Uncensored"
+
     def __init__(self):
-        self.modelLoaded = False
+        self.backend = PAIABackend("text-to-image", default_dtype=torch.float16)
 
     def loadModel(self):
+        """Build the diffusion pipeline, called by PAIAModelCache on a miss."""
+        model_id = self.model_id
         try:
-            model_id ="Heartsync/NSFW-Uncensored"
-            PAIALogger().info(f"Loading model : {model_id}")
-            self.imager = DiffusionPipeline.from_pretrained(model_id, torch_dtype=torch.float16,use_safetensors=True ).to("cuda")
+            PAIALogger().info("Loading model : %s", model_id)
+            imager = DiffusionPipeline.from_pretrained(model_id, torch_dtype=self.backend.dtype,use_safetensors=True ).to(self.backend.device)
+            # Dynamic int8 quantization only touches Linear layers (attention / text encoder)
+            for name in ("text_encoder", "unet", "transformer"):
+                component = getattr(imager, name, None)
+                if isinstance(component, torch.nn.Module):
+                    setattr(imager, name, self.backend.prepare(component))
 
-            PAIALogger().info(f"Model {model_id} LOADED")
-            self.modelLoaded = True
+            PAIALogger().info("Model %s LOADED", model_id)
+            return imager
         except Exception as e:
             PAIALogger().error(f"Failed to load model: {str(e)}")
             raise
 
+    @property
+    def cache_key(self):
+        return f"text-to-image:{self.model_id}"
+
+    def warmup(self, imager):
+        with self.backend.autocast():
+            imager(prompt="warmup", num_inference_steps=1, width=64, height=64)
+
+    def preload_models(self):
+        return [(self.cache_key, self.loadModel, None, self.warmup)]
+
+    def max_batch(self, width, height):
+        """Images per pipeline call, bounded by pixels per batch (memory grows with the latents)."""
+        config = PAIAConfig().service("text-to-image")
+        max_batch_pixels = int(config.get("max_batch_pixels", 4 * 512 * 512))
+        max_batch_size = int(config.get("max_batch_size", 8))
+        return max(1, min(max_batch_size, max_batch_pixels // max(1, width * height)))
+
+    def generate(self, imager, prompts, negative_prompt, width, height, num_inference_steps, guidance_scale, seed=None, batch_size=1):
+        """Yield ``(index, prompt, image)`` for every prompt, ``batch_size`` images per pipeline call."""
+        for start in range(0, len(prompts), batch_size):
+            batch = prompts[start:start + batch_size]
+            # One generator per image keeps every image reproducible whatever the batching
+            generator = [torch.Generator(device=self.backend.device).manual_seed(int(seed) + start + i) for i in range(len(batch))] if seed not in (None, "") else None
+            with self.backend.autocast():
+                images = imager(
+                    prompt=batch,
+                    negative_prompt=[negative_prompt] * len(batch) if negative_prompt else None,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    width=width,
+                    height=height,
+                    generator=generator,
+                )["images"]
+            for i, image in enumerate(images):
+                yield start + i, batch[i], image
+
+    def validate(self, query):
+        """Reject requests over ``max_images`` per prompt or ``max_prompts`` prompts."""
+        config = PAIAConfig().service("text-to-image")
+        max_images = int(config.get("max_images", 8))
+        max_prompts = int(config.get("max_prompts", 8))
+        prompt = query.get("text", "")
+        if isinstance(prompt, list) and len(prompt) > max_prompts:
+            return f"Too many prompts: {len(prompt)}, at most {max_prompts}"
+        try:
+            num_images = int(query.get("num_images", 1))
+        except (TypeError, ValueError):
+            return f"Invalid num_images: {query.get('num_images')}"
+        if num_images > max_images:
+            return f"Too many images: {num_images}, at most {max_images}"
+        return None
+
     def process(self, query):
-        if not self.modelLoaded:
-            self.loadModel()
+        error = self.validate(query)
+        if error:
+            PAIALogger().error(error)
+            yield {"error": error}
+            return
         prompt = query.get("text", "")
+        # A list of prompts, each generated num_images times
+        prompts = prompt if isinstance(prompt, list) else [prompt]
+        prompts = [str(p) for p in prompts if str(p).strip()]
+        num_images = max(1, int(query.get("num_images", 1)))
         height = int(query.get("height", 256))
         width = int(query.get("width", 256))
-        output_path = os.path.join(PAIAConfig().getUIDirectory(),"image")
-        output_addr = f"{PAIAConfig().getUIAddress()}/image/"
         guidance_scale = float(query.get("guidance_scale", 6.3))
         num_inference_steps = int(query.get("num_inference_steps", 10))
         negative_prompt = query.get("negative_prompt", "ugly, deformed, disfigured, poor quality, low resolution")
-        PAIALogger().debug(f"Processing query: prompt='{prompt}', height={height}, width={width}, guidance_scale={guidance_scale}, num_inference_steps={num_inference_steps}, negative_prompt='{negative_prompt}'")
+        # A fixed seed makes the images reproducible (and cacheable)
+        seed = query.get("seed")
+        # png, webp or jpeg, quality 1-100 (compression effort for png)
+        image_format = str(query.get("format", "png")).lower()
+        quality = query.get("quality")
+        PAIALogger().debug("Processing query: prompts=%s, num_images=%s, height=%s, width=%s, guidance_scale=%s, num_inference_steps=%s, negative_prompt='%s', seed=%s, format=%s, quality=%s", PAIALogger().payload(prompts), num_images, height, width, guidance_scale, num_inference_steps, negative_prompt, seed, image_format, quality)
 
-        if not prompt:
+        if not prompts:
             PAIALogger().error("No prompt provided")
             yield {"error": "No prompt provided for image generation"}
             return
+        if image_format not in IMAGE_FORMATS:
+            PAIALogger().error(f"Unsupported image format: {image_format}")
+            yield {"error": f"Unsupported image format: {image_format}"}
+            return
 
         try:
-            # Create sage image name and path
-            safe_prompt = time.strftime("%H-%M-%S")
-            if not safe_prompt:
-                safe_prompt = "image"
-            image_path = f"{output_path}/{safe_prompt}.png"
-            image_addr = f"{output_addr}/{safe_prompt}.png"
-
-            # Auto create image directory
-            output_dir = Path(output_path)
-            output_dir.mkdir(parents=True,exist_ok=True)
-
-            # Generate image
-            result = self.imager(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                num_inference_steps=num_inference_steps,
-                guidance_scale=guidance_scale,
-                width=width,
-                height=height,
-                
-
-            )["images"][0]
-
-            # Save image
-            result.save(image_path)
-
-            # Return result
-            yield {"result": image_addr, "type": "image", "image_path":image_path}
+            # Generate images, every image is sent as soon as its batch is encoded
+            started = time.perf_counter()
+            jobs = [p for p in prompts for _ in range(num_images)]
+            batch_size = self.max_batch(width, height)
+            store = PAIAMediaStore()
+            pending = []
+            with PAIAModelCache().use(self.cache_key, self.loadModel) as imager:
+                for index, image_prompt, result in self.generate(imager, jobs, negative_prompt, width, height, num_inference_steps, guidance_scale, seed, batch_size):
+                    # The images of a batch are encoded in parallel on the media store's pool
+                    pending.append((index, image_prompt, store.encode(result, image_format, quality)))
+                    if len(pending) == batch_size or index == len(jobs) - 1:
+                        for pending_index, pending_prompt, future in pending:
+                            yield dict(store.event(future.result(), "image"), index=pending_index, prompt=pending_prompt)
+                        pending = []
+            yield {"stats": {"images": len(jobs), "pixels": len(jobs) * width * height, "batch_size": batch_size, "format": image_format, "total_seconds": round(time.perf_counter() - started, 6)}}
 
         except Exception as e:
             PAIALogger().getLogger().error(f"Error in image generation: {str(e)}")
             yield {"error": f"Image generation failed: {str(e)}"}
 
-        PAIALogger().debug("End thread")
\ No newline at end of file
+        PAIALogger().debug("End thread")
@@ -1,48 +1,101 @@
-# ai/service/text_generator.py
-from transformers import pipeline
+# ai/service/text_to_speech.py
 from paia import *
-import os
-from pathlib import Path
-from gtts import gTTS
+import time
+from paia.segmentation import segment_text
+from paia.speech import PAIASpeechCache, get_engine
 
 class TextToSpeechService(PAIAService):
     def __init__(self):
-        self.modelLoaded = False
+        config = PAIAConfig().service("text-to-speech")
+        self.engine = config.get("engine", "local")
+        self.lang = config.get("lang", "cs")
+        self.voice = config.get("voice")
+        # Voice names clients may ask for, per engine: name -> checkpoint id (local) or accent (gtts)
+        self.voices = config.get("voices", {})
+        self.max_segment_chars = int(config.get("max_segment_chars", 300))
+        # Languages loaded at startup when preload is enabled
+        self.preload_languages = config.get("preload_languages", [self.lang])
 
-    def loadModel(self):
-        pass
+    def preload_models(self):
+        engine = get_engine(self.engine)
+        models = []
+        for lang in self.preload_languages:
+            models.extend(engine.preload_models(lang, self.resolve_voice(engine, self.voice)))
+        return models
+
+    def resolve_voice(self, engine, voice):
+        """The engine's value of a whitelisted voice name, None for the engine default.
+
+        Raises ValueError for other names, a client never picks a checkpoint directly.
+        """
+        if voice is None:
+            return None
+        voices = self.voices.get(engine.name, {})
+        if voice not in voices:
+            raise ValueError(f"Unknown voice: {voice}")
+        return voices[voice]
+
+    def validate(self, query):
+        engine = get_engine(query.get("engine", self.engine))
+        if engine is None:
+            return f"Unknown speech engine: {query.get('engine', self.engine)}"
+        lang = query.get("lang", self.lang)
+        if not engine.supports(lang):
+            return f"Unsupported language for {engine.name}: {lang}"
+        try:
+            self.resolve_voice(engine, query.get("voice", self.voice))
+        except ValueError as e:
+            return str(e)
+        return None
 
     def process(self, query):
         prompt = query.get("text", "")
-        lang = query.get("lang", "cs")
-        output_path = os.path.join(PAIAConfig().getUIDirectory(),"sound")
-        output_addr = f"{PAIAConfig().getUIAddress()}/sound/"
-        PAIALogger().debug(f"Processing query: prompt='{prompt}'")
+        lang = query.get("lang", self.lang)
+        voice = query.get("voice", self.voice)
+        engine_name = query.get("engine", self.engine)
+        PAIALogger().debug("Processing query: prompt='%s', lang=%s, voice=%s, engine=%s", PAIALogger().payload(prompt), lang, voice, engine_name)
 
         if not prompt:
             PAIALogger().error("No prompt provided")
-            yield {"error": "No prompt provided for image generation"}
+            yield {"error": "No text provided for speech synthesis"}
+            return
+        engine = get_engine(engine_name)
+        if engine is None:
+            PAIALogger().error(f"Unknown speech engine: {engine_name}")
+            yield {"error": f"Unknown speech engine: {engine_name}"}
+            return
+        if not engine.supports(lang):
+            PAIALogger().error(f"Unsupported language for {engine.name}: {lang}")
+            yield {"error": f"Unsupported language for {engine.name}: {lang}"}
+            return
+        try:
+            engine_voice = self.resolve_voice(engine, voice)
+        except ValueError as e:
+            PAIALogger().error(f"Speech synthesis rejected: {str(e)}")
+            yield {"error": str(e)}
             return
 
         try:
-            safe_prompt = "".join(c for c in prompt if c.isalnum() or c in " _-").strip()[:50]
-            if not safe_prompt:
-                safe_prompt = "sound"
-                
-            res_path = f"{output_path}/{safe_prompt}.mp3"
-            res_addr = f"{output_addr}/{safe_prompt}.mp3"
-
-            path = Path(output_path)
-            path.mkdir(exist_ok=True,parents=True)
-
-            result = gTTS(text=prompt, slow=False, lang=lang)
-            result.save(res_path)
-            
-            PAIALogger().info(f"Generated sound: {res_addr}")
-            yield {"result": res_addr, "type": "audio"}
+            # Every sentence is synthesized on its own and sent as soon as it is ready
+            started = time.perf_counter()
+            store = PAIAMediaStore()
+            cache = PAIASpeechCache()
+            segments = [segment.strip() for segment, _ in segment_text(prompt, self.max_segment_chars)]
+            cached = 0
+            for index, sentence in enumerate(segments):
+                key = cache.key(sentence, lang, voice, engine.name)
+                name = cache.get(key)
+                if name is None:
+                    name = store.put(engine.synthesize(sentence, lang, engine_voice), engine.extension)
+                    cache.put(key, name)
+                else:
+                    cached += 1
+                PAIALogger().info("Generated sound: %s", name)
+                yield dict(store.event(name, "audio"), index=index, text=sentence)
+            yield {"stats": {"sentences": len(segments), "cached_sentences": cached, "engine": engine.name, "total_seconds": round(time.perf_counter() - started, 6)}}
 
         except Exception as e:
-            PAIALogger().error(f"Error in image generation: {str(e)}")
-            yield {"error": f"Image generation failed: {str(e)}"}
+            PAIALogger().error(f"Error in speech synthesis: {str(e)}")
+            yield {"error": f"Speech synthesis failed: {str(e)}"}
 
-        PAIALogger().debug("End thread")
\ No newline at end of file
+        PAIALogger().debug("End thread")
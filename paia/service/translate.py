@@ -1,38 +1,68 @@
 # ai/service/translate.py
 from transformers import pipeline
-from paia import PAIALogger,PAIAService
+from paia import PAIALogger,PAIAService,PAIAConfig,PAIAModelCache
+from paia.backend import PAIABackend
+from paia.segmentation import segment_text
 
-logger = PAIALogger().getLogger()
 
 class TranslateService(PAIAService):
     def __init__(self):
-        self.translators = {}
+        self.backend = PAIABackend("translate", default_dtype=None)
+        # Marian models are limited to 512 tokens, long texts are translated sentence by sentence
+        config = PAIAConfig().service("translate")
+        self.batch_size = int(config.get("batch_size", 8))
+        self.max_segment_chars = int(config.get("max_segment_chars", 400))
+        # Language pairs loaded at startup when preload is enabled, e.g. [["cs", "en"], ["en", "cs"]]
+        self.preload_pairs = [tuple(pair) for pair in config.get("preload_pairs", [])]
+
+    def loadModel(self, model_id):
+        """Build the translation pipeline, called by PAIAModelCache on a miss."""
+        PAIALogger().info("Loading model: %s", model_id)
+        translator = pipeline("translation", model=model_id, device=self.backend.device, torch_dtype=self.backend.dtype)
+        translator.model = self.backend.prepare(translator.model)
+        return translator
+
+    def warmup(self, translator):
+        with self.backend.autocast():
+            translator(["Hello."], batch_size=1)
+
+    def preload_models(self):
+        models = []
+        for source_language, target_language in self.preload_pairs:
+            model_id = f"Helsinki-NLP/opus-mt-{source_language}-{target_language}"
+            models.append((f"translate:{model_id}", lambda model_id=model_id: self.loadModel(model_id), None, self.warmup))
+        return models
 
     def process(self, query):
         text = query.get("text", "")
         source_language = query.get("source_language", "cs")
         target_language = query.get("target_language", "en")
         model_id = f"Helsinki-NLP/opus-mt-{source_language}-{target_language}"
-        logger.debug(f"Processing query: text='{text}', source_language='{source_language}', target_language='{target_language}'")
+        PAIALogger().debug("Processing query: text='%s', source_language='%s', target_language='%s'", PAIALogger().payload(text), source_language, target_language)
 
         if not text:
-            logger.error("No text provided")
+            PAIALogger().error("No text provided")
             yield {"error": "No text provided for translation"}
             return
 
         try:
-            if model_id not in self.translators:
-                logger.info(f"Loading model: {model_id}")
-                self.translators[model_id] = pipeline("translation", model=model_id)
-            else:
-                logger.debug(f"Using cached model: {model_id}")
-
-            result = self.translators[model_id](text)[0]["translation_text"]
-            logger.info(f"Translation result: {result}")
-            yield {"result": result}
+            segments = segment_text(text, self.max_segment_chars)
+            PAIALogger().debug("Translating %s segments in batches of %s", len(segments), self.batch_size)
+            result = ""
+            with PAIAModelCache().use(f"translate:{model_id}", lambda: self.loadModel(model_id)) as translator:
+                # Batches are translated in order, every segment is yielded as soon as its batch is done
+                for start in range(0, len(segments), self.batch_size):
+                    batch = segments[start:start + self.batch_size]
+                    with self.backend.autocast():
+                        translations = translator([segment for segment, _ in batch], batch_size=len(batch))
+                    for translation, (_, separator) in zip(translations, batch):
+                        delta = translation["translation_text"] + separator
+                        result += delta
+                        yield {"result": result, "delta": delta}
+            PAIALogger().debug("Translation result: %s", PAIALogger().payload(result))
 
         except Exception as e:
-            logger.error(f"Error in translation: {str(e)}")
+            PAIALogger().error(f"Error in translation: {str(e)}")
             yield {"error": f"Translation failed: {str(e)}"}
 
-        logger.debug("End thread")
\ No newline at end of file
+        PAIALogger().debug("End thread")
\ No newline at end of file
@@ -0,0 +1,176 @@
+# paia/single_flight.py
+import threading
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger
+from paia.response_cache import request_key
+
+
+class PAIAFlight:
+    """One computation of a request and the events it produced so far."""
+
+    def __init__(self, key: str, service_name: str):
+        self.key = key
+        self.service_name = service_name
+        self.events: list[dict] = []
+        self.error: Exception | None = None
+        self.done = False
+        # Set once every subscriber left, the producer stops at the next event
+        self.abandoned = False
+        self.subscribers = 0
+        self.condition = threading.Condition()
+
+
+class PAIAFlightSubscription:
+    """The events of a flight for one request, from the first one, however late it joined.
+
+    Followers get a final ``{"stats": {"coalesced": true}}``, like a response
+    cache hit. Close it to leave the flight.
+    """
+
+    def __init__(self, single_flight: "PAIASingleFlight", flight: PAIAFlight, leader: bool):
+        self._single_flight = single_flight
+        self.flight = flight
+        self.leader = leader
+        self._index = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        flight = self.flight
+        if self._closed:
+            raise StopIteration
+        with flight.condition:
+            while self._index >= len(flight.events) and not flight.done:
+                flight.condition.wait()
+            if self._index < len(flight.events):
+                self._index += 1
+                return flight.events[self._index - 1]
+        self.close()
+        if flight.error is not None:
+            raise flight.error
+        if not self.leader:
+            return {"stats": {"coalesced": True}}
+        raise StopIteration
+
+    def close(self):
+        """Leave the flight, safe to call more than once."""
+        if not self._closed:
+            self._closed = True
+            self._single_flight._leave(self.flight)
+
+
+class PAIASingleFlight(metaclass=PAIASingleton):
+    """Identical concurrent requests share one ``process`` run.
+
+    A service opts in with ``services.<name>.coalesce``::
+
+        "coalesce": {"enabled": true, "parameters": ["text", "lang"], "required": ["seed"]}
+
+    ``parameters`` and ``required`` default to the service's ``cache``
+    section, requests are identical when their PAIAResponseCache-style
+    keys are. The first request starts a flight whose events are produced
+    by a background thread into a shared buffer, every request in the
+    flight (SSE streams joining mid-stream included) reads the whole
+    sequence from that buffer. The flight ends with the run or when all its
+    requests left, later requests start a new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, PAIAFlight] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    def key(self, service_name: str, query: dict) -> str | None:
+        """Flight key of a request, None when the service does not coalesce."""
+        service = PAIAConfig().service(service_name)
+        config = service.get("coalesce", {})
+        if not config.get("enabled", False):
+            return None
+        cache = service.get("cache", {})
+        return request_key(service_name, query, config.get("parameters", cache.get("parameters")), config.get("required", cache.get("required")))
+
+    def join(self, service_name: str, query: dict) -> PAIAFlightSubscription | None:
+        """Subscribe to the flight of an identical request, None when there is none."""
+        key = self.key(service_name, query)
+        if key is None:
+            return None
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                return None
+            return self._subscribe(flight, leader=False)
+
+    def process(self, service_name: str, query: dict, compute, release=None):
+        """Events of the request: a new flight running ``compute()``, or the flight of an identical request.
+
+        Runs ``compute()`` directly when the service does not coalesce.
+        ``release`` (the leader's admission slot) is called when a new
+        flight's run ends, not when its leader leaves, the slot stays taken
+        while followers are still served. Otherwise it is left to the caller.
+        """
+        key = self.key(service_name, query)
+        if key is None:
+            return compute()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return self._subscribe(flight, leader=False)
+            flight = self._flights[key] = PAIAFlight(key, service_name)
+            self.flights += 1
+            subscription = self._subscribe(flight, leader=True)
+        threading.Thread(target=self._produce, args=(flight, compute, release), daemon=True, name=f"{service_name} flight").start()
+        return subscription
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "flights": self.flights,
+                "coalesced": self.coalesced,
+                "subscribers": sum(flight.subscribers for flight in self._flights.values()),
+            }
+
+    def _subscribe(self, flight: PAIAFlight, leader: bool) -> PAIAFlightSubscription:
+        flight.subscribers += 1
+        if not leader:
+            self.coalesced += 1
+            PAIALogger().debug("Request coalesced into a %s flight, %s subscribers", flight.service_name, flight.subscribers)
+        return PAIAFlightSubscription(self, flight, leader)
+
+    def _leave(self, flight: PAIAFlight):
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody waits for the rest, the next identical request starts over
+                flight.abandoned = True
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def _produce(self, flight: PAIAFlight, compute, release=None):
+        events = None
+        try:
+            events = compute()
+            for event in events:
+                with flight.condition:
+                    flight.events.append(event)
+                    flight.condition.notify_all()
+                if flight.abandoned:
+                    PAIALogger().debug("Abandoned %s flight stopped", flight.service_name)
+                    break
+        except Exception as e:
+            PAIALogger().error(f"Error processing {flight.service_name} flight: {str(e)}")
+            flight.error = e
+        finally:
+            if hasattr(events, "close"):
+                events.close()
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+            if release is not None:
+                release()
@@ -2,6 +2,9 @@
 class PAIASingleton(type):
     _instances = {}
     def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
+        # Called on every PAIALogger() / PAIAConfig(), one dict lookup once created
+        try:
+            return cls._instances[cls]
+        except KeyError:
             cls._instances[cls] = super(PAIASingleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
\ No newline at end of file
+            return cls._instances[cls]
\ No newline at end of file
@@ -0,0 +1,180 @@
+# paia/speech.py
+import collections
+import hashlib
+import io
+import json
+import threading
+import wave
+
+from paia import PAIASingleton, PAIAConfig, PAIALogger, PAIAModelCache, PAIAMediaStore
+
+
+class PAIATTSEngine:
+    """A text-to-speech engine, ``synthesize`` turns one sentence into one encoded audio chunk.
+
+    Engines are registered by ``name`` with ``register_engine`` and chosen
+    with ``services.text-to-speech.engine`` or the ``engine`` query parameter.
+    """
+
+    name = None
+    # Extension of the synthesized chunks in the media store
+    extension = "wav"
+    # Language codes a client may ask for, None when the engine checks them itself
+    languages = None
+
+    def supports(self, lang: str) -> bool:
+        return self.languages is None or lang in self.languages
+
+    def synthesize(self, text: str, lang: str, voice: str = None) -> bytes:
+        raise NotImplementedError
+
+    def preload_models(self, lang: str, voice: str = None) -> list:
+        """``(key, loader, on_evict, warmup)`` tuples, see PAIAService.preload_models."""
+        return []
+
+
+class GTTSEngine(PAIATTSEngine):
+    """Google Translate voices, needs network access."""
+
+    name = "gtts"
+    extension = "mp3"
+
+    def synthesize(self, text: str, lang: str, voice: str = None) -> bytes:
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        # voice selects the accent, e.g. "co.uk" or "com.au"
+        gTTS(text=text, slow=False, lang=lang, tld=voice or "com").write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class LocalTTSEngine(PAIATTSEngine):
+    """Offline VITS voices of the MMS project (``facebook/mms-tts-<language>``).
+
+    ``voice`` may name another VITS checkpoint, the service only passes
+    checkpoints whitelisted in ``services.text-to-speech.voices.local``.
+    Models are leased from PAIAModelCache like the other services' models.
+    """
+
+    name = "local"
+    extension = "wav"
+    # MMS checkpoints use ISO 639-3 codes
+    LANGUAGES = {"cs": "ces", "en": "eng", "de": "deu", "fr": "fra", "es": "spa", "sk": "slk", "pl": "pol", "it": "ita", "ru": "rus", "uk": "ukr"}
+    # Any other code would download a checkpoint named after it
+    languages = LANGUAGES
+
+    def model_id(self, lang: str, voice: str = None) -> str:
+        if voice:
+            return voice
+        if lang not in self.LANGUAGES:
+            raise ValueError(f"Unsupported language: {lang}")
+        return f"facebook/mms-tts-{self.LANGUAGES[lang]}"
+
+    def loadModel(self, model_id: str):
+        """Tokenizer and model, called by PAIAModelCache on a miss."""
+        from transformers import AutoTokenizer, VitsModel
+        PAIALogger().info("Loading model : %s", model_id)
+        return AutoTokenizer.from_pretrained(model_id), VitsModel.from_pretrained(model_id).eval()
+
+    def generate(self, model, text: str) -> bytes:
+        import torch
+        tokenizer, vits = model
+        inputs = tokenizer(text, return_tensors="pt")
+        with torch.inference_mode():
+            waveform = vits(**inputs).waveform[0]
+        return wav_bytes(waveform.float().numpy(), vits.config.sampling_rate)
+
+    def synthesize(self, text: str, lang: str, voice: str = None) -> bytes:
+        model_id = self.model_id(lang, voice)
+        with PAIAModelCache().use(f"text-to-speech:{model_id}", lambda: self.loadModel(model_id)) as model:
+            return self.generate(model, text)
+
+    def preload_models(self, lang: str, voice: str = None) -> list:
+        model_id = self.model_id(lang, voice)
+        return [(f"text-to-speech:{model_id}", lambda: self.loadModel(model_id), None, lambda model: self.generate(model, "Hello."))]
+
+
+def wav_bytes(samples, sampling_rate: int) -> bytes:
+    """Float samples in [-1, 1] as a 16 bit mono WAV file."""
+    import numpy
+    pcm = (numpy.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(int(sampling_rate))
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+ENGINES: dict[str, type[PAIATTSEngine]] = {}
+_instances: dict[str, PAIATTSEngine] = {}
+_lock = threading.Lock()
+
+
+def register_engine(engine: type[PAIATTSEngine]) -> type[PAIATTSEngine]:
+    """Make ``engine`` available under its ``name``, usable as a class decorator."""
+    ENGINES[engine.name] = engine
+    return engine
+
+
+def get_engine(name: str) -> PAIATTSEngine | None:
+    with _lock:
+        if name not in _instances:
+            if name not in ENGINES:
+                return None
+            _instances[name] = ENGINES[name]()
+        return _instances[name]
+
+
+register_engine(LocalTTSEngine)
+register_engine(GTTSEngine)
+
+
+class PAIASpeechCache(metaclass=PAIASingleton):
+    """Synthesized sentences by ``(text, lang, voice, engine)``.
+
+    Maps the key of a sentence to the name of its audio in PAIAMediaStore,
+    so repeated phrases (greetings, UI prompts) are not synthesized again.
+    Entries whose audio was cleaned up from the store are misses. Bounded by
+    ``services.text-to-speech.sentence_cache_entries``.
+    """
+
+    def __init__(self):
+        config = PAIAConfig().service("text-to-speech")
+        self.max_entries = int(config.get("sentence_cache_entries", 4096))
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, lang: str, voice: str, engine: str) -> str:
+        payload = json.dumps([" ".join(text.split()), lang, voice, engine], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            name = self._entries.get(key)
+        if name is not None and not PAIAMediaStore().contains(name):
+            with self._lock:
+                self._entries.pop(key, None)
+            name = None
+        with self._lock:
+            if name is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return name
+
+    def put(self, key: str, name: str):
+        with self._lock:
+            self._entries[key] = name
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,404 @@
+# paia/worker.py
+import atexit
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from paia import PAIAConfig, PAIALogger, PAIAMediaStore, PAIAService
+
+# Frame kinds, MORE is set on every chunk but the last of a split payload
+EVENT = 1
+MEDIA = 2
+END = 3
+MORE = 0x80
+
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class PAIARingBuffer:
+    """Frames of bytes in a shared memory ring, written by the worker and read by the server process.
+
+    The header holds the total bytes written and read, a frame is
+    ``(request id, kind, length)`` followed by its payload. Payloads larger
+    than a quarter of the ring are split into chunks, so media bytes of any
+    size pass through a ring of fixed size.
+    """
+
+    HEADER = struct.Struct("<QQ")
+    FRAME = struct.Struct("<IBI")
+
+    def __init__(self, capacity: int, name: str = None, condition=None):
+        self.capacity = capacity
+        self.condition = condition if condition is not None else _CONTEXT.Condition()
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=self.HEADER.size + capacity)
+        self.name = self.shm.name
+        self.owner = name is None
+        self.buffer = self.shm.buf
+        if self.owner:
+            self.HEADER.pack_into(self.buffer, 0, 0, 0)
+
+    def write(self, request_id: int, kind: int, payload: bytes = b""):
+        payload = memoryview(payload)
+        limit = max(1, self.capacity // 4 - self.FRAME.size)
+        offset = 0
+        while True:
+            chunk = payload[offset:offset + limit]
+            offset += len(chunk)
+            more = offset < len(payload)
+            self._put(self.FRAME.pack(request_id, kind | (MORE if more else 0), len(chunk)), chunk)
+            if not more:
+                return
+
+    def _put(self, header: bytes, chunk):
+        size = len(header) + len(chunk)
+        with self.condition:
+            while True:
+                written, read = self.HEADER.unpack_from(self.buffer, 0)
+                if self.capacity - (written - read) >= size:
+                    break
+                # Full, the reader frees space and notifies
+                self.condition.wait(1.0)
+            self._copy_in(written, header)
+            self._copy_in(written + len(header), chunk)
+            self.HEADER.pack_into(self.buffer, 0, written + size, read)
+            self.condition.notify_all()
+
+    def read(self, timeout: float = None) -> tuple[int, int, bytes] | None:
+        """The next ``(request id, kind, payload)``, None when nothing arrived within ``timeout``."""
+        # A timeout on acquiring too, a crashed writer may never release the lock
+        if not self.condition.acquire(timeout=timeout):
+            return None
+        try:
+            written, read = self.HEADER.unpack_from(self.buffer, 0)
+            if written == read:
+                self.condition.wait(timeout)
+                written, read = self.HEADER.unpack_from(self.buffer, 0)
+                if written == read:
+                    return None
+            request_id, kind, length = self.FRAME.unpack(self._copy_out(read, self.FRAME.size))
+            payload = self._copy_out(read + self.FRAME.size, length)
+            self.HEADER.pack_into(self.buffer, 0, written, read + self.FRAME.size + length)
+            self.condition.notify_all()
+            return request_id, kind, payload
+        finally:
+            self.condition.release()
+
+    def _copy_in(self, position: int, data):
+        start = self.HEADER.size + position % self.capacity
+        first = min(len(data), self.HEADER.size + self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if first < len(data):
+            self.buffer[self.HEADER.size:self.HEADER.size + len(data) - first] = data[first:]
+
+    def _copy_out(self, position: int, length: int) -> bytes:
+        start = self.HEADER.size + position % self.capacity
+        first = min(length, self.HEADER.size + self.capacity - start)
+        data = bytes(self.buffer[start:start + first])
+        if first < length:
+            data += bytes(self.buffer[self.HEADER.size:self.HEADER.size + length - first])
+        return data
+
+    def close(self):
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(service_name: str, module: str, class_name: str, config: dict, connection, ring_name: str, capacity: int, condition):
+    """Entry point of a worker process: runs the queries it receives and streams their events into the ring."""
+    from paia.service.manifest import PAIAServiceSpec
+
+    PAIAConfig().apply(config)
+    logging_config = dict(PAIAConfig().getConfig().get("logging") or PAIALogger.config_default)
+    # One log file per service, processes do not share a rotating file
+    stem, extension = os.path.splitext(logging_config.get("file_name", "app.log"))
+    logging_config["file_name"] = f"{stem}.{service_name}{extension or '.log'}"
+    PAIALogger().update(logging_config)
+
+    # Attached only, the server process owns (and unlinks) the segment
+    ring = PAIARingBuffer(capacity, ring_name, condition)
+    service = PAIAServiceSpec(service_name, module, class_name).load()()
+    if PAIAConfig().service(service_name).get("preload"):
+        from paia import PAIAPreloader
+        PAIAPreloader().start({service_name: service})
+    PAIALogger().info("Worker for %s started", service_name)
+
+    cancelled = set()
+
+    def run(request_id: int, query: dict):
+        events = service.process(query)
+        try:
+            for event in events:
+                if request_id in cancelled:
+                    break
+                if event.get("media"):
+                    # Media bytes travel through the ring, the server process stores them under the same name
+                    item = PAIAMediaStore().get(event["media"])
+                    if item is not None:
+                        ring.write(request_id, MEDIA, item.name.encode("utf-8") + b"\0" + item.data)
+                ring.write(request_id, EVENT, json.dumps(event).encode("utf-8"))
+        except Exception as e:
+            PAIALogger().error(f"Error in worker for {service_name}: {str(e)}")
+            ring.write(request_id, EVENT, json.dumps({"error": f"{service_name} failed: {str(e)}"}).encode("utf-8"))
+        finally:
+            events.close()
+            cancelled.discard(request_id)
+            ring.write(request_id, END)
+
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "run":
+            threading.Thread(target=run, args=message[1:], daemon=True, name=f"Worker request {message[1]}").start()
+        elif message[0] == "cancel":
+            cancelled.add(message[1])
+        elif message[0] == "stop":
+            break
+    PAIALogger().info("Worker for %s stopped", service_name)
+    PAIALogger().close()
+
+
+class PAIAWorker:
+    """One worker process of a pool and the queries in flight on it."""
+
+    def __init__(self, pool: "PAIAWorkerPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.ring = None
+        self.connection = None
+        self.started = None
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._pending: dict[int, queue.SimpleQueue] = {}
+        self._ids = itertools.count(1)
+
+    def start(self):
+        self.ring = PAIARingBuffer(self.pool.ring_bytes)
+        self.connection, child = _CONTEXT.Pipe()
+        spec = self.pool.spec
+        self.process = _CONTEXT.Process(
+            target=_worker_main,
+            args=(spec.name, spec.module, spec.class_name, self.pool.config, child, self.ring.name, self.ring.capacity, self.ring.condition),
+            daemon=True,
+            name=f"PAIA worker {spec.name}/{self.index}",
+        )
+        self.process.start()
+        child.close()
+        self.started = time.monotonic()
+        threading.Thread(target=self._read, args=(self.process, self.ring), daemon=True, name=f"Worker reader {spec.name}/{self.index}").start()
+        PAIALogger().info("Started worker %s/%s, pid %s", spec.name, self.index, self.process.pid)
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def submit(self, query: dict) -> tuple[int, queue.SimpleQueue]:
+        """Send ``query`` to the process, its events arrive on the returned queue, None after the last one."""
+        events = queue.SimpleQueue()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = events
+            self.connection.send(("run", request_id, query))
+        return request_id, events
+
+    def cancel(self, request_id: int):
+        """Stop a query whose client went away, no-op once it finished."""
+        with self._lock:
+            if self._pending.pop(request_id, None) is None:
+                return
+            try:
+                self.connection.send(("cancel", request_id))
+            except OSError:
+                pass
+
+    def _read(self, process, ring: PAIARingBuffer):
+        partial: dict[int, bytearray] = {}
+        while True:
+            frame = ring.read(timeout=1.0)
+            if frame is None:
+                # Only once everything written is read, so no event of a finished query is lost
+                if not process.is_alive():
+                    break
+                continue
+            request_id, kind, payload = frame
+            if kind & MORE:
+                partial.setdefault(request_id, bytearray()).extend(payload)
+                continue
+            if request_id in partial:
+                payload = bytes(partial.pop(request_id) + payload)
+            events = self._pending.get(request_id)
+            if kind == MEDIA:
+                name, _, data = payload.partition(b"\0")
+                PAIAMediaStore().put(data, name.decode("utf-8").rpartition(".")[2])
+            elif events is None:
+                continue
+            elif kind == EVENT:
+                events.put(json.loads(payload))
+            elif kind == END:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                events.put(None)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for events in pending.values():
+            events.put({"error": f"Worker for {self.pool.spec.name} exited with code {process.exitcode}"})
+            events.put(None)
+        ring.close()
+        self.pool.exited(self, process)
+
+    def stop(self, timeout: float = 5):
+        process = self.process
+        if process is None:
+            return
+        try:
+            self.connection.send(("stop",))
+        except OSError:
+            pass
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": self.alive(),
+            "in_flight": self.in_flight,
+            "restarts": self.restarts,
+            "uptime": round(time.monotonic() - self.started, 3) if self.started is not None and self.alive() else 0,
+        }
+
+
+class PAIAWorkerPool:
+    """``replicas`` worker processes of one service, restarted by a supervisor thread when they exit.
+
+    A worker that exits is started again after a backoff doubling from
+    ``backoff`` up to ``max_backoff`` seconds, reset once a worker ran
+    ``stable_after`` seconds. Queries go to the live worker with the fewest
+    queries in flight.
+    """
+
+    pools: dict[str, "PAIAWorkerPool"] = {}
+
+    def __init__(self, spec, config: dict):
+        self.spec = spec
+        options = config.get("worker", {})
+        self.replicas = max(1, int(options.get("replicas", 1)))
+        self.ring_bytes = int(options.get("ring_bytes", 8 * 1024 ** 2))
+        self.backoff = float(options.get("backoff", 0.5))
+        self.max_backoff = float(options.get("max_backoff", 30))
+        self.stable_after = float(options.get("stable_after", 60))
+        # Plain JSON data, frozen config snapshots do not unpickle
+        self.config = json.loads(json.dumps(PAIAConfig().getConfig()))
+        self.workers = [PAIAWorker(self, index) for index in range(self.replicas)]
+        self._exited = queue.SimpleQueue()
+        self._stopped = threading.Event()
+        self._failures = {worker.index: 0 for worker in self.workers}
+        for worker in self.workers:
+            worker.start()
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True, name=f"Worker supervisor {spec.name}")
+        self._supervisor.start()
+        PAIAWorkerPool.pools[spec.name] = self
+        atexit.register(self.close)
+
+    def acquire(self) -> PAIAWorker | None:
+        workers = [worker for worker in self.workers if worker.alive()]
+        return min(workers, key=lambda worker: worker.in_flight) if workers else None
+
+    def exited(self, worker: PAIAWorker, process):
+        if not self._stopped.is_set():
+            PAIALogger().error(f"Worker {self.spec.name}/{worker.index} exited with code {process.exitcode}")
+            self._exited.put(worker)
+
+    def _supervise(self):
+        while not self._stopped.is_set():
+            worker = self._exited.get()
+            if worker is None:
+                return
+            if time.monotonic() - worker.started >= self.stable_after:
+                self._failures[worker.index] = 0
+            delay = min(self.max_backoff, self.backoff * 2 ** self._failures[worker.index])
+            self._failures[worker.index] += 1
+            PAIALogger().info("Restarting worker %s/%s in %.1fs", self.spec.name, worker.index, delay)
+            if self._stopped.wait(delay):
+                return
+            try:
+                worker.restarts += 1
+                worker.start()
+            except Exception as e:
+                PAIALogger().error(f"Restarting worker {self.spec.name}/{worker.index} failed: {str(e)}")
+                self._exited.put(worker)
+
+    def close(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._exited.put(None)
+        for worker in self.workers:
+            worker.stop()
+        if PAIAWorkerPool.pools.get(self.spec.name) is self:
+            del PAIAWorkerPool.pools[self.spec.name]
+
+    def stats(self) -> dict:
+        return {"replicas": self.replicas, "workers": [worker.stats() for worker in self.workers]}
+
+
+class PAIAWorkerService(PAIAService):
+    """Runs a service in worker processes (``services.<name>.worker.enabled``).
+
+    A crash or memory blow-up of a model takes down only its worker, the
+    server keeps answering other services while the supervisor restarts it.
+    Events stream back through a shared memory ring as they are produced.
+    """
+
+    # Seconds between checks that the worker of a waiting request is still alive
+    poll_interval = 1.0
+
+    def __init__(self, spec, config: dict):
+        super().__init__()
+        self.pool = PAIAWorkerPool(spec, config)
+
+    def process(self, query):
+        worker = self.pool.acquire()
+        if worker is None:
+            yield {"error": f"No worker of {self.pool.spec.name} is running"}
+            return
+        process = worker.process
+        request_id, events = worker.submit(query)
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    # The reader reports an exit too, unless it died with the process or is stuck on the ring
+                    if process.is_alive():
+                        continue
+                    PAIALogger().error(f"Worker for {self.pool.spec.name} exited with code {process.exitcode} during a request")
+                    yield {"error": f"Worker for {self.pool.spec.name} exited with code {process.exitcode}"}
+                    return
+                if event is None:
+                    return
+                yield event
+        finally:
+            worker.cancel(request_id)
+
+    def close(self):
+        self.pool.close()
+
+
+def stats() -> dict:
+    """Workers of every pool, by service."""
+    return {name: pool.stats() for name, pool in list(PAIAWorkerPool.pools.items())}
@@ -0,0 +1,24 @@
+# tests/paia/generation/conftest.py
+import pytest
+
+class ByteTokenizer:
+    """Byte-level tokenizer, ids 0-255 are raw UTF-8 bytes."""
+    eos_token_id = None
+
+    def encode(self, text, **kwargs):
+        return list(text.encode("utf-8"))
+
+    def decode(self, token_ids, **kwargs):
+        return bytes(token_ids).decode("utf-8", errors="replace")
+
+@pytest.fixture
+def tokenizer():
+    return ByteTokenizer()
+
+@pytest.fixture
+def tiny_model():
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=256, n_positions=256, n_embd=32, n_layer=2, n_head=2, bos_token_id=None, eos_token_id=None)
+    return transformers.GPT2LMHeadModel(config).eval()
@@ -0,0 +1,37 @@
+# tests/paia/generation/test_decoding.py
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from paia.generation.decoding import DecodingEngine, IncrementalDetokenizer
+
+@pytest.fixture
+def engine(tiny_model, tokenizer):
+    return DecodingEngine(tiny_model, tokenizer)
+
+def test_detokenizer_multibyte(tokenizer):
+    text = "Příliš žluťoučký kůň 😀"
+    detokenizer = IncrementalDetokenizer(tokenizer)
+    deltas = [detokenizer.push(token_id) for token_id in text.encode("utf-8")]
+    assert "".join(deltas) + detokenizer.flush() == text
+    assert all("\ufffd" not in delta for delta in deltas)
+
+def test_engine_matches_full_sequence_greedy(engine, tokenizer):
+    prompt = tokenizer.encode("Hello world")
+    generated_ids = torch.tensor([prompt])
+    with torch.no_grad():
+        for _ in range(20):
+            next_token = engine.model(generated_ids).logits[:, -1, :].argmax(-1, keepdim=True)
+            generated_ids = torch.cat((generated_ids, next_token), dim=1)
+    stream = engine.generate(prompt, 20)
+    assert list(stream) == generated_ids[0, len(prompt):].tolist()
+    assert stream.stats["generated_tokens"] == 20
+    assert stream.cached_len == len(stream.token_ids) - 1
+
+def test_engine_reuses_cache(engine, tokenizer):
+    prompt = tokenizer.encode("Hello")
+    first = engine.generate(prompt, 5)
+    list(first)
+    follow_up = first.token_ids + tokenizer.encode(" again")
+    cached = engine.generate(follow_up, 8, past_key_values=first.past_key_values, cached_len=first.cached_len)
+    assert list(cached) == list(engine.generate(follow_up, 8))
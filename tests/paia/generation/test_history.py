@@ -0,0 +1,111 @@
+# tests/paia/generation/test_history.py
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+
+from paia.generation.history import ChatHistory, HistoryCompactor
+from paia.generation.session import ChatSession
+
+
+def add_turns(history, session, count, size=10, head=None):
+    pending = False
+    for turn in range(count):
+        ids = [turn] * size
+        if not session.token_ids:
+            session.token_ids = list(head or [])
+        session.token_ids = session.token_ids + ids
+        pending = history.append(session, {"user": f"q{turn}", "bot": f"a{turn}"}, ids, head)
+    return pending
+
+
+def test_window_slides_within_budget():
+    history = ChatHistory(max_tokens=50, keep_ratio=0.6)
+    session = ChatSession("a")
+    assert not add_turns(history, session, 5, head=[99])
+    # Under budget the transcript grows turn by turn, the cache stays usable
+    assert session.window_start == 0 and session.context_tokens == 50
+    session.past_key_values, session.cached_len = object(), 40
+    assert add_turns(history, session, 1, head=[99])
+    assert session.window_start == 3 and session.context_tokens == 30
+    assert session.token_ids == [99] + [3] * 10 + [4] * 10 + [0] * 10
+    assert session.past_key_values is None and session.cached_len == 0
+    assert history.context(session) == "User: q3\nBot: a3\nUser: q4\nBot: a4\nUser: q0\nBot: a0\n"
+    assert len(session.history) == 6
+
+
+def test_compactor_summarizes_off_request_path():
+    history = ChatHistory(max_tokens=30, keep_ratio=0.5)
+    session = ChatSession("a")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def summarize(summary, entries):
+        calls.append((summary, [entry["user"] for entry in entries]))
+        started.set()
+        release.wait(5)
+        return "summary", [7, 7]
+
+    compactor = HistoryCompactor(history, summarize, head=lambda: [99])
+    try:
+        assert add_turns(history, session, 4, head=[99])
+        compactor.submit(session)
+        assert started.wait(5)
+        # The session is free while the summary is generated
+        assert session.lock.acquire(timeout=1)
+        session.lock.release()
+        release.set()
+        compactor.close()
+    finally:
+        release.set()
+        compactor.close()
+    assert calls == [("", ["q0", "q1", "q2"])]
+    assert session.summary == "summary" and session.compacted == 3
+    assert session.token_ids == [99, 7, 7] + [3] * 10
+    assert session.context_tokens == 12
+    assert "ids" not in session.history[0] and "ids" in session.history[3]
+    assert history.context(session) == "summary\nUser: q3\nBot: a3\n"
+
+
+def test_record_roundtrip():
+    history = ChatHistory(max_tokens=30, keep_ratio=0.5)
+    session = ChatSession("a")
+    add_turns(history, session, 4)
+    history.apply_summary(session, "summary", [7], 2)
+    restored = ChatSession.from_record("a", session.to_record())
+    assert restored.token_ids == session.token_ids
+    assert restored.history == session.history
+    assert (restored.summary, restored.summary_ids, restored.compacted, restored.window_start) == ("summary", [7], 2, 3)
+    assert restored.context_tokens == session.context_tokens == 11
+    assert history.prompt_ids(restored) == restored.token_ids
+
+def test_compacted_session_is_not_spilled_meanwhile(tmp_path):
+    from paia.generation.session import SessionStore
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), max_sessions=1)
+    history = ChatHistory(max_tokens=30, keep_ratio=0.5)
+    started, release = threading.Event(), threading.Event()
+
+    def summarize(summary, entries):
+        started.set()
+        release.wait(5)
+        return "summary", [7, 7]
+
+    compactor = HistoryCompactor(history, summarize, head=lambda: [99], sessions=store)
+    try:
+        session = store.get("a")
+        assert add_turns(history, session, 4, head=[99])
+        store.put(session)
+        compactor.submit(session)
+        assert started.wait(5)
+        # Over max_sessions, but the session being summarized stays in memory
+        store.put(store.get("b"))
+        assert store.stats()["sessions_in_memory"] == 2
+        release.set()
+    finally:
+        release.set()
+        compactor.close()
+    store.put(store.get("c"))
+    restored = store.get("a")
+    assert restored is not session
+    assert restored.summary == "summary" and restored.token_ids == [99, 7, 7] + [3] * 10
@@ -0,0 +1,77 @@
+# tests/paia/generation/test_logits.py
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from paia.generation.decoding import DecodingEngine
+from paia.generation.logits import LogitsProcessor, greedy, process_logits, select_tokens
+from paia.generation.scheduler import BatchScheduler
+from paia.generation.stopping import StopSequenceMatcher
+
+
+def test_processors_with_different_settings_share_one_batch():
+    logits = torch.tensor([[4.0, 3.0, 2.0, 1.0, -1.0]] * 4)
+    processors = [LogitsProcessor(top_k=2), LogitsProcessor(top_p=0.5), LogitsProcessor(temperature=2.0), LogitsProcessor(repetition_penalty=2.0)]
+    processed = process_logits(processors, logits, [[], [], [], [0, 4]])
+    assert torch.isinf(processed[0]).tolist() == [False, False, True, True, True]
+    # 4.0 alone has about 64% of the probability
+    assert torch.isinf(processed[1]).tolist() == [False, True, True, True, True]
+    assert processed[2].tolist() == [2.0, 1.5, 1.0, 0.5, -0.5]
+    assert processed[3].tolist() == [2.0, 3.0, 2.0, 1.0, -2.0]
+    assert select_tokens(logits[:2], processors[:1] + [greedy], [[], []]).tolist()[1] == 0
+    assert LogitsProcessor.from_query({"temperature": 0}) is None
+
+
+def test_seeded_sampling_is_reproducible():
+    logits = torch.randn(2, 50)
+    first = [LogitsProcessor(temperature=1.0, seed=7)(logits).tolist() for _ in range(2)]
+    assert first[0] == first[1]
+    tokens = [LogitsProcessor(temperature=1.0, top_k=1)(logits).tolist()]
+    assert tokens == [greedy(logits).tolist()]
+
+
+def test_stop_matcher_holds_back_partial_sequences():
+    matcher = StopSequenceMatcher([[1, 2, 3], [2, 3, 4], [5]])
+    built = [dict(transitions) for transitions in matcher._goto]
+
+    def run(tokens):
+        state, released = matcher.start(), []
+        for token_id in tokens:
+            released += state.push(token_id)
+            if state.stopped:
+                return released, True
+        return released + state.flush(), False
+
+    assert run([9, 1, 2, 3, 7]) == ([9], True)
+    assert run([1, 2, 9, 2, 3, 4]) == ([1, 2, 9], True)
+    assert run([1, 2, 2, 3, 4]) == ([1, 2], True)
+    assert run([7, 8, 1, 2]) == ([7, 8, 1, 2], False)
+    # Shared by all streams, matching writes nothing
+    assert matcher._goto == built
+
+
+def test_stop_matchers_are_reused_and_bounded(tiny_model, tokenizer):
+    engine = DecodingEngine(tiny_model, tokenizer)
+    first = engine.stop_matcher(["User:"])
+    assert engine.stop_matcher(["User:"]) is first
+    for index in range(40):
+        engine.stop_matcher([f"stop {index}"])
+    assert len(engine._stop_matchers) == 16
+    assert engine.stop_matcher(["User:"]) is not first
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_streams_end_at_stop_strings(tiny_model, tokenizer, batched):
+    engine = DecodingEngine(tiny_model, tokenizer)
+    prompt = tokenizer.encode("Hello")
+    expected = list(engine.generate(prompt, 30))
+    stop = bytes(expected[10:13]).decode("utf-8", errors="replace")
+    if batched:
+        engine = BatchScheduler(tiny_model, tokenizer, max_batch_size=2, name="test")
+    try:
+        stream = engine.generate(prompt, 30, stop=engine.stop_matcher([stop]))
+        tokens = list(stream)
+    finally:
+        engine.close()
+    first = next(index for index in range(len(expected)) if bytes(expected[index:index + 3]).decode("utf-8", errors="replace") == stop)
+    assert tokens == expected[:first] and stream.finish_reason == "stop"
@@ -0,0 +1,45 @@
+# tests/paia/generation/test_scheduler.py
+import threading
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from paia.generation.decoding import DecodingEngine
+from paia.generation.scheduler import BatchScheduler
+
+@pytest.fixture
+def scheduler(tiny_model, tokenizer):
+    scheduler = BatchScheduler(tiny_model, tokenizer, max_batch_size=3, name="test")
+    yield scheduler
+    scheduler.close()
+
+def test_batched_matches_single_sequence(scheduler, tiny_model, tokenizer):
+    engine = DecodingEngine(tiny_model, tokenizer)
+    prompts = ["Hello", "A much longer prompt here", "xyz", "Joins at a later step", "q"]
+    expected = [list(engine.generate(tokenizer.encode(p), 10 + 3 * i)) for i, p in enumerate(prompts)]
+    results = [None] * len(prompts)
+
+    def client(index):
+        results[index] = list(scheduler.generate(tokenizer.encode(prompts[index]), 10 + 3 * index))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(prompts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == expected
+
+def test_cancelled_stream_leaves_batch(scheduler, tokenizer):
+    stream = scheduler.generate(tokenizer.encode("Hello"), 200)
+    next(stream)
+    stream.close()
+    assert len(list(stream)) < 200
+    assert stream.finish_reason == "stopped"
+
+def test_keep_cache(scheduler, tiny_model, tokenizer):
+    stream = scheduler.generate(tokenizer.encode("Hello"), 6, keep_cache=True)
+    list(stream)
+    assert stream.cached_len == len(stream.token_ids) - 1
+    follow_up = stream.token_ids + tokenizer.encode(" again")
+    cached = scheduler.generate(follow_up, 5, past_key_values=stream.past_key_values, cached_len=stream.cached_len)
+    assert list(cached) == list(DecodingEngine(tiny_model, tokenizer).generate(follow_up, 5))
@@ -0,0 +1,53 @@
+# tests/paia/generation/test_session.py
+import pytest
+
+pytest.importorskip("torch")
+
+from paia.generation.session import SessionStore
+
+def test_session_roundtrip_through_disk(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), max_sessions=1)
+    session = store.get("a")
+    session.token_ids = [1, 2, 3]
+    session.history.append({"user": "hi", "bot": "hello"})
+    store.put(session)
+    store.get("b")
+    assert store.stats()["sessions_in_memory"] == 1
+    restored = store.get("a")
+    assert restored is not session
+    assert restored.token_ids == [1, 2, 3]
+    assert restored.history == [{"user": "hi", "bot": "hello"}]
+    assert restored.past_key_values is None
+
+def test_idle_sessions_are_spilled(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), ttl=0)
+    store.put(store.get("a"))
+    store.get("b")
+    assert store.stats()["sessions_in_memory"] == 1
+
+def test_session_in_use_is_not_spilled(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), max_sessions=1)
+    session = store.get("a")
+    # Between get and the caller taking session.lock
+    store.get("b")
+    assert store.stats()["sessions_in_memory"] == 2
+    store.put(session)
+    store.put(store.get("c"))
+    assert store.stats()["sessions_in_memory"] == 2
+    assert store.get("a") is not session
+
+def test_busy_session_is_not_spilled(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"), max_sessions=1)
+    session = store.get("a")
+    with session.lock:
+        store.get("b")
+        assert store.stats()["sessions_in_memory"] == 2
+
+def test_close_spills_every_session(tmp_path):
+    store = SessionStore(db_path=str(tmp_path / "sessions.db"))
+    session = store.get("a")
+    session.token_ids = [1, 2]
+    store.put(session)
+    store.close()
+    assert store.stats()["sessions_in_memory"] == 0
+    assert store.get("a").token_ids == [1, 2]
@@ -0,0 +1,86 @@
+# tests/paia/generation/test_speculative.py
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from paia.generation.decoding import DecodingEngine, DecodingStream
+from paia.generation.speculative import SpeculativeDecodingEngine, SpeculativeStream
+
+
+@pytest.fixture
+def draft_model():
+    torch.manual_seed(1)
+    config = transformers.GPT2Config(vocab_size=256, n_positions=256, n_embd=16, n_layer=1, n_head=2, bos_token_id=None, eos_token_id=None)
+    return transformers.GPT2LMHeadModel(config).eval()
+
+
+@pytest.mark.parametrize("num_draft_tokens", [1, 3, 8])
+def test_output_matches_greedy(tiny_model, draft_model, tokenizer, num_draft_tokens):
+    prompt = tokenizer.encode("Hello world")
+    expected = list(DecodingEngine(tiny_model, tokenizer).generate(prompt, 40))
+    engine = SpeculativeDecodingEngine(tiny_model, tokenizer, draft_model, num_draft_tokens=num_draft_tokens)
+    stream = engine.generate(prompt, 40)
+    assert isinstance(stream, SpeculativeStream)
+    assert list(stream) == expected
+    stats = stream.stats["speculative"]
+    assert stream.stats["generated_tokens"] == 40 and stream.finish_reason == "length"
+    assert 0 <= stats["accepted_tokens"] <= stats["draft_tokens"]
+    assert stats["target_passes"] < 40 or stats["acceptance_rate"] == 0
+    # The cache covers everything but the last token, like DecodingStream
+    assert stream.cached_len == len(stream.token_ids) - 1
+
+
+def test_cache_reuse_and_eos(tiny_model, draft_model, tokenizer):
+    plain = DecodingEngine(tiny_model, tokenizer)
+    engine = SpeculativeDecodingEngine(tiny_model, tokenizer, draft_model, num_draft_tokens=4)
+    first = engine.generate(tokenizer.encode("Hello"), 6)
+    list(first)
+    follow_up = first.token_ids + tokenizer.encode(" again")
+    cached = engine.generate(follow_up, 12, past_key_values=first.past_key_values, cached_len=first.cached_len)
+    expected = list(plain.generate(follow_up, 12))
+    assert list(cached) == expected
+    stream = engine.generate(follow_up, 12, eos_token_id=expected[3])
+    assert list(stream) == expected[:expected.index(expected[3]) + 1] and stream.finish_reason == "eos"
+
+
+def test_sampling_decodes_token_by_token(tiny_model, draft_model, tokenizer):
+    engine = SpeculativeDecodingEngine(tiny_model, tokenizer, draft_model)
+    stream = engine.generate(tokenizer.encode("Hi"), 4, select=lambda logits: torch.argmin(logits, dim=-1))
+    assert type(stream) is DecodingStream
+
+
+def test_draft_model_gets_one_token_per_proposal(tiny_model, tokenizer):
+    engine = SpeculativeDecodingEngine(tiny_model, tokenizer, tiny_model, num_draft_tokens=4)
+    stream = engine.generate(tokenizer.encode("Hello world"), 20)
+    inputs = []
+    forward = stream._forward
+    def recording(model, input_ids, *args):
+        if model is tiny_model and len(inputs) < 4:
+            inputs.append(len(input_ids))
+        return forward(model, input_ids, *args)
+    stream._forward = recording
+    assert list(stream) == list(DecodingEngine(tiny_model, tokenizer).generate(tokenizer.encode("Hello world"), 20))
+    # Prompt, then one token for each further proposal of the first round
+    assert inputs == [11, 1, 1, 1]
+    # The draft is the main model, every proposal is accepted
+    assert stream.stats["speculative"]["acceptance_rate"] == 1.0
+
+
+def test_text_generator_defaults_to_speculative_greedy(tiny_model, draft_model, tokenizer, monkeypatch):
+    from paia import PAIAConfig, PAIAModelCache, PAIASingleton
+    from paia.config import PAIAConfigSnapshot
+    from paia.service.text_generator import TextGenerationService
+
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot({"services": {"text-generator": {"draft_model": "draft"}}}))
+    PAIASingleton._instances.pop(PAIAModelCache, None)
+    engine = SpeculativeDecodingEngine(tiny_model, tokenizer, draft_model, num_draft_tokens=4)
+    service = TextGenerationService()
+    monkeypatch.setattr(service, "loadModel", lambda: engine)
+    try:
+        events = list(service.process({"text": "Hello world", "max_length": 31}))
+    finally:
+        PAIASingleton._instances.pop(PAIAModelCache, None)
+    expected = list(DecodingEngine(tiny_model, tokenizer).generate(tokenizer.encode("Hello world"), 20))
+    assert events[-2]["result"] == tokenizer.decode(tokenizer.encode("Hello world") + expected)
+    assert "speculative" in events[-1]["stats"]
@@ -0,0 +1,27 @@
+# tests/paia/generation/test_text_generator.py
+import pytest
+
+pytest.importorskip("torch")
+
+from paia import PAIAConfig, PAIAModelCache, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.generation.decoding import DecodingEngine
+
+
+@pytest.fixture
+def service(tiny_model, tokenizer, monkeypatch):
+    from paia.service.text_generator import TextGenerationService
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot({"services": {"text-generator": {}}}))
+    PAIASingleton._instances.pop(PAIAModelCache, None)
+    service = TextGenerationService()
+    monkeypatch.setattr(service, "loadModel", lambda: DecodingEngine(tiny_model, tokenizer))
+    yield service
+    PAIASingleton._instances.pop(PAIAModelCache, None)
+
+
+def test_prompt_longer_than_max_length_gets_one_token(service, tiny_model, tokenizer):
+    prompt = "Hello world, a prompt longer than max_length"
+    events = list(service.process({"text": prompt, "max_length": 10}))
+    expected = list(DecodingEngine(tiny_model, tokenizer).generate(tokenizer.encode(prompt), 1))
+    assert events[-2]["result"] == prompt + tokenizer.decode(expected)
+    assert events[-1]["stats"]["generated_tokens"] == 1
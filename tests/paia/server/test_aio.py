@@ -0,0 +1,103 @@
+# tests/paia/server/test_aio.py
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from paia import PAIAConfig, PAIAServiceManager, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.admission import PAIAAdmission
+from paia.server.aio import PAIAAsyncServiceServer
+
+
+class CountService:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def process(self, query):
+        try:
+            for i in range(int(query.get("count", 3))):
+                yield {"result": str(i)}
+                time.sleep(float(query.get("delay", 0)))
+        finally:
+            self.closed.set()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    service = CountService()
+    config = {"server": {}, "services": {"count": {"admission": {"max_concurrency": 1, "max_queue": 1, "max_wait": 0.5}}}}
+    monkeypatch.setattr(PAIAServiceManager(), "get_service", lambda name: service if name == "count" else None)
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    PAIASingleton._instances.pop(PAIAAdmission, None)
+    srv = PAIAAsyncServiceServer(("127.0.0.1", 0), workers=2)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    srv.ready.wait(5)
+    srv.service = service
+    yield srv
+    srv.server_close()
+    thread.join(5)
+    PAIASingleton._instances.pop(PAIAAdmission, None)
+
+
+def post(connection, body):
+    connection.request("POST", "/", body=json.dumps(body), headers={"Content-Type": "application/json"})
+    return connection.getresponse()
+
+
+def test_keep_alive_serves_several_requests(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    response = post(connection, {"service": "count", "query": {"count": 2}})
+    assert json.loads(response.read()) == {"result": "1"}
+    response = post(connection, {"service": "missing"})
+    assert response.status == 404
+    assert "not found" in json.loads(response.read())["error"]
+    response = post(connection, {"service": "count", "query": {"count": 2}, "stream": True})
+    assert response.getheader("Content-Type") == "text/event-stream"
+    events = [json.loads(line[6:]) for line in response.read().decode().split("\n") if line.startswith("data: ")]
+    assert events == [{"result": "0"}, {"result": "1"}]
+    connection.request("GET", "/unknown")
+    response = connection.getresponse()
+    assert response.status == 404
+    response.read()
+    connection.request("GET", "/metrics")
+    response = connection.getresponse()
+    assert response.getheader("Content-Type").startswith("text/plain")
+    assert 'paia_requests_total{service="count"}' in response.read().decode()
+    connection.request("GET", "/health/live")
+    response = connection.getresponse()
+    assert (response.status, json.loads(response.read())) == (200, {"status": "live"})
+    connection.close()
+
+
+def test_client_disconnect_closes_the_stream(server):
+    sock = socket.create_connection(server.server_address, timeout=5)
+    body = json.dumps({"service": "count", "query": {"count": 1000, "delay": 0.01}, "stream": True}).encode()
+    sock.sendall(b"POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+    received = b""
+    while b"data: " not in received:
+        received += sock.recv(4096)
+    sock.close()
+    assert server.service.closed.wait(5)
+
+
+def test_queue_limits_answer_429_and_503(server):
+    running = http.client.HTTPConnection(*server.server_address, timeout=5)
+    running.request("POST", "/", body=json.dumps({"service": "count", "query": {"count": 100, "delay": 0.01}}))
+    time.sleep(0.1)
+    queued = http.client.HTTPConnection(*server.server_address, timeout=5)
+    queued.request("POST", "/", body=json.dumps({"service": "count", "stream": True, "queue_events": True}))
+    time.sleep(0.1)
+    rejected = http.client.HTTPConnection(*server.server_address, timeout=5)
+    response = post(rejected, {"service": "count"})
+    assert response.status == 429
+    assert int(response.getheader("Retry-After")) >= 1
+    response = queued.getresponse()
+    events = [json.loads(line[6:]) for line in response.read().decode().split("\n") if line.startswith("data: ")]
+    assert events[0] == {"queue": {"position": 1}}
+    assert events[-1]["status"] == 503 and events[-1]["retry_after"] >= 1
+    assert json.loads(running.getresponse().read()) == {"result": "99"}
@@ -0,0 +1,120 @@
+# tests/paia/server/test_gateway.py
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from paia import PAIAConfig, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.gateway import PAIAGateway
+from paia.server.gateway import PAIAGatewayServer, PAIAGatewayHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# A PAIA node serving stub services named on the command line
+BACKEND = """
+import sys, time
+from paia import PAIAService, PAIAServiceManager, PAIAServiceServer, PAIAServiceHandler
+
+class Stub(PAIAService):
+    def __init__(self, name):
+        self.name = name
+
+    def process(self, query):
+        for index in range(int(query.get("count", 1))):
+            if index:
+                time.sleep(float(query.get("delay", 0)))
+            yield {"result": f"{sys.argv[1]}:{self.name}:{index}"}
+
+for name in sys.argv[2:]:
+    PAIAServiceManager().register(name, Stub(name))
+server = PAIAServiceServer(("127.0.0.1", int(sys.argv[1])), PAIAServiceHandler)
+print("ready", flush=True)
+server.serve_forever()
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(tmp_path, *services):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-c", BACKEND, str(port), *services], cwd=tmp_path, env=dict(os.environ, PYTHONPATH=ROOT), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    assert process.stdout.readline().strip() == "ready"
+    return port, process
+
+
+@pytest.fixture
+def gateway(tmp_path, monkeypatch):
+    backends = [start_backend(tmp_path, "echo"), start_backend(tmp_path, "echo", "only-b")]
+    config = {"gateway": {"backends": [f"http://127.0.0.1:{port}" for port, _ in backends], "health_interval": 0, "fail_threshold": 1}}
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    PAIASingleton._instances.pop(PAIAGateway, None)
+    PAIAGateway().start()
+    server = PAIAGatewayServer(("127.0.0.1", 0), PAIAGatewayHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.backends = backends
+    yield server
+    server.shutdown()
+    server.server_close()
+    for _, process in backends:
+        process.kill()
+        process.wait()
+    PAIASingleton._instances.pop(PAIAGateway, None)
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request(method, path, body=None if body is None else json.dumps(body))
+    return connection.getresponse()
+
+
+def test_services_are_aggregated_and_routed(gateway):
+    services = json.loads(request(gateway, "GET", "/services").read())
+    assert {"echo", "only-b", "chat"} <= set(services["services"])
+    (port_a, _), (port_b, _) = gateway.backends
+    served = {json.loads(request(gateway, "POST", "/", {"service": "echo"}).read())["result"].split(":")[0] for _ in range(4)}
+    assert served == {str(port_a), str(port_b)}
+    assert json.loads(request(gateway, "POST", "/", {"service": "only-b"}).read())["result"] == f"{port_b}:only-b:0"
+    assert request(gateway, "POST", "/", {"service": "missing"}).status == 404
+
+
+def test_streams_are_not_buffered(gateway):
+    started = time.monotonic()
+    response = request(gateway, "POST", "/", {"service": "echo", "stream": True, "query": {"count": 3, "delay": 0.5}})
+    assert response.getheader("Content-Type") == "text/event-stream"
+    first = response.fp.readline()
+    assert first.startswith(b"data: ") and time.monotonic() - started < 0.9
+    events = [first] + [line for line in response.read().split(b"\n") if line]
+    assert [json.loads(line[len("data: "):])["result"].split(":")[2] for line in events] == ["0", "1", "2"]
+
+
+def test_failing_backend_is_ejected(gateway):
+    (port_a, _), (_, process_b) = gateway.backends
+    process_b.kill()
+    process_b.wait()
+    response = request(gateway, "POST", "/", {"service": "only-b"})
+    assert response.status == 503 and response.getheader("Retry-After")
+    stats = json.loads(request(gateway, "GET", "/gateway").read())
+    assert [backend["healthy"] for backend in stats.values()] == [True, False]
+    for _ in range(3):
+        assert json.loads(request(gateway, "POST", "/", {"service": "echo"}).read())["result"].startswith(f"{port_a}:")
+
+
+def test_timed_out_request_is_not_retried(gateway):
+    PAIAGateway().timeout = 0.5
+    started = time.monotonic()
+    response = request(gateway, "POST", "/", {"service": "echo", "query": {"count": 2, "delay": 2}})
+    # Answered once the first backend timed out, the second one never got the job
+    assert response.status == 504
+    assert time.monotonic() - started < 1.5
@@ -0,0 +1,34 @@
+# tests/paia/server/test_sse.py
+import json
+from paia.server.sse import encode_event, make_encoder
+
+def test_encode_event():
+    assert encode_event({"result": "a"}) == b'data: {"result": "a"}\n\n'
+
+def test_full_text_encoder_keeps_old_payload():
+    encoder = make_encoder()
+    assert encoder.encode({"result": "Hello", "delta": "Hello"}) == {"result": "Hello"}
+    assert encoder.encode({"stats": {"generated_tokens": 1}}) is None
+    assert encoder.final() is None
+
+def test_delta_encoder_reassembles():
+    encoder = make_encoder(delta=True)
+    events = [encoder.encode(result) for result in (
+        {"result": "Hel", "delta": "Hel"},
+        {"result": "Hello"},
+        {"stats": {"generated_tokens": 2}},
+    )]
+    assert events[0] == {"delta": "Hel", "seq": 0}
+    assert events[1] == {"delta": "lo", "seq": 1}
+    assert events[2] is None
+    final = encoder.final()
+    assert final["done"] is True
+    assert final["result"] == "Hello"
+    assert final["seq"] == 2
+    assert final["stats"]["generated_tokens"] == 2
+    assert "".join(event["delta"] for event in events[:2]) == final["result"]
+    json.dumps(final)
+
+def test_delta_encoder_passes_media_through():
+    encoder = make_encoder(delta=True)
+    assert encoder.encode({"result": "http://x/image.png", "type": "image"}) == {"result": "http://x/image.png", "type": "image", "seq": 0}
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from paia import PAIAConfig, PAIAService, PAIAServiceManager, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+
+
+class EchoService(PAIAService):
+    def process(self, query):
+        yield {"result": query.get("text", "")}
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    config = {"services": {"off": {"enabled": False}, "plugin": {"module": "paia.service.service", "class": "PAIAService", "streamable": True}}}
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    PAIASingleton._instances.pop(PAIAServiceManager, None)
+    yield PAIAServiceManager()
+    PAIASingleton._instances.pop(PAIAServiceManager, None)
+
+def test_listing_services_imports_no_model_library():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    code = "import sys; from paia.server.api import handle_get; handle_get('/services'); print([m for m in ('torch', 'transformers', 'diffusers') if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=root))
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+def test_manifest_and_config_declared_services(manager):
+    names = manager.get_services(as_str=True)["services"]
+    assert {"chat", "translate", "text-to-image", "plugin"} <= set(names)
+    assert manager.get_services()["plugin"].to_dict()["streamable"] is True
+    assert type(manager.get_service("plugin")) is PAIAService
+    assert manager.get_service("plugin") is manager.get_service("plugin")
+
+def test_register_instances_and_classes(manager):
+    echo = EchoService()
+    manager.register("echo", echo)
+    assert manager.get_service("echo") is echo
+    manager.register("echo", EchoService)
+    assert isinstance(manager.get_service("echo"), EchoService) and manager.get_service("echo") is not echo
+    manager.register("off", echo)
+    assert manager.get_service("off") is None
+    assert "off" not in manager.get_services(as_str=True)["services"]
+
+def test_broken_service_is_not_found(manager):
+    manager.register("broken", module="paia.service.missing_module", class_name="Missing")
+    assert manager.get_service("broken") is None
+    with pytest.raises(ValueError):
+        manager.register("empty")
+
+def test_dropped_instances_are_closed(manager):
+    class Closing(EchoService):
+        closed = 0
+        def close(self):
+            Closing.closed += 1
+    manager.register("closing", Closing)
+    manager.register("owned", Closing())
+    created, owned = manager.get_service("closing"), manager.get_service("owned")
+    old = PAIAConfig().snapshot
+    new = PAIAConfigSnapshot({"services": {"closing": {"x": 1}, "owned": {"x": 1}}})
+    manager._config_changed(old, new)
+    # Only the instance the manager created, a registered instance is served again
+    assert Closing.closed == 1
+    assert manager.get_service("closing") is not created
+    assert manager.get_service("owned") is owned
+
+def test_config_change_during_a_streaming_request(manager):
+    from paia.server.api import PAIAServiceRequest
+    gate = threading.Event()
+    class Streaming(EchoService):
+        closed = False
+        def process(self, query):
+            yield {"result": "a"}
+            assert gate.wait(5)
+            yield {"result": "ab"}
+        def close(self):
+            self.closed = True
+    manager.register("streaming", Streaming)
+    request = PAIAServiceRequest(json.dumps({"service": "streaming", "stream": True}))
+    results = request.results()
+    assert next(results) == {"result": "a"}
+    manager._config_changed(PAIAConfig().snapshot, PAIAConfigSnapshot({"services": {"streaming": {"x": 1}}}))
+    # New requests get a new instance, the running one finishes on the old one
+    assert manager.get_service("streaming") is not request.service
+    assert not request.service.closed
+    gate.set()
+    assert list(results) == [{"result": "ab"}]
+    request.close()
+    assert request.service.closed
+    # Dropped while unused: closed at once
+    idle = manager.get_service("streaming")
+    manager._config_changed(PAIAConfig().snapshot, PAIAConfigSnapshot({"services": {"streaming": {"x": 2}}}))
+    assert idle.closed
@@ -33,3 +33,51 @@ def test_text_to_image_empty_input():
 
 def test_text_to_image_invalid_image_size():
     mock_query({"text": "Test","stream":False,"height":"asdasd"},mock_service="text-to-image")
+
+class FakeImager:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, prompt, generator=None, width=64, height=64, **kwargs):
+        self.batches.append((list(prompt), [g.initial_seed() for g in generator] if generator else None))
+        from PIL import Image
+        return {"images": [Image.new("RGB", (width, height)) for _ in prompt]}
+
+def test_images_are_generated_in_batches_with_per_image_seeds():
+    from paia.service.text_to_image import TextToImageService
+    service = TextToImageService()
+    imager = FakeImager()
+    images = list(service.generate(imager, ["a", "a", "b", "b", "c"], None, 64, 64, 1, 1.0, seed=10, batch_size=2))
+    assert [(index, prompt) for index, prompt, _ in images] == [(0, "a"), (1, "a"), (2, "b"), (3, "b"), (4, "c")]
+    assert imager.batches == [(["a", "a"], [10, 11]), (["b", "b"], [12, 13]), (["c"], [14])]
+
+def test_max_batch_shrinks_with_resolution():
+    from paia.service.text_to_image import TextToImageService
+    service = TextToImageService()
+    assert service.max_batch(256, 256) == 8
+    assert service.max_batch(1024, 1024) == 1
+
+def test_image_count_is_capped(monkeypatch):
+    from paia.config import PAIAConfigSnapshot
+    from paia.service.text_to_image import TextToImageService
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot({"services": {"text-to-image": {"max_images": 2, "max_prompts": 3}}}))
+    service = TextToImageService()
+    assert service.validate({"text": ["a", "b", "c"], "num_images": 2}) is None
+    assert "Too many images" in service.validate({"text": "a", "num_images": 3})
+    assert "Too many prompts" in service.validate({"text": ["a", "b", "c", "d"]})
+    assert "Invalid num_images" in service.validate({"text": "a", "num_images": "many"})
+    assert list(service.process({"text": "a", "num_images": 3})) == [{"error": "Too many images: 3, at most 2"}]
+
+def test_image_format_is_part_of_the_cache_key(monkeypatch):
+    from paia.config import PAIAConfigSnapshot
+    from paia.response_cache import PAIAResponseCache
+    from paia.single_flight import PAIASingleFlight
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(PAIAConfig.DEFAULT_CONFIG))
+    png = {"text": "cat", "seed": 1, "format": "png"}
+    jpeg = {"text": "cat", "seed": 1, "format": "jpeg", "quality": 20}
+    for cls in (PAIAResponseCache, PAIASingleFlight):
+        PAIASingleton._instances.pop(cls, None)
+        keys = cls()
+        assert keys.key("text-to-image", png) != keys.key("text-to-image", jpeg)
+        assert keys.key("text-to-image", jpeg) != keys.key("text-to-image", dict(jpeg, quality=90))
+        PAIASingleton._instances.pop(cls, None)
@@ -0,0 +1,79 @@
+import pytest
+
+from paia import PAIAConfig, PAIASingleton, PAIAMediaStore
+from paia.config import PAIAConfigSnapshot
+from paia.speech import PAIATTSEngine, PAIASpeechCache, ENGINES, register_engine, wav_bytes
+
+
+class FakeEngine(PAIATTSEngine):
+    name = "fake"
+    calls = []
+
+    def synthesize(self, text, lang, voice=None):
+        self.calls.append(text)
+        return f"{lang}:{voice}:{text}".encode()
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    config = {"media_store": {"cleanup_interval": 0}, "services": {"text-to-speech": {"engine": "fake", "lang": "en", "voices": {"fake": {"other": "other-checkpoint"}}}}}
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    for cls in (PAIAMediaStore, PAIASpeechCache):
+        PAIASingleton._instances.pop(cls, None)
+    PAIAMediaStore().directory = str(tmp_path / "media")
+    register_engine(FakeEngine)
+    FakeEngine.calls.clear()
+    from paia.service.text_to_speech import TextToSpeechService
+    yield TextToSpeechService()
+    ENGINES.pop("fake", None)
+    for cls in (PAIAMediaStore, PAIASpeechCache):
+        PAIASingleton._instances.pop(cls, None)
+
+def test_sentences_are_streamed_one_by_one(service):
+    events = list(service.process({"text": "Hello there. How are you?\nBye"}))
+    assert [event["text"] for event in events[:-1]] == ["Hello there.", "How are you?", "Bye"]
+    assert all(event["type"] == "audio" and event["result"].endswith(event["media"]) for event in events[:-1])
+    assert PAIAMediaStore().get(events[0]["media"]).data == b"en:None:Hello there."
+    assert events[-1]["stats"]["sentences"] == 3
+
+def test_repeated_sentences_are_synthesized_once(service):
+    list(service.process({"text": "Hello. Welcome back."}))
+    events = list(service.process({"text": "Hello.  Goodbye."}))
+    assert FakeEngine.calls == ["Hello.", "Welcome back.", "Goodbye."]
+    assert events[-1]["stats"]["cached_sentences"] == 1
+    list(service.process({"text": "Hello.", "voice": "other"}))
+    assert FakeEngine.calls[-1] == "Hello."
+
+def test_unknown_engine_and_empty_text(service):
+    assert "error" in list(service.process({"text": "Hi", "engine": "missing"}))[0]
+    assert "error" in list(service.process({"text": ""}))[0]
+
+def test_only_whitelisted_voices_are_used(service):
+    assert service.validate({"text": "Hi", "voice": "other"}) is None
+    list(service.process({"text": "Hi", "voice": "other"}))
+    assert PAIAMediaStore().get(list(service.process({"text": "Hi", "voice": "other"}))[0]["media"]).data == b"en:other-checkpoint:Hi"
+    assert service.validate({"text": "Hi", "voice": "someone/any-repo"}) == "Unknown voice: someone/any-repo"
+    assert service.validate({"text": "Hi", "engine": "missing"}) == "Unknown speech engine: missing"
+    calls = len(FakeEngine.calls)
+    assert list(service.process({"text": "Hi", "voice": "someone/any-repo"})) == [{"error": "Unknown voice: someone/any-repo"}]
+    assert len(FakeEngine.calls) == calls
+
+def test_only_known_languages_are_used(service):
+    from paia.speech import LocalTTSEngine
+    FakeEngine.languages = {"en": "eng"}
+    try:
+        assert service.validate({"text": "Hi", "lang": "en"}) is None
+        assert service.validate({"text": "Hi", "lang": "xx/evil"}) == "Unsupported language for fake: xx/evil"
+        assert list(service.process({"text": "Hi", "lang": "xx/evil"})) == [{"error": "Unsupported language for fake: xx/evil"}]
+    finally:
+        FakeEngine.languages = None
+    local = LocalTTSEngine()
+    assert local.supports("cs") and not local.supports("anything")
+    assert local.model_id("cs") == "facebook/mms-tts-ces"
+    with pytest.raises(ValueError):
+        local.model_id("anything")
+
+def test_wav_encoding():
+    import numpy
+    data = wav_bytes(numpy.zeros(160, dtype="float32"), 16000)
+    assert data[:4] == b"RIFF" and len(data) == 44 + 320
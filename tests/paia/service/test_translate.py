@@ -0,0 +1,26 @@
+# tests/paia/service/test_translate.py
+import pytest
+
+pytest.importorskip("transformers")
+
+from paia.service.translate import TranslateService
+
+
+class FakeTranslator:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, segments, batch_size=1):
+        self.calls.append(list(segments))
+        return [{"translation_text": segment.upper()} for segment in segments]
+
+
+def test_translation_is_streamed_per_segment_in_batches():
+    translator = FakeTranslator()
+    service = TranslateService()
+    service.batch_size = 2
+    service.loadModel = lambda model_id: translator
+    events = list(service.process({"text": "Jedna. Dva. Tři.\nČtyři", "source_language": "cs", "target_language": "xx-test"}))
+    assert [event["delta"] for event in events] == ["JEDNA. ", "DVA. ", "TŘI.\n", "ČTYŘI"]
+    assert events[-1]["result"] == "JEDNA. DVA. TŘI.\nČTYŘI"
+    assert translator.calls == [["Jedna.", "Dva."], ["Tři.", "Čtyři"]]
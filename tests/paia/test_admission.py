@@ -0,0 +1,56 @@
+# tests/paia/test_admission.py
+import threading
+import time
+
+import pytest
+
+from paia.admission import PAIAQueueFull, PAIAServiceQueue
+
+
+def test_runs_up_to_max_concurrency_then_queues_in_order():
+    queue = PAIAServiceQueue("test", max_concurrency=2)
+    first, second, third, fourth = (queue.submit() for _ in range(4))
+    assert first.granted and second.granted
+    assert (third.position, fourth.position) == (1, 2)
+    first.release()
+    assert third.granted and not fourth.granted
+    assert fourth.position == 1
+
+def test_full_queue_is_rejected_with_retry_after():
+    queue = PAIAServiceQueue("test", max_concurrency=1, max_queue=1)
+    queue.submit()
+    queue.submit()
+    with pytest.raises(PAIAQueueFull) as error:
+        queue.submit()
+    assert error.value.retry_after >= 1
+    assert queue.stats()["rejected"] == 1
+
+def test_cancelled_ticket_leaves_the_queue():
+    queue = PAIAServiceQueue("test", max_concurrency=1)
+    running = queue.submit()
+    waiting = queue.submit()
+    waiting.cancel()
+    running.release()
+    stats = queue.stats()
+    assert (stats["running"], stats["waiting"]) == (0, 0)
+
+def test_expired_ticket_is_dropped():
+    queue = PAIAServiceQueue("test", max_concurrency=1, max_wait=0.01)
+    running = queue.submit()
+    waiting = queue.submit()
+    assert not waiting.wait(0.02)
+    assert queue.expire(waiting) is not None
+    running.release()
+    assert not waiting.granted
+    assert queue.stats()["timed_out"] == 1
+
+def test_grant_callback_runs_on_release():
+    queue = PAIAServiceQueue("test", max_concurrency=1)
+    running = queue.submit()
+    waiting = queue.submit()
+    granted = []
+    waiting.add_done_callback(granted.append)
+    threading.Timer(0.01, running.release).start()
+    assert waiting.wait(1)
+    time.sleep(0.01)
+    assert granted == [waiting]
@@ -0,0 +1,21 @@
+# tests/paia/test_backend.py
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from paia.backend import PAIABackend
+
+def test_cpu_backend_defaults_to_float32():
+    backend = PAIABackend("test", config={"device": "cpu"})
+    assert backend.device.type == "cpu"
+    assert backend.dtype == torch.float32
+    assert backend.quantization is None
+
+def test_int8_quantizes_linear_layers():
+    backend = PAIABackend("test", config={"device": "cpu", "quantization": "int8"})
+    model = backend.prepare(torch.nn.Sequential(torch.nn.Linear(8, 8)))
+    assert not isinstance(model[0], torch.nn.Linear)
+    assert model(torch.randn(2, 8)).shape == (2, 8)
+
+def test_unknown_quantization_is_ignored():
+    assert PAIABackend("test", config={"device": "cpu", "quantization": "int4"}).quantization is None
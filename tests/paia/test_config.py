@@ -54,4 +54,39 @@ def test_config_access_file(config_json_access):
 
 def test_config_ui_dir(config_json):
     PAIAConfig().update(config_file=str(config_json))
-    assert PAIAConfig().ui_dir == "ui"
\ No newline at end of file
+    assert PAIAConfig().ui_dir == "ui"
+def test_config_snapshot_is_read_only(config_json):
+    config = PAIAConfig().update(config_file=str(config_json))
+    with pytest.raises(TypeError):
+        config["server"]["host"] = "example.com"
+    assert PAIAConfig().service("text-generator")["streamable"] is True
+    assert PAIAConfig().service("missing") == {}
+    assert json.loads(json.dumps(config))["services"]["text-generator"]["parameters"] == []
+
+def test_config_merge_service_config():
+    services = {"translate": {"batching": {"enabled": True, "max_batch_size": 8}}}
+    PAIAConfig()._merge_service_config("translate", services, {"batching": {"max_batch_size": 4}, "preload": True})
+    PAIAConfig()._merge_service_config("chat", services, {"sessions": {"ttl": 60}})
+    assert services == {"translate": {"batching": {"enabled": True, "max_batch_size": 4}, "preload": True}, "chat": {"sessions": {"ttl": 60}}}
+
+def test_config_watcher_swaps_snapshot_and_notifies(config_json):
+    import os
+    import threading
+    PAIAConfig().update(config_file=str(config_json))
+    changes = []
+    notified = threading.Event()
+    def subscriber(old, new):
+        changes.append((old.port, new.port))
+        notified.set()
+    PAIAConfig().subscribe(subscriber)
+    PAIAConfig().watch(interval=0.01)
+    try:
+        config_json.write_text(json.dumps({"server": {"host": "localhost", "port": 9000}}))
+        stat = os.stat(config_json)
+        os.utime(config_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert notified.wait(5)
+        assert changes == [(8000, 9000)]
+        assert PAIAConfig().port == 9000 and PAIAConfig().getConfig()["server"]["port"] == 9000
+    finally:
+        PAIAConfig().stop_watching()
+        PAIAConfig().unsubscribe(subscriber)
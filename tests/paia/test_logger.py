@@ -20,4 +20,20 @@ def test_logger_write(tmp_path,dir_fix):
     assert logger.level == logging.DEBUG
     logger.info("Test message")
     with open(os.path.join(str(log_dir), "app.log")) as f:
-        assert "Test message" in f.read()
\ No newline at end of file
+        assert "Test message" in f.read()
+def test_logger_async_sampling_and_truncation(tmp_path,dir_fix):
+    log_dir = tmp_path / "logs"
+    PAIALogger().update(config = {"level": logging.DEBUG, "dir": str(log_dir), "async": True, "json": True, "console": False, "max_payload": 10, "sampling": {"token": 3}})
+    try:
+        for i in range(6):
+            PAIALogger().debug("Token %s", i, category="token")
+        PAIALogger().info("Payload: %s", PAIALogger().payload({"text": "x" * 100}))
+        PAIALogger().flush()
+        import json
+        with open(os.path.join(str(log_dir), "app.log")) as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["message"] for line in lines[:2]] == ["Token 0", "Token 3"]
+        assert lines[0]["category"] == "token"
+        assert lines[2]["message"] == "Payload: {'text': '... (112 chars)"
+    finally:
+        PAIALogger().update(PAIALogger().config_default)
@@ -0,0 +1,90 @@
+# tests/paia/test_media_store.py
+import os
+
+import pytest
+
+from paia import PAIAConfig, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.media_store import PAIAMediaStore
+from paia.server.api import PAIAAPIError, handle_get
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    config = {"media_store": {"memory_bytes": 100, "disk_bytes": 1000, "ttl": 60, "cleanup_interval": 0}}
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    PAIASingleton._instances.pop(PAIAMediaStore, None)
+    store = PAIAMediaStore()
+    store.directory = str(tmp_path / "media")
+    yield store
+    store.close()
+    PAIASingleton._instances.pop(PAIAMediaStore, None)
+
+
+def test_names_are_content_hashes(store):
+    first = store.put(b"sound", "mp3")
+    assert store.put(b"sound", "mp3") == first
+    assert store.put(b"other", "mp3") != first
+    assert len(os.listdir(store.directory)) == 2
+    item = store.get(first.split(".")[0])
+    assert item.data == b"sound" and item.content_type == "audio/mpeg"
+    assert store.get("../../etc/passwd") is None
+
+def test_lookups_do_not_list_the_directory(store, monkeypatch):
+    name = store.put(b"sound", "mp3")
+    store._memory.clear()
+    monkeypatch.setattr(os, "scandir", lambda *args: pytest.fail("scanned"))
+    assert store.contains(name) and store.contains(name.split(".")[0])
+    assert store.get(name.split(".")[0]).data == b"sound"
+    assert not store.contains("0" * 64)
+
+def test_disk_tier_survives_memory_eviction(store):
+    name = store.put(b"x" * 80, "png")
+    store.put(b"y" * 80, "png")
+    assert name.split(".")[0] not in store._memory
+    assert store.get(name).data == b"x" * 80
+
+def test_cleanup_drops_expired_then_least_recently_used(store):
+    old = store.put(b"a" * 400, "png")
+    used = store.put(b"b" * 400, "png")
+    fresh = store.put(b"c" * 400, "png")
+    now = os.path.getmtime(os.path.join(store.directory, fresh))
+    os.utime(os.path.join(store.directory, old), (now - 120, now - 120))
+    os.utime(os.path.join(store.directory, used), (now - 10, now - 10))
+    store._memory.clear()
+    store.cleanup(now)
+    assert not store.contains(old)
+    assert store.contains(used) and store.contains(fresh)
+    store.disk_bytes = 500
+    store.cleanup(now)
+    assert not store.contains(used) and store.contains(fresh)
+
+@pytest.mark.parametrize("image_format", ["png", "webp", "jpeg"])
+def test_images_are_encoded_off_thread(store, image_format):
+    from PIL import Image
+    name = store.encode(Image.new("RGBA", (8, 8)), image_format, 80).result(5)
+    assert name.endswith("." + image_format)
+    assert store.get(name).content_type == f"image/{image_format}"
+    with pytest.raises(ValueError):
+        store.encode(Image.new("RGB", (8, 8)), "gif")
+
+def test_media_route_etag_and_range(store):
+    name = store.put(b"0123456789", "mp3")
+    status, headers, body = handle_get(f"/media/{name}")
+    assert (status, body) == (200, b"0123456789")
+    assert headers["Content-Type"] == "audio/mpeg"
+    assert handle_get(f"/media/{name}", {"if-none-match": headers["ETag"]})[0] == 304
+    status, headers, body = handle_get(f"/media/{name}", {"range": "bytes=2-4"})
+    assert (status, body, headers["Content-Range"]) == (206, b"234", "bytes 2-4/10")
+    assert handle_get(f"/media/{name}", {"range": "bytes=-3"})[2] == b"789"
+    with pytest.raises(PAIAAPIError) as error:
+        handle_get(f"/media/{name}", {"range": "bytes=20-"})
+    assert error.value.status == 416
+    with pytest.raises(PAIAAPIError) as error:
+        handle_get("/media/" + "0" * 64)
+    assert error.value.status == 404
+
+def test_inline_adds_data_url(store):
+    event = store.event(store.put(b"abc", "png"), "image")
+    assert event["result"].endswith("/media/" + event["media"])
+    assert store.inline(event)["data"] == "data:image/png;base64,YWJj"
@@ -0,0 +1,58 @@
+# tests/paia/test_metrics.py
+import threading
+
+from paia.metrics import Counter, Gauge, Histogram
+
+
+def test_histogram_merges_thread_buckets():
+    histogram = Histogram("test_seconds", "Test.", ("service",), buckets=(0.1, 1.0))
+    def record():
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, "chat")
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds Test.", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{service="chat",le="0.1"} 4' in lines
+    assert 'test_seconds_bucket{service="chat",le="1"} 8' in lines
+    assert 'test_seconds_bucket{service="chat",le="+Inf"} 12' in lines
+    assert 'test_seconds_count{service="chat"} 12' in lines
+    assert 'test_seconds_sum{service="chat"} 22.2' in lines
+
+def test_gauge_inc_and_dec_on_different_threads():
+    gauge = Gauge("test_active", "Test.", ("service",))
+    gauge.inc("chat")
+    thread = threading.Thread(target=gauge.dec, args=("chat",))
+    thread.start()
+    thread.join()
+    gauge.inc("chat")
+    assert gauge.value("chat") == 1
+
+def test_counter_labels_are_escaped():
+    counter = Counter("test_total", "Test.", ("service",))
+    counter.inc('a"b', amount=2)
+    assert counter.render()[-1] == 'test_total{service="a\\"b"} 2'
+
+def test_cells_of_finished_threads_are_folded():
+    counter = Counter("test_total", "Test.", ("service",))
+    for _ in range(3):
+        for _ in range(10):
+            thread = threading.Thread(target=counter.inc, args=("chat",))
+            thread.start()
+            thread.join()
+        assert counter.value("chat") > 0
+    assert counter.value("chat") == 30
+    assert len(counter._threads) == 0
+
+def test_finished_threads_are_folded_without_scrapes():
+    counter = Counter("test_total", "Test.", ("service",))
+    for _ in range(20):
+        thread = threading.Thread(target=counter.inc, args=("chat",))
+        thread.start()
+        thread.join()
+    # Each thread folds the ones before it when it registers
+    assert len(counter._threads) == 1
+    assert counter.value("chat") == 20
@@ -0,0 +1,86 @@
+# tests/paia/test_model_cache.py
+import threading
+import time
+
+import pytest
+
+from paia import PAIASingleton
+from paia.model_cache import PAIAModelCache
+
+
+@pytest.fixture
+def cache():
+    PAIASingleton._instances.pop(PAIAModelCache, None)
+    cache = PAIAModelCache()
+    cache.configure(max_bytes=0, idle_timeout=0)
+    yield cache
+    PAIASingleton._instances.pop(PAIAModelCache, None)
+
+
+def test_hit_after_miss(cache):
+    with cache.use("a", lambda: "model-a", size=10) as model:
+        assert model == "model-a"
+    with cache.use("a", lambda: pytest.fail("reloaded"), size=10) as model:
+        assert model == "model-a"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["models"]["a"]["refs"] == 0
+
+def test_concurrent_misses_load_once(cache):
+    calls = []
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return object()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.acquire("a", loader, size=1))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+
+def test_failed_load_is_not_cached(cache):
+    def loader():
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        cache.acquire("a", loader)
+    assert not cache.contains("a")
+    assert cache.stats()["load_failures"] == 1
+
+def test_budget_evicts_least_recently_used(cache):
+    evicted = []
+    cache.configure(max_bytes=25)
+    for key in ("a", "b"):
+        with cache.use(key, lambda: key, size=10, on_evict=evicted.append):
+            pass
+    with cache.use("a", lambda: "a", size=10):
+        pass
+    with cache.use("c", lambda: "c", size=10, on_evict=evicted.append):
+        pass
+    assert evicted == ["b"]
+    assert cache.contains("a") and cache.contains("c")
+    assert cache.total_bytes == 20
+
+def test_leased_and_pinned_models_are_kept(cache):
+    cache.configure(max_bytes=15)
+    cache.acquire("leased", lambda: "leased", size=10)
+    with cache.use("pinned", lambda: "pinned", size=10, pin=True):
+        pass
+    assert cache.contains("leased") and cache.contains("pinned")
+    cache.release("leased")
+    assert not cache.contains("leased")
+    assert cache.contains("pinned")
+    cache.unpin("pinned")
+    cache.configure(max_bytes=5)
+    assert not cache.contains("pinned")
+
+def test_idle_models_are_evicted(cache):
+    with cache.use("a", lambda: "a", size=1):
+        pass
+    cache.configure(idle_timeout=0.01)
+    time.sleep(0.05)
+    cache.configure()
+    assert not cache.contains("a")
+    assert cache.stats()["evictions"] == 1
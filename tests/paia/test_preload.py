@@ -0,0 +1,45 @@
+# tests/paia/test_preload.py
+import pytest
+
+from paia import PAIASingleton
+from paia.model_cache import PAIAModelCache
+from paia.preload import PAIAPreloader
+
+
+class PreloadService:
+    def __init__(self):
+        self.warmed = []
+
+    def preload_models(self):
+        def fail():
+            raise RuntimeError("no such model")
+        return [
+            ("stub:ok", lambda: "model", None, self.warmed.append),
+            ("stub:broken", fail, None, None),
+        ]
+
+
+@pytest.fixture(autouse=True)
+def fresh():
+    for cls in (PAIAPreloader, PAIAModelCache):
+        PAIASingleton._instances.pop(cls, None)
+    yield
+    for cls in (PAIAPreloader, PAIAModelCache):
+        PAIASingleton._instances.pop(cls, None)
+
+
+def test_models_are_loaded_warmed_and_pinned():
+    service = PreloadService()
+    preloader = PAIAPreloader()
+    preloader.start({"stub": service})
+    assert not preloader.wait(5)
+    status = preloader.status()
+    assert status["ready"] is False
+    assert status["models"]["stub:ok"]["state"] == "ready"
+    assert status["models"]["stub:ok"]["warmup_seconds"] is not None
+    assert status["models"]["stub:broken"]["state"] == "failed"
+    assert service.warmed == ["model"]
+    assert PAIAModelCache().stats()["models"]["stub:ok"]["pinned"]
+
+def test_ready_without_preloaded_models():
+    assert PAIAPreloader().ready()
@@ -0,0 +1,85 @@
+# tests/paia/test_response_cache.py
+import pytest
+
+from paia import PAIAConfig, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.response_cache import PAIAResponseCache
+
+
+class CountingService:
+    def __init__(self):
+        self.calls = 0
+
+    def process(self, query):
+        self.calls += 1
+        yield {"result": "a", "delta": "a"}
+        yield {"result": "ab", "delta": "b"}
+        yield {"stats": {"generated_tokens": 2}}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    config = {"services": {"echo": {"cache": {"enabled": True, "parameters": ["text", "seed"], "required": ["seed"]}}}}
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    PAIASingleton._instances.pop(PAIAResponseCache, None)
+    cache = PAIAResponseCache()
+    cache.db_path = str(tmp_path / "responses.db")
+    yield cache
+    PAIASingleton._instances.pop(PAIAResponseCache, None)
+
+
+def test_hit_replays_recorded_events(cache):
+    service = CountingService()
+    first = list(cache.process("echo", service, {"text": "hi", "seed": 1}))
+    second = list(cache.process("echo", service, {"text": " hi ", "seed": "1", "ignored": True}))
+    assert service.calls == 1
+    assert second[:-1] == first[:-1]
+    assert second[-1] == {"stats": {"cache": "hit"}}
+
+def test_disk_tier_survives_memory_eviction(cache):
+    service = CountingService()
+    list(cache.process("echo", service, {"text": "hi", "seed": 1}))
+    cache._memory.clear()
+    cache._memory_used = 0
+    list(cache.process("echo", service, {"text": "hi", "seed": 1}))
+    assert service.calls == 1
+
+def test_uncacheable_requests_always_run(cache):
+    service = CountingService()
+    for _ in range(2):
+        list(cache.process("echo", service, {"text": "hi"}))
+        list(cache.process("other", service, {"text": "hi", "seed": 1}))
+    assert service.calls == 4
+
+def test_partial_and_failed_responses_are_not_stored(cache):
+    service = CountingService()
+    events = cache.process("echo", service, {"text": "hi", "seed": 1})
+    next(events)
+    events.close()
+    class Failing:
+        def process(self, query):
+            yield {"error": "boom"}
+    list(cache.process("echo", Failing(), {"text": "hi", "seed": 1}))
+    list(cache.process("echo", service, {"text": "hi", "seed": 1}))
+    assert service.calls == 2
+
+def test_expired_responses_are_recomputed(cache):
+    service = CountingService()
+    cache.ttl = -1
+    for _ in range(2):
+        list(cache.process("echo", service, {"text": "hi", "seed": 1}))
+    assert service.calls == 2
+
+def test_disk_size_is_tracked_incrementally(cache):
+    cache.disk_bytes = 200
+    for seed in range(5):
+        cache.put(str(seed), [{"result": "x" * 40}])
+    cache.put("4", [{"result": "y" * 40}])
+    cache.delete("0")
+    db = cache._connection()
+    assert cache._disk_used == db.execute("SELECT SUM(size) FROM responses").fetchone()[0] <= 200
+
+def test_memory_hits_do_not_wait_for_disk(cache):
+    cache.put("a", [{"result": "a"}])
+    with cache._db_lock:
+        assert cache.get("a") == [{"result": "a"}]
@@ -0,0 +1,16 @@
+# tests/paia/test_segmentation.py
+from paia.segmentation import segment_text, split_sentences
+
+def test_split_sentences_keeps_separators():
+    text = "Ahoj světe! Jak se máš? \"Dobře.\" Díky\n\nDalší odstavec"
+    pieces = split_sentences(text)
+    assert [sentence for sentence, _ in pieces] == ["Ahoj světe!", "Jak se máš?", "\"Dobře.\"", "Díky", "Další odstavec"]
+    assert "".join(sentence + separator for sentence, separator in pieces) == text
+
+def test_split_sentences_of_blank_text():
+    assert split_sentences("  \n ") == []
+
+def test_long_sentences_are_cut_at_clause_boundaries():
+    segments = segment_text("one two, three four; five six seven.", max_chars=12)
+    assert all(len(segment) <= 12 for segment, _ in segments)
+    assert " ".join(segment for segment, _ in segments) == "one two, three four; five six seven."
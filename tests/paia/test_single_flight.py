@@ -0,0 +1,128 @@
+# tests/paia/test_single_flight.py
+import threading
+
+import pytest
+
+from paia import PAIAConfig, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.single_flight import PAIASingleFlight
+
+
+class GatedService:
+    """Yields three events, each once the test opens its gate."""
+
+    def __init__(self):
+        self.calls = 0
+        self.closed = False
+        self.gates = [threading.Event() for _ in range(3)]
+
+    def process(self, query):
+        self.calls += 1
+        try:
+            text = ""
+            for index, gate in enumerate(self.gates):
+                assert gate.wait(5)
+                text += str(index)
+                yield {"result": text, "delta": str(index)}
+        finally:
+            self.closed = True
+
+    def open(self):
+        for gate in self.gates:
+            gate.set()
+
+
+@pytest.fixture
+def flights(monkeypatch):
+    config = {"services": {"echo": {"coalesce": {"enabled": True}, "cache": {"parameters": ["text"]}}}}
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    PAIASingleton._instances.pop(PAIASingleFlight, None)
+    yield PAIASingleFlight()
+    PAIASingleton._instances.pop(PAIASingleFlight, None)
+
+
+def test_late_joiner_gets_the_full_sequence(flights):
+    service = GatedService()
+    leader = flights.process("echo", {"text": "hi"}, lambda: service.process({}))
+    service.gates[0].set()
+    assert next(leader) == {"result": "0", "delta": "0"}
+    # Parameters outside the key and whitespace do not matter
+    follower = flights.join("echo", {"text": " hi ", "other": 1})
+    assert follower is not None
+    assert flights.stats()["subscribers"] == 2
+    service.open()
+    assert list(leader) == [{"result": "01", "delta": "1"}, {"result": "012", "delta": "2"}]
+    assert list(follower) == [
+        {"result": "0", "delta": "0"}, {"result": "01", "delta": "1"}, {"result": "012", "delta": "2"},
+        {"stats": {"coalesced": True}},
+    ]
+    assert service.calls == 1
+    assert flights.stats() == {"in_flight": 0, "flights": 1, "coalesced": 1, "subscribers": 0}
+    # A finished flight is not joined, the next request runs again
+    assert flights.join("echo", {"text": "hi"}) is None
+
+
+def test_other_services_and_queries_run_alone(flights):
+    service = GatedService()
+    service.open()
+    assert flights.join("echo", {"text": "hi"}) is None
+    plain = flights.process("other", {"text": "hi"}, lambda: service.process({}))
+    assert not hasattr(plain, "leader")
+    first = flights.process("echo", {"text": "a"}, lambda: service.process({}))
+    second = flights.process("echo", {"text": "b"}, lambda: service.process({}))
+    assert first.leader and second.leader
+    assert len(list(plain)) == len(list(first)) == len(list(second)) == 3
+    assert service.calls == 3
+
+
+def test_abandoned_flight_stops_the_run(flights):
+    service = GatedService()
+    leader = flights.process("echo", {"text": "hi"}, lambda: service.process({}))
+    follower = flights.join("echo", {"text": "hi"})
+    service.gates[0].set()
+    next(leader)
+    leader.close()
+    assert flights.stats()["in_flight"] == 1
+    follower.close()
+    assert flights.stats()["in_flight"] == 0
+    service.gates[1].set()
+    for _ in range(100):
+        if service.closed:
+            break
+        threading.Event().wait(0.05)
+    assert service.closed and not service.gates[2].is_set()
+
+
+def test_errors_reach_every_subscriber(flights):
+    gate = threading.Event()
+
+    def failing():
+        assert gate.wait(5)
+        yield {"result": "a"}
+        raise RuntimeError("boom")
+
+    leader = flights.process("echo", {"text": "hi"}, failing)
+    follower = flights.join("echo", {"text": "hi"})
+    gate.set()
+    for subscription in (leader, follower):
+        assert next(subscription) == {"result": "a"}
+        with pytest.raises(RuntimeError, match="boom"):
+            next(subscription)
+
+
+def test_leader_slot_is_held_until_the_run_ends(flights):
+    service = GatedService()
+    released = threading.Event()
+    leader = flights.process("echo", {"text": "hi"}, lambda: service.process({}), released.set)
+    follower = flights.join("echo", {"text": "hi"})
+    service.gates[0].set()
+    next(leader)
+    leader.close()
+    # The run goes on for the follower, and keeps the slot
+    assert not released.wait(0.1)
+    service.open()
+    assert len(list(follower)) == 4
+    assert released.wait(5)
+    # Not coalescing: the caller keeps its slot
+    plain = flights.process("other", {"text": "hi"}, lambda: iter([{"result": "x"}]), lambda: pytest.fail("released"))
+    assert list(plain) == [{"result": "x"}]
@@ -0,0 +1,111 @@
+# tests/paia/test_worker.py
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from paia import PAIAConfig, PAIAMediaStore, PAIAService, PAIAServiceManager, PAIASingleton
+from paia.config import PAIAConfigSnapshot
+from paia.worker import END, EVENT, PAIARingBuffer, PAIAWorkerService
+
+
+class StubService(PAIAService):
+    """Imported by the worker processes of the tests."""
+
+    def process(self, query):
+        if query.get("crash"):
+            os._exit(3)
+        for index in range(query.get("count", 3)):
+            yield {"result": f"{query.get('text', '')}{index}", "pid": os.getpid()}
+        if query.get("media"):
+            yield PAIAMediaStore().event(PAIAMediaStore().put(query["media"].encode() * 1000, "wav"), "audio")
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    config = {
+        "logging": {"dir": str(tmp_path), "file_name": "app.log", "console": False, "async": False},
+        "media_store": {"disk_bytes": 0, "cleanup_interval": 0},
+        "services": {"stub": {"worker": {"enabled": True, "replicas": 2, "ring_bytes": 4096, "backoff": 0.05}}},
+    }
+    monkeypatch.setattr(PAIAConfig(), "snapshot", PAIAConfigSnapshot(config))
+    for cls in (PAIAServiceManager, PAIAMediaStore):
+        PAIASingleton._instances.pop(cls, None)
+    manager = PAIAServiceManager()
+    manager.register("stub", module="test_worker", class_name="StubService")
+    yield manager
+    manager.register("stub", StubService)
+    for cls in (PAIAServiceManager, PAIAMediaStore):
+        PAIASingleton._instances.pop(cls, None)
+
+
+def test_ring_buffer_splits_large_payloads():
+    ring = PAIARingBuffer(64)
+    payload = bytes(range(256)) * 4
+    writer = threading.Thread(target=lambda: (ring.write(7, EVENT, payload), ring.write(7, END)))
+    writer.start()
+    received = bytearray()
+    while True:
+        request_id, kind, chunk = ring.read(timeout=5)
+        assert request_id == 7
+        if kind == END:
+            break
+        received += chunk
+    writer.join()
+    ring.close()
+    assert bytes(received) == payload
+
+
+def test_service_runs_in_worker_processes(manager):
+    service = manager.get_service("stub")
+    assert isinstance(service, PAIAWorkerService)
+    events = list(service.process({"text": "a", "media": "x"}))
+    assert [event["result"] for event in events[:3]] == ["a0", "a1", "a2"]
+    assert events[0]["pid"] != os.getpid()
+    # Media bytes larger than the ring reach the server process's store
+    assert PAIAMediaStore().get(events[3]["media"]).data == b"x" * 1000
+    assert len(service.pool.stats()["workers"]) == 2
+
+
+def test_crashed_worker_is_restarted(manager):
+    service = manager.get_service("stub")
+    events = list(service.process({"crash": True}))
+    assert "exited with code 3" in events[-1]["error"]
+    deadline = time.monotonic() + 30
+    while sum(worker["restarts"] for worker in service.pool.stats()["workers"]) < 1 or not all(worker.alive() for worker in service.pool.workers):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert [event["result"] for event in service.process({"text": "b", "count": 2})] == ["b0", "b1"]
+
+
+def test_request_fails_when_its_worker_dies_silently():
+    class DeadProcess:
+        exitcode = -9
+
+        def is_alive(self):
+            return False
+
+    class SilentWorker:
+        process = DeadProcess()
+        cancelled = []
+
+        def submit(self, query):
+            return 1, queue.SimpleQueue()
+
+        def cancel(self, request_id):
+            self.cancelled.append(request_id)
+
+    class Pool:
+        spec = type("Spec", (), {"name": "stub"})
+        worker = SilentWorker()
+
+        def acquire(self):
+            return self.worker
+
+    service = PAIAWorkerService.__new__(PAIAWorkerService)
+    service.pool = Pool()
+    service.poll_interval = 0.01
+    assert list(service.process({})) == [{"error": "Worker for stub exited with code -9"}]
+    assert Pool.worker.cancelled == [1]
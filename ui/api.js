@@ -40,6 +40,32 @@ export async function queryService(serverUrl, payload) {
     }
 }
 
+// Reads a Server-Sent Events body and calls onEvent for every parsed data event.
+// Events may be split across network chunks, so the text is buffered until "\n\n".
+export async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            console.log('Stream ended');
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const event of events) {
+            if (event.startsWith('data: ')) {
+                if (onEvent(JSON.parse(event.slice(6))) === false) {
+                    await reader.cancel();
+                    return;
+                }
+            }
+        }
+    }
+}
+
 async function fetchWithRetry(url, options, retries = 3, delay = 1000) {
     for (let i = 0; i < retries; i++) {
         try {
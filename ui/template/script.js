@@ -1,5 +1,5 @@
 // ui/script.js
-import { fetchServices, fetchConfig, queryService } from './api.js';
+import { fetchServices, fetchConfig, queryService, readEventStream } from './api.js';
 
 document.addEventListener('DOMContentLoaded', async () => {
     const serviceSelect = document.getElementById('service-select');
@@ -180,6 +180,9 @@ document.addEventListener('DOMContentLoaded', async () => {
             query: { text: queryText },
             stream: config.services?.[service]?.streamable || false
         };
+        // Streamed text arrives as deltas, reassembled below
+        payload.delta = payload.stream;
+        payload.queue_events = payload.stream;
 
         const serviceConfig = config.services?.[service]?.parameters || [];
         serviceConfig.forEach(param => {
@@ -196,46 +199,65 @@ document.addEventListener('DOMContentLoaded', async () => {
 
             if (payload.stream) {
                 console.log(`Initiating streaming for ${service}`);
-                const reader = response.body.getReader();
                 let responseEntry = null;
+                let text = '';
+                let nextSeq = 0;
 
-                const readStream = async () => {
-                    while (true) {
-                        const { done, value } = await reader.read();
-                        if (done) {
-                            console.log('Stream ended');
-                            break;
-                        }
+                const showText = (data) => {
+                    if (!responseEntry) {
+                        responseEntry = createResponseEntry({ ...data, result: text });
+                        historyDiv.insertBefore(responseEntry, historyDiv.firstChild);
+                    } else {
+                        responseEntry.querySelector('.markdown-content').innerHTML = marked.parse(text);
+                    }
+                    historyDiv.scrollTop = 0;
+                };
 
-                        const chunk = new TextDecoder().decode(value);
-                        console.log(`Received chunk: ${chunk}`);
-                        const lines = chunk.split("\n\n");
-                        for (const line of lines) {
-                            if (line.startsWith('data: ')) {
-                                try {
-                                    const data = JSON.parse(line.slice(6));
-                                    console.log(`Parsed SSE event: ${JSON.stringify(data)}`);
-                                    if (data.result) {
-                                        if (!responseEntry) {
-                                            responseEntry = createResponseEntry(data);
-                                            historyDiv.insertBefore(responseEntry, historyDiv.firstChild);
-                                        } else if (data.type !== 'audio') {
-                                            responseEntry.querySelector('.markdown-content').innerHTML = marked.parse(data.result);
-                                        }
-                                        historyDiv.scrollTop = 0;
-                                        console.log(`Displayed: ${data.result}`);
-                                    } else if (data.error) {
-                                        addToHistory(`Error: ${data.error}`, 'error');
-                                        break;
-                                    }
-                                } catch (e) {
-                                    console.log(`Error parsing SSE event: ${e.message}`);
-                                    addToHistory(`Error: Failed to parse stream data - ${e.message}`, 'error');
-                                }
-                            }
+                const readStream = () => readEventStream(response, (data) => {
+                    if (data.queue) {
+                        console.log(`Queued for ${service}: position ${data.queue.position}`);
+                        return;
+                    }
+                    if (data.seq !== undefined) {
+                        if (data.seq !== nextSeq) {
+                            console.log(`Out of order SSE event: expected ${nextSeq}, got ${data.seq}`);
                         }
+                        nextSeq = data.seq + 1;
                     }
-                };
+                    if (data.error) {
+                        addToHistory(`Error: ${data.error}`, 'error');
+                        return false;
+                    }
+                    if (data.done) {
+                        console.log(`Stream finished: ${JSON.stringify(data.stats)}`);
+                        if (data.result && data.result !== text) {
+                            text = data.result;
+                            showText(data);
+                        }
+                    } else if (data.delta !== undefined) {
+                        text += data.delta;
+                        if (text) {
+                            showText(data);
+                        }
+                    } else if (data.result) {
+                        if (!responseEntry) {
+                            responseEntry = createResponseEntry(data);
+                            historyDiv.insertBefore(responseEntry, historyDiv.firstChild);
+                        } else if (data.type === 'audio') {
+                            // Speech arrives sentence by sentence, later chunks play after the current one
+                            queueAudio(responseEntry.querySelector('.response-audio'), data.result);
+                        } else if (data.type === 'image') {
+                            const img = document.createElement('img');
+                            img.className = 'response-image';
+                            img.src = data.result;
+                            responseEntry.appendChild(img);
+                        } else {
+                            responseEntry.querySelector('.markdown-content').innerHTML = marked.parse(data.result);
+                        }
+                        historyDiv.scrollTop = 0;
+                        console.log(`Displayed: ${data.result}`);
+                    }
+                });
 
                 readStream().catch(error => {
                     console.log(`Stream error: ${error.message}`);
@@ -269,6 +291,27 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
+    function queueAudio(audio, src) {
+        if (!audio) {
+            return;
+        }
+        if (!audio.playlist) {
+            audio.playlist = [];
+            audio.addEventListener('ended', () => {
+                if (audio.playlist.length > 0) {
+                    audio.src = audio.playlist.shift();
+                    audio.play();
+                }
+            });
+        }
+        if (audio.ended) {
+            audio.src = src;
+            audio.play();
+        } else {
+            audio.playlist.push(src);
+        }
+    }
+
     function createResponseEntry(data) {
         const text = data.result || JSON.stringify(data);
         const entry = document.createElement('div');
@@ -286,6 +329,7 @@ document.addEventListener('DOMContentLoaded', async () => {
                 audio.controls = true;
                 audio.autoplay = true;
                 audio.src = data.result;
+                (data.results || []).slice(1).forEach(chunk => queueAudio(audio, chunk.result));
                 entry.appendChild(audio);
                 break;
             default: